@@ -0,0 +1,115 @@
+"""
+Structured access log for Visor I2D Backend
+
+One record per request is written to the ``applications.access`` logger,
+with the request fields attached as ``extra={'fields': {...}}`` for the
+JSON formatter. Response sizes come from the Content-Length header, set by
+CommonMiddleware for regular responses. Streaming responses without one are
+wrapped in a counting iterator (an async one for async streams) that logs
+once the stream has been sent, so bodies are never read or joined just to
+be measured.
+
+Successful responses can be sampled per path prefix with
+``ACCESS_LOG_SAMPLE_RATES``; 4xx/5xx responses are always logged.
+"""
+import logging
+import random
+import time
+
+from django.conf import settings
+
+
+logger = logging.getLogger('applications.access')
+
+MAX_QUERY_STRING = 512
+
+
+class AccessLog:
+    """Time requests and log them once their size is known"""
+
+    def __init__(self):
+        rates = getattr(settings, 'ACCESS_LOG_SAMPLE_RATES', {})
+        # Longest prefix first, so specific routes override their parents
+        self.sample_rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+        self.default_rate = getattr(settings, 'ACCESS_LOG_DEFAULT_SAMPLE_RATE', 1.0)
+
+    def start(self, request):
+        request.access_log_start = time.perf_counter()
+
+    def sample_rate(self, path):
+        for prefix, rate in self.sample_rates:
+            if path.startswith(prefix):
+                return rate
+        return self.default_rate
+
+    def should_log(self, request, response):
+        if response.status_code >= 400:
+            return True
+        if not logger.isEnabledFor(logging.INFO):
+            return False
+        rate = self.sample_rate(request.path)
+        return rate >= 1 or random.random() < rate
+
+    def finish(self, request, response):
+        """Log `request` now, or when its streaming response has been sent"""
+        start = getattr(request, 'access_log_start', None)
+        if start is None or not self.should_log(request, response):
+            return response
+
+        size = response.get('Content-Length')
+        if size is not None:
+            self.emit(request, response, int(size), start)
+        elif response.streaming:
+            # Keep async streams (the ASGI export) async, or they can no longer be iterated
+            counting = self.acounting if response.is_async else self.counting
+            response.streaming_content = counting(response.streaming_content, request, response, start)
+        else:
+            self.emit(request, response, len(response.content), start)
+        return response
+
+    def counting(self, stream, request, response, start):
+        """Yield `stream` unchanged, logging its total size when it ends or is closed"""
+        size = 0
+        try:
+            for chunk in stream:
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.emit(request, response, size, start)
+
+    async def acounting(self, stream, request, response, start):
+        """Async counterpart of counting() for async streaming responses"""
+        size = 0
+        try:
+            async for chunk in stream:
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.emit(request, response, size, start)
+
+    def emit(self, request, response, size, start):
+        duration_ms = round((time.perf_counter() - start) * 1000, 2)
+        status_code = response.status_code
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'query': request.META.get('QUERY_STRING', '')[:MAX_QUERY_STRING],
+            'status_code': status_code,
+            'response_size': size,
+            'duration_ms': duration_ms,
+            'remote_addr': get_client_ip(request),
+            'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+        }
+        level = logging.WARNING if status_code >= 400 else logging.INFO
+        logger.log(
+            level, '%s %s %s %sB %sms', request.method, request.path, status_code, size, duration_ms,
+            extra={'fields': fields},
+        )
+
+
+def get_client_ip(request):
+    """Get client IP address"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0]
+    return request.META.get('REMOTE_ADDR')
@@ -0,0 +1,28 @@
+"""
+Pooled PostGIS database backend for Visor I2D Backend
+
+Use it as the ENGINE of a DATABASES entry and size it with the optional
+``POOL`` dict:
+
+    'default': {
+        'ENGINE': 'applications.common.db_pool',
+        'CONN_MAX_AGE': 0,
+        'POOL': {'MAX_SIZE': 20, 'TIMEOUT': 10, 'MAX_LIFETIME': 1800, 'CHECK_AFTER': 30},
+        ...
+    }
+
+Each process (gunicorn worker) keeps at most ``MAX_SIZE`` connections per
+database. Requests check one out when they run their first query and
+return it when Django closes the connection at the end of the request, so
+the TCP/auth/``search_path`` handshake is paid once per connection instead
+of once per request. When all connections are in use, further checkouts
+queue for up to ``TIMEOUT`` seconds and then fail with OperationalError.
+Connections are replaced after ``MAX_LIFETIME`` seconds, checked with
+``SELECT 1`` after ``CHECK_AFTER`` idle seconds, and rolled back when a
+request returns one inside a transaction.
+
+Waits, timeouts and pool sizes are exposed at ``/metrics`` as
+``db_pool_wait_seconds``, ``db_pool_timeouts_total``,
+``db_pool_connections_opened_total``, ``db_pool_connections_closed_total``
+and ``db_pool_connections``.
+"""
@@ -0,0 +1,162 @@
+"""
+PostGIS database backend handing out connections from a ConnectionPool
+"""
+import socket
+import time
+
+from django.contrib.gis.db.backends.postgis.base import DatabaseWrapper as PostGISDatabaseWrapper
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+
+from .pool import PoolTimeout, get_pool
+
+if is_psycopg3:  # pragma: no cover - the images ship psycopg2
+    import psycopg as Database
+    from psycopg.pq import TransactionStatus
+
+    TRANSACTION_IDLE = TransactionStatus.IDLE
+else:
+    import psycopg2 as Database
+    from psycopg2.extensions import TRANSACTION_STATUS_IDLE as TRANSACTION_IDLE
+
+try:
+    from gevent import monkey
+except ImportError:  # pragma: no cover - gevent is only installed in production images
+    monkey = None
+
+
+# POOL settings of a DATABASES entry and their defaults
+POOL_DEFAULTS = {
+    'MAX_SIZE': 20,
+    'TIMEOUT': 10,
+    'MAX_LIFETIME': 1800,
+    'CHECK_AFTER': 30,
+}
+
+
+def _transaction_status(connection):
+    if is_psycopg3:  # pragma: no cover
+        return connection.info.transaction_status
+    return connection.get_transaction_status()
+
+
+def reset_connection(connection):
+    """Roll back what a request left open; False if the connection is closed or broken"""
+    if connection.closed:
+        return False
+    if _transaction_status(connection) != TRANSACTION_IDLE:
+        connection.rollback()
+    return _transaction_status(connection) == TRANSACTION_IDLE
+
+
+def check_connection(connection):
+    """Round trip to the server for a connection that sat idle"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Database.Error:
+        return False
+    return True
+
+
+def connect_timeout(conn):
+    """The connect_timeout of `conn` in seconds as libpq applies it, None for no limit"""
+    from psycopg2 import extensions
+
+    try:
+        timeout = int(extensions.parse_dsn(conn.dsn).get('connect_timeout', 0))
+    except ValueError:
+        return None
+    # libpq waits indefinitely for 0 or less and at least 2 seconds otherwise
+    return max(timeout, 2) if timeout > 0 else None
+
+
+def _gevent_wait_callback(conn, timeout=None):
+    """
+    Wait for psycopg2's non-blocking I/O in the gevent hub instead of blocking the worker
+
+    libpq does not apply connect_timeout to non-blocking connects
+    (PQconnectPoll), so it is enforced here while the connection is set up.
+    """
+    from gevent.socket import wait_read, wait_write
+    from psycopg2 import extensions
+
+    deadline = None
+    if conn.status == extensions.STATUS_SETUP:
+        limit = connect_timeout(conn)
+        if limit is not None:
+            deadline = time.monotonic() + limit
+
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        if deadline is not None:
+            timeout = max(deadline - time.monotonic(), 0)
+        try:
+            if state == extensions.POLL_READ:
+                wait_read(conn.fileno(), timeout=timeout)
+            elif state == extensions.POLL_WRITE:
+                wait_write(conn.fileno(), timeout=timeout)
+            else:
+                raise Database.OperationalError(f'Bad result from poll: {state!r}')
+        except socket.timeout:
+            raise Database.OperationalError('timeout expired') from None
+
+
+def make_psycopg_green():
+    """
+    Let other greenlets run while psycopg2 waits on the server
+
+    Without it a gevent worker is blocked for the whole of every query and
+    connection handshake. psycopg 3 cooperates with gevent on its own.
+    """
+    if is_psycopg3 or monkey is None or not monkey.is_module_patched('socket'):
+        return
+    from psycopg2 import extensions
+
+    if extensions.get_wait_callback() is None:
+        extensions.set_wait_callback(_gevent_wait_callback)
+
+
+class DatabaseWrapper(PostGISDatabaseWrapper):
+    """
+    Postgis wrapper whose connect/close check out and return pooled connections
+
+    Keep ``CONN_MAX_AGE = 0`` so Django closes, i.e. returns, the connection
+    at the end of every request; the pool is what keeps it open.
+    """
+
+    def get_pool(self, conn_params):
+        options = {**POOL_DEFAULTS, **self.settings_dict.get('POOL', {})}
+        # Keyed by the connection parameters too, so the test database gets its own pool
+        key = (self.alias, tuple(sorted((name, str(value)) for name, value in conn_params.items())))
+        return get_pool(
+            key, self.alias,
+            max_size=options['MAX_SIZE'], timeout=options['TIMEOUT'],
+            max_lifetime=options['MAX_LIFETIME'], check_after=options['CHECK_AFTER'],
+            check=check_connection, reset=reset_connection,
+        )
+
+    def get_new_connection(self, conn_params):
+        make_psycopg_green()
+        self.pool = self.get_pool(conn_params)
+        try:
+            connection = self.pool.acquire(
+                lambda: super(DatabaseWrapper, self).get_new_connection(conn_params)
+            )
+        except PoolTimeout as e:
+            raise Database.OperationalError(str(e)) from e
+        # Set by the parent on new connections only
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        if self.in_atomic_block:
+            # Django keeps the wrapper's connection attribute in this case
+            self.pool.discard(self.connection, 'closed_in_transaction')
+        else:
+            self.pool.release(self.connection)
@@ -0,0 +1,184 @@
+"""
+Bounded connection pool shared by the database wrappers of one process
+"""
+import os
+import threading
+import time
+
+from ..metrics import Counter, Gauge, Histogram, registry
+
+
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+POOL_WAIT = Histogram(
+    'db_pool_wait_seconds', 'Time spent waiting for a pooled database connection', ['alias'], buckets=WAIT_BUCKETS
+)
+POOL_TIMEOUTS = Counter('db_pool_timeouts_total', 'Checkouts that gave up waiting for a connection', ['alias'])
+POOL_OPENED = Counter('db_pool_connections_opened_total', 'Database connections opened by the pool', ['alias'])
+POOL_CLOSED = Counter(
+    'db_pool_connections_closed_total', 'Database connections closed by the pool', ['alias', 'reason']
+)
+POOL_CONNECTIONS = Gauge('db_pool_connections', 'Open pooled database connections', ['alias', 'state'])
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the pool timeout"""
+
+
+class ConnectionPool:
+    """
+    At most `max_size` connections, handed out most recently used first
+
+    Checkouts beyond `max_size` queue on a Condition (greenlet-safe once
+    gevent has patched threading) for up to `timeout` seconds. Connections
+    older than `max_lifetime` are closed instead of reused, and a connection
+    idle for more than `check_after` seconds must pass `check(connection)`
+    before it is handed out. `reset(connection)` runs on release and returns
+    False for a connection that must not be reused.
+    """
+
+    def __init__(self, alias, max_size=20, timeout=10, max_lifetime=1800, check_after=30,
+                 check=None, reset=None, close=None):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self.check = check
+        self.reset = reset
+        self._close = close or (lambda connection: connection.close())
+        self.condition = threading.Condition()
+        self.idle = []  # [(connection, opened at, released at)], most recently used last
+        self.opened = {}  # id(connection) -> opened at, for connections checked out
+        self.size = 0  # idle + checked out + being opened
+
+    @property
+    def in_use(self):
+        return self.size - len(self.idle)
+
+    def acquire(self, connect):
+        """Return an idle connection, or a new one from `connect()` if the pool is not full"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            with self.condition:
+                while not self.idle and self.size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        POOL_TIMEOUTS.inc(alias=self.alias)
+                        raise PoolTimeout(
+                            f'No connection to "{self.alias}" available within {self.timeout}s '
+                            f'({self.max_size} in use)'
+                        )
+                    self.condition.wait(remaining)
+                if self.idle:
+                    connection, opened_at, released_at = self.idle.pop()
+                else:
+                    connection = None
+                    self.size += 1
+
+            now = time.monotonic()
+            if connection is None:
+                try:
+                    connection = connect()
+                except BaseException:
+                    self._forget()
+                    raise
+                POOL_OPENED.inc(alias=self.alias)
+                opened_at = now
+            elif now - opened_at >= self.max_lifetime:
+                self.discard(connection, 'expired')
+                continue
+            elif self.check is not None and now - released_at >= self.check_after and not self.check(connection):
+                self.discard(connection, 'failed_check')
+                continue
+
+            with self.condition:
+                self.opened[id(connection)] = opened_at
+            POOL_WAIT.observe(time.monotonic() - start, alias=self.alias)
+            return connection
+
+    def release(self, connection):
+        """Give a checked-out connection back to the pool"""
+        try:
+            usable = self.reset is None or self.reset(connection)
+        except Exception:
+            usable = False
+        if not usable:
+            self.discard(connection, 'unusable')
+            return
+        with self.condition:
+            opened_at = self.opened.pop(id(connection), time.monotonic())
+            self.idle.append((connection, opened_at, time.monotonic()))
+            self.condition.notify()
+
+    def discard(self, connection, reason='discarded'):
+        """Close a connection that is not idle and free its slot"""
+        try:
+            self._close(connection)
+        except Exception:
+            pass
+        POOL_CLOSED.inc(alias=self.alias, reason=reason)
+        with self.condition:
+            self.opened.pop(id(connection), None)
+        self._forget()
+
+    def _forget(self):
+        with self.condition:
+            self.size -= 1
+            self.condition.notify()
+
+    def close_idle(self):
+        """Close all idle connections"""
+        with self.condition:
+            idle, self.idle = self.idle, []
+            self.size -= len(idle)
+            self.condition.notify_all()
+        for connection, _, _ in idle:
+            try:
+                self._close(connection)
+            except Exception:
+                pass
+            POOL_CLOSED.inc(alias=self.alias, reason='shutdown')
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(key, alias, **options):
+    """
+    Return the pool of this process for `key`, creating it with `options`
+
+    Pools are per process: after a fork the child starts with none, and the
+    connections inherited from the parent are left alone rather than closed,
+    since closing them would end the parent's sessions too.
+    """
+    global _pools_pid
+    pool = _pools.get(key)
+    if pool is not None and _pools_pid == os.getpid():
+        return pool
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(alias, **options)
+    return pool
+
+
+def all_pools():
+    return list(_pools.values()) if _pools_pid == os.getpid() else []
+
+
+def _pool_collector():
+    counts = {}
+    for pool in all_pools():
+        for state, value in (('idle', len(pool.idle)), ('in_use', pool.in_use)):
+            counts[pool.alias, state] = counts.get((pool.alias, state), 0) + value
+    return [(POOL_CONNECTIONS, {'alias': alias, 'state': state}, value) for (alias, state), value in counts.items()]
+
+
+registry.add_collector(_pool_collector)
@@ -0,0 +1,238 @@
+"""
+Read-replica routing for Visor I2D Backend
+
+Reads of the apps in ``REPLICA_APPS`` (the read-only biodiversity apps and
+the project catalogue) go to one of the ``DATABASE_REPLICAS`` aliases;
+everything else, all writes, and every query of a request pinned to the
+primary go to ``default``. ReplicaRoutingMiddleware pins unsafe requests
+(POST, PUT, ...) and the admin pages and AJAX endpoints
+(``REPLICA_PINNED_PATHS``), so an edit and the reads around it see the
+same database; ``use_primary()`` pins a block of code.
+
+A background ticker, started on the first routed read in each process,
+measures every replica's replication lag every
+``REPLICA_LAG_CHECK_INTERVAL`` seconds, so requests never wait on a lag
+query or on connecting to an unreachable replica (connect_timeout applies,
+under gevent too). A replica more than ``REPLICA_MAX_LAG`` seconds behind,
+not receiving WAL from the primary (no WAL receiver), whose lag query
+fails, or with no measurement in the last three intervals (not measured
+yet, or its check is stuck) gets no reads; with no usable replica, reads fall back to the
+primary. Lags are exposed at ``/metrics`` as
+``db_replica_lag_seconds`` and ``db_replica_available``.
+
+Raw SQL that reads replicated tables should use ``read_connection(app_label)``.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .metrics import Gauge, registry
+
+logger = logging.getLogger(__name__)
+
+REPLICA_LAG = Gauge('db_replica_lag_seconds', 'Last measured replication lag of a read replica', ['alias'])
+REPLICA_AVAILABLE = Gauge('db_replica_available', 'Whether a read replica receives reads', ['alias'])
+
+# Seconds since the last transaction replayed, 0 when the replica has replayed everything it received (or
+# is not in recovery, i.e. is the primary), NULL when no WAL receiver runs: a replica cut off from the
+# primary has nothing left to replay either, but is not fresh
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver) THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+_pinned = ContextVar('db_router_pinned', default=False)
+
+
+@contextmanager
+def use_primary():
+    """Route the reads of this block to the primary"""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class ReplicaRouter:
+    """Database router sending replicated reads to healthy replicas"""
+
+    def __init__(self):
+        self.lags = {}  # alias -> (monotonic time measured, lag in seconds or None if the check failed)
+        self.lock = threading.Lock()
+        self._ticker_pid = None
+
+    @property
+    def replicas(self):
+        return getattr(settings, 'DATABASE_REPLICAS', [])
+
+    def _ensure_started(self):
+        """Start the lag ticker in this process (again after a fork)"""
+        pid = os.getpid()
+        if self._ticker_pid == pid:
+            return
+        with self.lock:
+            if self._ticker_pid == pid:
+                return
+            self.lags = {}
+            interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5)
+            if interval:
+                threading.Thread(target=self._tick, args=(interval,), name='replica-lag-ticker', daemon=True).start()
+            self._ticker_pid = pid
+
+    def _tick(self, interval):
+        while True:
+            try:
+                self.measure_all()
+            except Exception:
+                logger.exception('Replication lag ticker failed')
+            time.sleep(interval)
+
+    def measure_lag(self, alias):
+        """Return the replication lag of `alias` in seconds, or None if it is not receiving WAL"""
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                lag = cursor.fetchone()[0]
+                return None if lag is None else float(lag)
+        finally:
+            # Outside a request nothing else returns the connection
+            connection.close()
+
+    def measure_all(self):
+        """Measure the lag of every replica now"""
+        for alias in self.replicas:
+            try:
+                lag = self.measure_lag(alias)
+            except Exception as e:
+                logger.warning('Replication lag check of %s failed: %s', alias, e)
+                lag = None
+            else:
+                if lag is None:
+                    logger.warning('Replica %s is not receiving WAL from the primary', alias)
+            self.lags[alias] = (time.monotonic(), lag)
+
+    def get_lag(self, alias):
+        """Return the last measured lag of `alias`, or None if unknown, failing or outdated"""
+        measured_at, lag = self.lags.get(alias, (None, None))
+        interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5)
+        if measured_at is None or (interval and time.monotonic() - measured_at > 3 * interval):
+            return None
+        return lag
+
+    def is_available(self, alias):
+        lag = self.get_lag(alias)
+        return lag is not None and lag <= getattr(settings, 'REPLICA_MAX_LAG', 30)
+
+    def get_replica(self):
+        """Return the alias of a usable replica, or None to read from the primary"""
+        replicas = self.replicas
+        if not replicas or _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        self._ensure_started()
+        available = [alias for alias in replicas if self.is_available(alias)]
+        return random.choice(available) if available else None
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in getattr(settings, 'REPLICA_APPS', ()):
+            return self.get_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *self.replicas}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication
+        if db in self.replicas:
+            return False
+        return None
+
+
+def get_router():
+    """Return the ReplicaRouter of DATABASE_ROUTERS, if configured"""
+    from django.db import router
+
+    for candidate in router.routers:
+        if isinstance(candidate, ReplicaRouter):
+            return candidate
+    return None
+
+
+def read_connection(app_label):
+    """Return the connection raw SQL reading the tables of `app_label` should use"""
+    replica_router = get_router()
+    if replica_router is not None and app_label in getattr(settings, 'REPLICA_APPS', ()):
+        return connections[replica_router.get_replica() or DEFAULT_DB_ALIAS]
+    return connections[DEFAULT_DB_ALIAS]
+
+
+def is_pinned_request(request):
+    return (request.method not in SAFE_METHODS
+            or request.path.startswith(tuple(getattr(settings, 'REPLICA_PINNED_PATHS', ('/admin/',)))))
+
+
+class ReplicaRoutingMiddleware:
+    """Pin unsafe requests and the admin to the primary database"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not is_pinned_request(request):
+            return self.get_response(request)
+        with use_primary():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not is_pinned_request(request):
+            return await self.get_response(request)
+        with use_primary():
+            return await self.get_response(request)
+
+
+def _replica_collector():
+    replica_router = get_router()
+    if replica_router is None:
+        return []
+    samples = []
+    max_lag = getattr(settings, 'REPLICA_MAX_LAG', 30)
+    for alias in replica_router.replicas:
+        lag = replica_router.get_lag(alias)
+        if lag is not None:
+            samples.append((REPLICA_LAG, {'alias': alias}, lag))
+        samples.append((REPLICA_AVAILABLE, {'alias': alias}, int(lag is not None and lag <= max_lag)))
+    return samples
+
+
+registry.add_collector(_replica_collector)
@@ -1,19 +1,45 @@
 """
 Comprehensive health check system for Visor I2D Backend
+
+Checks run concurrently in a small thread pool and their results are kept
+per check for a TTL (CHECK_POLICIES, overridable with ``HEALTH_CHECK_TTLS``).
+A background ticker refreshes expired results, so ``/health/`` returns the
+last snapshot right away instead of waiting on slow dependencies; only a
+check that has never completed is waited for, up to its deadline.
+
+Under ASGI (``ASYNC_VIEWS``) ``/health/`` and ``/health/live/`` are async
+views that wait on the pool from the event loop.
 """
+import asyncio
 import logging
+import threading
 import time
 import os
 import shutil
-from django.http import JsonResponse
-from django.db import connection
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.db import connection, connections
 from django.core.cache import cache
 from django.conf import settings
 from rest_framework.decorators import api_view
 from rest_framework import status
 
+from .log_handlers import get_queue_stats
+from .probes import get_probes
+from .statement_timeout import statement_timeout
+
 logger = logging.getLogger(__name__)
 
+# Check name: (TTL of a result in seconds, deadline in seconds, status when the deadline passes)
+CHECK_POLICIES = {
+    'database': (10, 2, 'unhealthy'),
+    'cache': (10, 2, 'warning'),
+    'disk_space': (60, 2, 'warning'),
+    'memory': (15, 2, 'warning'),
+    'cpu': (15, 2, 'warning'),
+    'logging': (5, 1, 'warning'),
+}
+
 
 class HealthCheckService:
     """Service for comprehensive health checks"""
@@ -25,15 +51,153 @@ class HealthCheckService:
             'disk_space': self._check_disk_space,
             'memory': self._check_memory,
             'cpu': self._check_cpu,
-            'external_apis': self._check_external_apis,
+            'logging': self._check_logging,
         }
+        # External dependencies from the DEPENDENCY_PROBES setting (see probes.py)
+        self.probes = {f'dependency:{probe.name}': probe for probe in get_probes()}
+        for name, probe in self.probes.items():
+            self.checks[name] = probe.check
+        self._results = {}  # name -> (result, monotonic time it completed)
+        self._pending = {}  # name -> Future of a running refresh
+        self._lock = threading.Lock()
+        self._executor = None
+        self._ticker_pid = None
     
-    def run_all_checks(self):
-        """Run all health checks and return results"""
+    def get_policy(self, name):
+        """Return (ttl, deadline, timeout status) of check `name`"""
+        probe = self.probes.get(name)
+        if probe is not None:
+            ttl, deadline, timeout_status = probe.interval, probe.timeout + 1, 'unhealthy' if probe.critical else 'warning'
+        else:
+            ttl, deadline, timeout_status = CHECK_POLICIES.get(name, (30, 2, 'warning'))
+        ttl = getattr(settings, 'HEALTH_CHECK_TTLS', {}).get(name, ttl)
+        return ttl, deadline, timeout_status
+    
+    def _ensure_started(self):
+        """Create the pool and start the ticker in this process (again after a fork)"""
+        pid = os.getpid()
+        if self._ticker_pid == pid:
+            return
+        with self._lock:
+            if self._ticker_pid == pid:
+                return
+            self._executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'HEALTH_CHECK_WORKERS', 4), thread_name_prefix='health-check'
+            )
+            self._results, self._pending = {}, {}
+            interval = getattr(settings, 'HEALTH_CHECK_TICK', 5)
+            if interval:
+                threading.Thread(target=self._tick, args=(interval,), name='health-check-ticker', daemon=True).start()
+            self._ticker_pid = pid
+    
+    def _tick(self, interval):
+        """Refresh expired results in the background"""
+        while True:
+            try:
+                for name in self.checks:
+                    if self._is_expired(name):
+                        self.refresh(name)
+            except Exception:
+                logger.exception('Health check ticker failed')
+            time.sleep(interval)
+    
+    def _is_expired(self, name):
+        entry = self._results.get(name)
+        return entry is None or time.monotonic() - entry[1] >= self.get_policy(name)[0]
+    
+    def refresh(self, name):
+        """
+        Start running check `name` in the pool unless it is already running
+        or completed since the caller saw it expired; return its Future
+        """
+        self._ensure_started()
+        with self._lock:
+            future = self._pending.get(name)
+            if future is None:
+                if not self._is_expired(name):
+                    future = Future()
+                    future.set_result(self._results[name][0])
+                    return future
+                future = self._pending[name] = self._executor.submit(self._run_check, name)
+            return future
+    
+    def _run_check(self, name):
+        try:
+            with statement_timeout('health'):
+                result = self.checks[name]()
+        except Exception as e:
+            logger.error(f"Health check {name} failed: {str(e)}")
+            result = {
+                'status': 'error',
+                'message': f'Check failed: {str(e)}',
+                'timestamp': time.time()
+            }
+        finally:
+            # Pool threads must not keep database connections open
+            connections.close_all()
+        with self._lock:
+            self._results[name] = (result, time.monotonic())
+            self._pending.pop(name, None)
+        return result
+    
+    def _latest(self, name):
+        """Return the latest (result, completed) entry of `name` and the Future of its refresh, if due"""
+        entry = self._results.get(name)
+        future = None
+        if entry is None or self._is_expired(name):
+            future = self.refresh(name)
+        return entry, future
+
+    @staticmethod
+    def _aged(entry):
+        # Possibly stale: a refresh started by _latest() replaces it for the next probe
+        result, completed = entry
+        return {**result, 'age_seconds': round(time.monotonic() - completed, 1)}
+
+    def _timed_out(self, name):
+        _, deadline, timeout_status = self.get_policy(name)
+        return {
+            'status': timeout_status,
+            'message': f'Check did not complete within {deadline}s',
+            'timestamp': time.time()
+        }
+
+    def get_result(self, name, deadline_at):
+        """Return the latest result of `name`, waiting until `deadline_at` only if there is none yet"""
+        entry, future = self._latest(name)
+        if entry is not None:
+            return self._aged(entry)
+        try:
+            result = future.result(timeout=max(0, deadline_at - time.monotonic()))
+        except FutureTimeoutError:
+            return self._timed_out(name)
+        return {**result, 'age_seconds': 0.0}
+
+    async def aget_result(self, name, deadline_at):
+        """get_result() waiting on the event loop instead of blocking a thread"""
+        entry, future = self._latest(name)
+        if entry is not None:
+            return self._aged(entry)
+        try:
+            # shield: a timed out wait must not cancel the check shared with other requests
+            result = await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)), max(0, deadline_at - time.monotonic())
+            )
+        except asyncio.TimeoutError:
+            return self._timed_out(name)
+        return {**result, 'age_seconds': 0.0}
+
+    def _start_expired(self):
+        # Start every missing or expired check before waiting on any of them
+        for name in self.checks:
+            if self._is_expired(name):
+                self.refresh(name)
+
+    def _summarize(self, checks):
         results = {
             'status': 'healthy',
             'timestamp': time.time(),
-            'checks': {},
+            'checks': checks,
             'summary': {
                 'total': len(self.checks),
                 'passed': 0,
@@ -41,32 +205,36 @@ class HealthCheckService:
                 'warnings': 0
             }
         }
-        
-        for check_name, check_func in self.checks.items():
-            try:
-                check_result = check_func()
-                results['checks'][check_name] = check_result
-                
-                if check_result['status'] == 'healthy':
-                    results['summary']['passed'] += 1
-                elif check_result['status'] == 'warning':
-                    results['summary']['warnings'] += 1
-                else:
-                    results['summary']['failed'] += 1
-                    results['status'] = 'unhealthy'
-                    
-            except Exception as e:
-                logger.error(f"Health check {check_name} failed: {str(e)}")
-                results['checks'][check_name] = {
-                    'status': 'error',
-                    'message': f'Check failed: {str(e)}',
-                    'timestamp': time.time()
-                }
+
+        for check_result in checks.values():
+            if check_result['status'] == 'healthy':
+                results['summary']['passed'] += 1
+            elif check_result['status'] == 'warning':
+                results['summary']['warnings'] += 1
+            else:
                 results['summary']['failed'] += 1
                 results['status'] = 'unhealthy'
-        
+
         return results
-    
+
+    def run_all_checks(self):
+        """Return the latest result of every health check"""
+        start = time.monotonic()
+        self._start_expired()
+        return self._summarize({
+            name: self.get_result(name, start + self.get_policy(name)[1]) for name in self.checks
+        })
+
+    async def arun_all_checks(self):
+        """run_all_checks() for async views"""
+        start = time.monotonic()
+        self._start_expired()
+        names = list(self.checks)
+        check_results = await asyncio.gather(
+            *(self.aget_result(name, start + self.get_policy(name)[1]) for name in names)
+        )
+        return self._summarize(dict(zip(names, check_results)))
+
     def _check_database(self):
         """Check database connectivity and performance"""
         start_time = time.time()
@@ -264,40 +432,24 @@ class HealthCheckService:
                 'timestamp': time.time()
             }
     
-    def _check_external_apis(self):
-        """Check external API connectivity"""
-        try:
-            import requests
-            
-            # Test GBIF API
-            start_time = time.time()
-            response = requests.get('https://api.gbif.org/v1/species/search?q=Puma', timeout=10)
-            response_time = (time.time() - start_time) * 1000
-            
-            if response.status_code == 200:
-                status_level = 'healthy'
-                message = 'External APIs are accessible'
-                
-                if response_time > 5000:  # 5 seconds
-                    status_level = 'warning'
-                    message = f'External API response time is high: {response_time:.2f}ms'
-            else:
-                status_level = 'warning'
-                message = f'External API returned status {response.status_code}'
-            
-            return {
-                'status': status_level,
-                'message': message,
-                'gbif_response_time_ms': round(response_time, 2),
-                'timestamp': time.time()
-            }
-            
-        except Exception as e:
-            return {
-                'status': 'warning',
-                'message': f'External API check failed: {str(e)}',
-                'timestamp': time.time()
-            }
+    def _check_logging(self):
+        """Check log queue depth and dropped records"""
+        queues = get_queue_stats()
+        dropped = sum(q['dropped'] for q in queues)
+        full = [q['handler'] for q in queues if q['maxsize'] and q['depth'] >= q['maxsize'] * 0.8]
+        
+        status_level = 'healthy'
+        message = 'Log queues are draining'
+        if dropped or full:
+            status_level = 'warning'
+            message = f'{dropped} log records dropped; queues near capacity: {full or "none"}'
+        
+        return {
+            'status': status_level,
+            'message': message,
+            'queues': queues,
+            'timestamp': time.time()
+        }
 
 
 # Global health check service instance
@@ -311,8 +463,10 @@ def health_check(request):
     
     Returns detailed health information about all system components
     """
-    results = health_service.run_all_checks()
-    
+    return health_response(health_service.run_all_checks())
+
+
+def health_response(results):
     # Set appropriate HTTP status code
     if results['status'] == 'healthy':
         http_status = status.HTTP_200_OK
@@ -324,6 +478,17 @@ def health_check(request):
     return JsonResponse(results, status=http_status)
 
 
+async def ahealth_check(request):
+    """
+    Comprehensive health check endpoint (async view)
+
+    Same response as health_check, used when ASYNC_VIEWS is on
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET'])
+    return health_response(await health_service.arun_all_checks())
+
+
 @api_view(['GET'])
 def health_check_simple(request):
     """
@@ -399,3 +564,17 @@ def liveness_check(request):
         'status': 'alive',
         'timestamp': time.time()
     }, status=status.HTTP_200_OK)
+
+
+async def aliveness_check(request):
+    """
+    Liveness check for Kubernetes/container orchestration (async view)
+
+    Answered on the event loop, without a thread hop
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET'])
+    return JsonResponse({
+        'status': 'alive',
+        'timestamp': time.time()
+    }, status=status.HTTP_200_OK)
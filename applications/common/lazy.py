@@ -0,0 +1,59 @@
+"""
+Deferred construction of rarely used views for Visor I2D Backend
+
+Gunicorn recycles workers every ``max_requests`` requests, so everything a
+worker builds at boot is paid again and again. Views that few requests
+reach (the Swagger/ReDoc schema views pull in drf_yasg's generators,
+codecs, ``swagger_spec_validator`` and ``jsonschema``) are declared with
+``lazy_view``, which builds them on their first request instead::
+
+    path('api/docs/', lazy_view(lambda: get_schema_view(...).with_ui('swagger')))
+
+With ``LAZY_LOADING`` off every view is built immediately, as before.
+``load_lazy_views()`` builds the ones still pending, e.g. to move the cost
+back to boot in a worker that preloads.
+
+    python -m benchmarks.bench_startup
+
+reports the import-time breakdown of a worker boot and its cold-start time
+in both modes.
+"""
+import threading
+
+from django.conf import settings
+
+_lazy_views = []
+
+
+class LazyView:
+    """View calling `factory()` to build the real view on its first request"""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.view = None
+        self.lock = threading.Lock()
+
+    def resolve(self):
+        if self.view is None:
+            with self.lock:
+                if self.view is None:
+                    self.view = self.factory()
+        return self.view
+
+    def __call__(self, request, *args, **kwargs):
+        return self.resolve()(request, *args, **kwargs)
+
+
+def lazy_view(factory):
+    """Return the view built by `factory()`, deferred to its first request when LAZY_LOADING is on"""
+    if not getattr(settings, 'LAZY_LOADING', True):
+        return factory()
+    view = LazyView(factory)
+    _lazy_views.append(view)
+    return view
+
+
+def load_lazy_views():
+    """Build every lazy view that has not been requested yet"""
+    for view in _lazy_views:
+        view.resolve()
@@ -0,0 +1,290 @@
+"""
+Logging handlers and formatters for Visor I2D Backend
+"""
+import _queue
+import _thread
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import weakref
+
+from django.utils.module_loading import import_string
+
+try:
+    from gevent.monkey import get_original
+except ImportError:  # pragma: no cover - gevent is only installed in production images
+    get_original = None
+
+
+def _native(module, name):
+    """Return `name` of `module` as it was before any gevent monkey-patching"""
+    if get_original is None:
+        return getattr(globals()[module], name)
+    return get_original(module, name)
+
+
+# Live QueueHandlers, for get_queue_stats()
+_queue_handlers = weakref.WeakSet()
+
+
+def get_queue_stats():
+    """Return depth, capacity and drop count of every QueueHandler"""
+    return [
+        {
+            'handler': handler.name or handler.target.__class__.__name__,
+            'depth': handler.queue.qsize(),
+            'maxsize': handler.queue.maxsize,
+            'dropped': handler.dropped,
+        }
+        for handler in list(_queue_handlers)
+    ]
+
+
+class LogQueue:
+    """
+    Bounded queue of records, safe between greenlets and an OS thread
+
+    gevent replaces queue.Queue with a greenlet-only queue and its locks with
+    greenlet locks, neither of which a real OS thread can wait on. This one
+    is built on the C SimpleQueue and native locks, which gevent leaves
+    alone. Only the parts of the queue.Queue interface the handler and the
+    listener use are provided; join() polls, so under gevent it yields to
+    other greenlets instead of blocking the worker.
+    """
+
+    def __init__(self, maxsize=0):
+        self.maxsize = maxsize
+        self._queue = _queue.SimpleQueue()
+        self._lock = _native('_thread', 'allocate_lock')()
+        self._unfinished = 0
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def put(self, item):
+        """Add `item` regardless of `maxsize`"""
+        with self._lock:
+            self._unfinished += 1
+        self._queue.put(item)
+
+    def put_nowait(self, item):
+        if 0 < self.maxsize <= self._queue.qsize():
+            raise queue.Full
+        self.put(item)
+
+    def get(self):
+        return self._queue.get()
+
+    def get_nowait(self):
+        return self._queue.get_nowait()
+
+    def task_done(self):
+        with self._lock:
+            self._unfinished -= 1
+
+    def join(self):
+        while self._unfinished:
+            time.sleep(0.005)
+
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener that drains up to `batch_size` records at a time
+
+    Plain stream and file handlers get the whole batch formatted and written
+    with a single write() and flush(); other handlers get the records one by
+    one. Rotating handlers are never batched, so they can roll over between
+    records.
+
+    The listener runs on a real OS thread even when gevent has patched
+    threading, so its blocking writes never hold up the worker's greenlets;
+    give it a LogQueue then.
+    """
+
+    def __init__(self, queue, *handlers, batch_size=100, respect_handler_level=True):
+        super().__init__(queue, *handlers, respect_handler_level=respect_handler_level)
+        self.batch_size = batch_size
+
+    def start(self):
+        _native('_thread', 'start_new_thread')(self._monitor, ())
+
+    def stop(self):
+        """Write the queued records and end the listener thread"""
+        self.enqueue_sentinel()
+        self.queue.join()
+
+    def _monitor(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = self._sentinel in batch
+            records = [record for record in batch if record is not self._sentinel]
+            if records:
+                self.handle_batch(records)
+            for _ in batch:
+                q.task_done()
+            if stop:
+                return
+
+    def enqueue_sentinel(self):
+        # Never fail on a full queue: a LogQueue always takes it, a queue.Queue blocks until drained
+        self.queue.put(self._sentinel)
+
+    def handle_batch(self, records):
+        for handler in self.handlers:
+            if self.respect_handler_level:
+                selected = [record for record in records if record.levelno >= handler.level]
+            else:
+                selected = records
+            if not selected:
+                continue
+            if isinstance(handler, logging.StreamHandler) and \
+                    not isinstance(handler, logging.handlers.BaseRotatingHandler):
+                self.write_batch(handler, selected)
+            else:
+                for record in selected:
+                    handler.handle(record)
+
+    @staticmethod
+    def write_batch(handler, records):
+        lines = []
+        for record in records:
+            if not handler.filter(record):
+                continue
+            try:
+                lines.append(handler.format(record))
+            except Exception:
+                handler.handleError(record)
+        if not lines:
+            return
+
+        handler.acquire()
+        try:
+            if hasattr(handler, 'reopenIfNeeded'):
+                handler.reopenIfNeeded()
+            if handler.stream is None:
+                # FileHandler opened with delay=True
+                handler.stream = handler._open()
+            handler.stream.write(handler.terminator.join(lines) + handler.terminator)
+            handler.flush()
+        except Exception:
+            handler.handleError(records[-1])
+        finally:
+            handler.release()
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Non-blocking handler writing records through a background listener
+
+    Records are put on a bounded in-memory LogQueue and written in batches
+    of up to ``batch_size`` by a BatchingQueueListener thread, an OS thread
+    under gevent too, to a target handler built from ``target`` and
+    ``target_kwargs``, so slow streams or files never block the request.
+    Formatting also happens on the listener thread. When the queue is full records are dropped and counted in
+    ``dropped``; see get_queue_stats().
+
+    Usable from LOGGING::
+
+        'handlers': {
+            'access': {
+                'class': 'applications.common.log_handlers.QueueHandler',
+                'target': 'logging.StreamHandler',
+                'target_kwargs': {'stream': 'ext://sys.stdout'},
+                'formatter': 'json',
+            },
+        }
+    """
+
+    def __init__(self, target='logging.StreamHandler', target_kwargs=None, maxsize=10000, batch_size=100,
+                 level=logging.NOTSET):
+        super().__init__(LogQueue(maxsize))
+        self.setLevel(level)
+        self.target = import_string(target)(**self._resolve(target_kwargs or {}))
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._listener = None
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+        _queue_handlers.add(self)
+
+    @staticmethod
+    def _resolve(kwargs):
+        """Resolve 'ext://' references, which dictConfig leaves alone in handler kwargs"""
+        resolved = {}
+        for key, value in kwargs.items():
+            if isinstance(value, str) and value.startswith('ext://'):
+                value = import_string(value[len('ext://'):])
+            resolved[key] = value
+        return resolved
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Records stay in-process: keep them as they are and let the target
+        # handler format them on the listener thread
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_listener(self):
+        """Start the listener in this process (again after a fork)"""
+        pid = os.getpid()
+        if self._listener_pid == pid:
+            return
+        with self._listener_lock:
+            if self._listener_pid != pid:
+                self._listener = BatchingQueueListener(self.queue, self.target, batch_size=self.batch_size)
+                self._listener.start()
+                self._listener_pid = pid
+
+    def flush(self):
+        """Block until the queued records have been written"""
+        if self._listener_pid == os.getpid():
+            self.queue.join()
+        self.target.flush()
+
+    def close(self):
+        if self._listener_pid == os.getpid():
+            self._listener.stop()
+            self._listener_pid = None
+        self.target.close()
+        super().close()
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line
+
+    The object has the timestamp, level, logger and message, plus the dict
+    passed as ``extra={'fields': {...}}`` merged at the top level.
+    """
+
+    def format(self, record):
+        data = {
+            'timestamp': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
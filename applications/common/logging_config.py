@@ -0,0 +1,79 @@
+"""
+Logging configuration for Visor I2D Backend
+
+get_logging_config() builds the LOGGING dict used by the settings. Every
+``applications.*`` logger is routed through non-blocking QueueHandlers
+(applications/common/log_handlers.py): records go on a bounded queue and a
+background listener per process, on an OS thread even under gevent,
+writes them to stdout (and optionally a file) in batches, so logging never
+blocks a gevent worker on I/O. Records
+are dropped and counted when a queue is full; queue depth and drops are
+reported by the ``logging`` health check.
+
+Kept free of Django imports so settings modules can import it.
+"""
+
+QUEUE_HANDLER = 'applications.common.log_handlers.QueueHandler'
+
+
+def _queue_handler(target, target_kwargs, formatter, queue_size, batch_size):
+    return {
+        'class': QUEUE_HANDLER,
+        'target': target,
+        'target_kwargs': target_kwargs,
+        'maxsize': queue_size,
+        'batch_size': batch_size,
+        'formatter': formatter,
+    }
+
+
+def get_logging_config(level='INFO', log_file=None, queue_size=10000, batch_size=100):
+    """
+    Return a LOGGING dict
+
+    Application logs are written to stdout as text and access logs as JSON
+    lines. With `log_file`, application logs are also appended to that file
+    (reopened when rotated by an external logrotate).
+    """
+    handlers = {
+        'console': _queue_handler(
+            'logging.StreamHandler', {'stream': 'ext://sys.stdout'}, 'verbose', queue_size, batch_size
+        ),
+        'access': _queue_handler(
+            'logging.StreamHandler', {'stream': 'ext://sys.stdout'}, 'json', queue_size, batch_size
+        ),
+    }
+    app_handlers = ['console']
+    if log_file:
+        handlers['file'] = _queue_handler(
+            'logging.handlers.WatchedFileHandler', {'filename': log_file, 'delay': True},
+            'verbose', queue_size, batch_size
+        )
+        app_handlers.append('file')
+
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {
+            'verbose': {
+                'format': '{asctime} {levelname} {name} {process:d} {message}',
+                'style': '{',
+            },
+            'json': {
+                '()': 'applications.common.log_handlers.JSONFormatter',
+            },
+        },
+        'handlers': handlers,
+        'loggers': {
+            'applications': {
+                'handlers': app_handlers,
+                'level': level,
+                'propagate': False,
+            },
+            'applications.access': {
+                'handlers': ['access'],
+                'level': 'INFO',
+                'propagate': False,
+            },
+        },
+    }
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from applications.common.schema import write_schema
+
+
+class Command(BaseCommand):
+    help = 'Render the OpenAPI schema served by /api/schema/, /api/docs/ and /api/redoc/ (run at build time)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-o', '--output-dir', help='Directory to write schema.json and schema.yaml to '
+                                                       '(default: OPENAPI_SCHEMA_DIR)')
+
+    def handle(self, *args, **options):
+        for path in write_schema(options['output_dir']):
+            self.stdout.write(self.style.SUCCESS(f'Wrote {path} ({path.stat().st_size} bytes)'))
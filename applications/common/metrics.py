@@ -0,0 +1,412 @@
+"""
+In-process metrics registry for Visor I2D Backend
+
+Counters, histograms and gauges are kept in memory per process and exposed
+in the Prometheus text format at ``/metrics``:
+
+    REQUESTS.inc(route='api/mpio/charts/<kid>', method='GET', status='200')
+    REQUEST_DURATION.observe(0.042, route='api/mpio/charts/<kid>', method='GET')
+
+Gunicorn runs several worker processes, so with ``METRICS_MULTIPROCESS_DIR``
+set every process also writes a snapshot of its registry to
+``<dir>/metrics_<pid>.json`` (at most every ``METRICS_FLUSH_INTERVAL``
+seconds, and at exit). ``/metrics`` then sums the snapshots of all
+workers. Snapshots of exited workers are folded into ``metrics_archive.json``
+so counters survive ``--max-requests`` recycling; their gauges are dropped.
+
+``/metrics`` reveals routes, error rates, replica lag and export sizes, so
+it only answers scrapers connecting directly (no ``X-Forwarded-For``) from
+``METRICS_ALLOWED_NETWORKS``, or requests with ``Authorization: Bearer
+<METRICS_TOKEN>``; everyone else gets a 404.
+"""
+import atexit
+import bisect
+import fcntl
+import ipaddress
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2)
+HTTP_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+ARCHIVE_FILE = 'metrics_archive.json'
+
+
+class Registry:
+    """Holds metric definitions and their values for this process"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+        self.last_flush = 0.0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector):
+        """Register a callable returning [(gauge, labels dict, value)] evaluated at scrape time"""
+        self.collectors.append(collector)
+
+    def snapshot(self):
+        """Return {name: {'type', 'help', 'buckets', 'samples': [[labels, value]]}}"""
+        data = {}
+        with self.lock:
+            for metric in self.metrics.values():
+                if metric.type != 'gauge':
+                    data[metric.name] = metric.describe(
+                        [[list(key), value if metric.type == 'counter' else list(value)]
+                         for key, value in metric.values.items()]
+                    )
+        for collector in self.collectors:
+            for gauge, labels, value in collector():
+                entry = data.setdefault(gauge.name, gauge.describe([]))
+                entry['samples'].append([[labels[name] for name in gauge.labelnames], value])
+        return data
+
+    # Multiprocess mode
+
+    @property
+    def directory(self):
+        return getattr(settings, 'METRICS_MULTIPROCESS_DIR', None)
+
+    def maybe_flush(self):
+        """Write this process's snapshot if the flush interval has passed"""
+        if self.directory and time.monotonic() - self.last_flush >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+            self.flush()
+
+    def flush(self):
+        directory = self.directory
+        if not directory:
+            return
+        self.last_flush = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'metrics_{os.getpid()}.json')
+        _write_json(path, self.snapshot())
+
+    def collect(self):
+        """Return the snapshot to expose: this process alone, or all workers in multiprocess mode"""
+        directory = self.directory
+        if not directory:
+            return self.snapshot()
+
+        self.flush()
+        with open(os.path.join(directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive_path = os.path.join(directory, ARCHIVE_FILE)
+            archive = _read_json(archive_path) or {}
+            live = []
+            archived = False
+            for filename in os.listdir(directory):
+                if not (filename.startswith('metrics_') and filename.endswith('.json')) or filename == ARCHIVE_FILE:
+                    continue
+                path = os.path.join(directory, filename)
+                snapshot = _read_json(path)
+                if snapshot is None:
+                    continue
+                if _process_alive(int(filename[len('metrics_'):-len('.json')])):
+                    live.append(snapshot)
+                else:
+                    merge_snapshots(archive, snapshot, keep_gauges=False)
+                    os.remove(path)
+                    archived = True
+            if archived:
+                _write_json(archive_path, archive)
+
+        total = {}
+        merge_snapshots(total, archive)
+        for snapshot in live:
+            merge_snapshots(total, snapshot)
+        return total
+
+
+def merge_snapshots(total, snapshot, keep_gauges=True):
+    """Add the samples of `snapshot` to `total` in place"""
+    for name, entry in snapshot.items():
+        if entry['type'] == 'gauge' and not keep_gauges:
+            continue
+        target = total.setdefault(name, {**entry, 'samples': []})
+        samples = {tuple(labels): i for i, (labels, _) in enumerate(target['samples'])}
+        for labels, value in entry['samples']:
+            i = samples.get(tuple(labels))
+            if i is None:
+                target['samples'].append([labels, value])
+                samples[tuple(labels)] = len(target['samples']) - 1
+            elif entry['type'] == 'histogram':
+                target['samples'][i][1] = [a + b for a, b in zip(target['samples'][i][1], value)]
+            else:
+                target['samples'][i][1] += value
+    return total
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), buckets=None, registry=registry):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self.values = {}
+        self.registry = registry
+        registry.register(self)
+
+    def describe(self, samples):
+        return {
+            'type': self.type, 'help': self.documentation,
+            'labels': list(self.labelnames), 'buckets': self.buckets, 'samples': samples,
+        }
+
+    def key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, value=1, **labels):
+        key = self.key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+
+class Histogram(Metric):
+    """Cumulative histogram; values are [count per bucket..., count over the last bucket, sum]"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=registry):
+        super().__init__(name, documentation, labelnames, tuple(buckets), registry)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.registry.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+
+class Gauge(Metric):
+    """Value read at scrape time through a registry collector"""
+    type = 'gauge'
+
+
+# Metrics
+
+REQUESTS = Counter('http_requests_total', 'HTTP requests', ['route', 'method', 'status'])
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Time to produce the response', ['route', 'method'])
+DB_QUERIES = Counter('db_queries_total', 'Database queries run by requests', ['route'])
+DB_QUERY_SECONDS = Counter('db_query_seconds_total', 'Database time spent by requests', ['route'])
+CACHE_REQUESTS = Counter('cache_requests_total', 'Application cache lookups', ['cache', 'result'])
+EXPORT_SIZE = Histogram('export_size_bytes', 'Size of generated downloads', ['export'], buckets=SIZE_BUCKETS)
+LOG_QUEUE_DEPTH = Gauge('log_queue_depth', 'Records waiting in a log queue', ['handler'])
+LOG_DROPPED = Gauge('log_records_dropped', 'Log records dropped by a full queue since the process started', ['handler'])
+
+
+def _log_queue_collector():
+    from .log_handlers import get_queue_stats
+
+    samples = []
+    for stats in get_queue_stats():
+        labels = {'handler': stats['handler']}
+        samples.append((LOG_QUEUE_DEPTH, labels, stats['depth']))
+        samples.append((LOG_DROPPED, labels, stats['dropped']))
+    return samples
+
+
+registry.add_collector(_log_queue_collector)
+
+
+def record_cache_lookup(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+# Request instrumentation
+
+class QueryCounter:
+    """Queries and database time of the current request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_query_counter = ContextVar('metrics_query_counter', default=None)
+
+
+def current_query_counter():
+    """Return the QueryCounter of the request being tracked, if any"""
+    return _query_counter.get()
+
+
+def count_queries(execute, sql, params, many, context):
+    """Database execute wrapper adding to the QueryCounter of the current request"""
+    counter = _query_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        counter.count += 1
+        counter.seconds += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    """
+    Keep count_queries installed on every database connection
+
+    Installed once per connection rather than entered around every request.
+    It goes first in the list so ``connection.execute_wrapper()`` blocks,
+    which pop the last wrapper, never remove it.
+    """
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_queries)
+
+
+# Connections opened before this module was imported
+for _connection in connections.all(initialized_only=True):
+    install_query_counter(None, _connection)
+
+
+def get_route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'unmatched'
+
+
+def track_request(get_response, request):
+    """Call get_response(request) recording latency, status and database use"""
+    queries = QueryCounter()
+    token = _query_counter.set(queries)
+    start = time.perf_counter()
+    try:
+        response = get_response(request)
+    finally:
+        _query_counter.reset(token)
+    return _record_request(request, response, time.perf_counter() - start, queries)
+
+
+async def atrack_request(get_response, request):
+    """track_request for an async get_response"""
+    queries = QueryCounter()
+    token = _query_counter.set(queries)
+    start = time.perf_counter()
+    try:
+        response = await get_response(request)
+    finally:
+        _query_counter.reset(token)
+    return _record_request(request, response, time.perf_counter() - start, queries)
+
+
+def _record_request(request, response, duration, queries):
+    route = get_route(request)
+    method = request.method if request.method in HTTP_METHODS else 'other'
+    REQUESTS.inc(route=route, method=method, status=response.status_code)
+    REQUEST_DURATION.observe(duration, route=route, method=method)
+    if queries.count:
+        DB_QUERIES.inc(queries.count, route=route)
+        DB_QUERY_SECONDS.inc(queries.seconds, route=route)
+    registry.maybe_flush()
+    return response
+
+
+# Exposition
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def render_prometheus(snapshot):
+    """Render a snapshot in the Prometheus text exposition format"""
+    lines = []
+    for name in sorted(snapshot):
+        entry = snapshot[name]
+        lines.append(f'# HELP {name} {entry["help"]}')
+        lines.append(f'# TYPE {name} {entry["type"]}')
+        for labels, value in sorted(entry['samples']):
+            if entry['type'] == 'histogram':
+                cumulative = 0
+                for bound, count in zip(list(entry['buckets']) + ['+Inf'], value[:-1]):
+                    cumulative += count
+                    le = _format_labels(entry['labels'], labels, [('le', bound)])
+                    lines.append(f'{name}_bucket{le} {cumulative}')
+                base = _format_labels(entry['labels'], labels)
+                lines.append(f'{name}_sum{base} {value[-1]}')
+                lines.append(f'{name}_count{base} {cumulative}')
+            else:
+                lines.append(f'{name}{_format_labels(entry["labels"], labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_allowed(request):
+    """Return whether `request` may read the metrics"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return True
+    if 'HTTP_X_FORWARDED_FOR' in request.META:
+        # Came through the public proxy, whose own address is usually in a private network
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False)
+               for network in getattr(settings, 'METRICS_ALLOWED_NETWORKS', ['127.0.0.0/8', '::1/128']))
+
+
+def metrics_view(request):
+    """Expose the metrics of all workers in the Prometheus text format"""
+    if not metrics_allowed(request):
+        raise Http404
+    return HttpResponse(
+        render_prometheus(registry.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
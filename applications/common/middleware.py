@@ -1,61 +1,55 @@
 """
 Data quality and validation middleware for Visor I2D Backend
 """
+import functools
 import json
 import logging
+import re
+from urllib.parse import unquote_plus
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
 from django.http import JsonResponse
 from django.core.exceptions import ValidationError
 from django.utils.deprecation import MiddlewareMixin
 from rest_framework import status
+from rest_framework.utils.json import strict_constant
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .access_log import AccessLog
+from .metrics import atrack_request, track_request
+from .security_headers import SecurityHeaderSets
+from .statement_timeout import is_statement_timeout
+from .timing import atime_request, time_request
 
 
 logger = logging.getLogger(__name__)
 
+MAX_REQUEST_SIZE = 10 * 1024 * 1024  # 10MB
+# Bytes of the query string and request body scanned for suspicious patterns
+BODY_SCAN_LIMIT = 64 * 1024
+
+SUSPICIOUS_PATTERNS = [
+    'DROP TABLE', 'DELETE FROM', 'INSERT INTO', 'UPDATE SET',
+    '<script', 'javascript:', 'data:', 'vbscript:',
+    'UNION SELECT', 'OR 1=1', "'; --", '" OR "',
+    'eval(', 'exec(', 'system(', 'shell_exec'
+]
+# All patterns compiled into one case-insensitive alternation, scanned in a single pass
+SUSPICIOUS_TEXT = re.compile('|'.join(re.escape(p) for p in SUSPICIOUS_PATTERNS), re.IGNORECASE)
+SUSPICIOUS_BYTES = re.compile(SUSPICIOUS_TEXT.pattern.encode('ascii'), re.IGNORECASE)
+
 
 class SecurityHeadersMiddleware(MiddlewareMixin):
     """Middleware to add security headers to all responses"""
     
     def __init__(self, get_response):
         self.get_response = get_response
+        self.header_sets = SecurityHeaderSets.from_settings()
         super().__init__(get_response)
     
     def process_response(self, request, response):
-        """Add security headers to response"""
-        
-        # Content Security Policy
-        response['Content-Security-Policy'] = (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
-            "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; "
-            "font-src 'self' https://fonts.gstatic.com; "
-            "img-src 'self' data: https:; "
-            "connect-src 'self' https://api.gbif.org; "
-            "frame-ancestors 'none';"
-        )
-        
-        # X-Frame-Options
-        response['X-Frame-Options'] = 'DENY'
-        
-        # X-Content-Type-Options
-        response['X-Content-Type-Options'] = 'nosniff'
-        
-        # X-XSS-Protection
-        response['X-XSS-Protection'] = '1; mode=block'
-        
-        # Referrer Policy
-        response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
-        
-        # Permissions Policy
-        response['Permissions-Policy'] = (
-            "geolocation=(), microphone=(), camera=(), "
-            "payment=(), usb=(), magnetometer=(), gyroscope=()"
-        )
-        
-        # Server header removal
-        if 'Server' in response:
-            del response['Server']
-        
-        return response
+        """Add the precompiled security headers for the request path"""
+        return self.header_sets.apply(request.path, response)
 
 
 class DataQualityMiddleware(MiddlewareMixin):
@@ -72,42 +66,50 @@ class DataQualityMiddleware(MiddlewareMixin):
         if request.path.startswith('/admin/') or request.path.startswith('/static/'):
             return None
         
+        return self.validate_request(request)
+    
+    def validate_request(self, request):
+        """Check size, JSON payload and suspicious patterns of a request"""
+        
         # Validate request size
-        if hasattr(request, 'META') and 'CONTENT_LENGTH' in request.META:
-            try:
-                content_length = int(request.META['CONTENT_LENGTH'])
-                if content_length > 10 * 1024 * 1024:  # 10MB limit
-                    return JsonResponse({
-                        'error': 'Request too large',
-                        'message': 'Request size exceeds 10MB limit',
-                        'code': 'REQUEST_TOO_LARGE'
-                    }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
-            except (ValueError, TypeError):
-                pass
-        
-        # Validate JSON payload for POST/PUT requests
+        content_length = self._get_content_length(request)
+        if content_length > MAX_REQUEST_SIZE:
+            return JsonResponse({
+                'error': 'Request too large',
+                'message': 'Request size exceeds 10MB limit',
+                'code': 'REQUEST_TOO_LARGE'
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        
+        # Validate JSON payload for POST/PUT requests, keeping the result for SharedJSONParser
+        body = None
         if request.method in ['POST', 'PUT', 'PATCH'] and request.content_type == 'application/json':
-            try:
-                if hasattr(request, 'body') and request.body:
-                    json.loads(request.body.decode('utf-8'))
-            except (json.JSONDecodeError, UnicodeDecodeError) as e:
-                return JsonResponse({
-                    'error': 'Invalid JSON',
-                    'message': f'Request body contains invalid JSON: {str(e)}',
-                    'code': 'INVALID_JSON'
-                }, status=status.HTTP_400_BAD_REQUEST)
+            body = request.body
+            if body:
+                try:
+                    request.parsed_json = json.loads(body.decode('utf-8'), parse_constant=strict_constant)
+                except (ValueError, UnicodeDecodeError) as e:
+                    return JsonResponse({
+                        'error': 'Invalid JSON',
+                        'message': f'Request body contains invalid JSON: {str(e)}',
+                        'code': 'INVALID_JSON'
+                    }, status=status.HTTP_400_BAD_REQUEST)
         
         # Log suspicious patterns
-        self._check_suspicious_patterns(request)
+        self._check_suspicious_patterns(request, body, content_length)
         
         return None
     
+    @staticmethod
+    def _get_content_length(request):
+        try:
+            return int(request.META.get('CONTENT_LENGTH') or 0)
+        except (ValueError, TypeError):
+            return 0
+    
     def process_response(self, request, response):
         """Process outgoing responses for data quality"""
         
-        # Add data quality headers
-        response['X-Data-Quality-Check'] = 'enabled'
-        response['X-Validation-Version'] = '1.0'
+        self.add_headers(response)
         
         # Log response metrics
         if hasattr(response, 'status_code'):
@@ -116,32 +118,37 @@ class DataQualityMiddleware(MiddlewareMixin):
         
         return response
     
-    def _check_suspicious_patterns(self, request):
-        """Check for suspicious patterns in requests"""
-        suspicious_patterns = [
-            'DROP TABLE', 'DELETE FROM', 'INSERT INTO', 'UPDATE SET',
-            '<script', 'javascript:', 'data:', 'vbscript:',
-            'UNION SELECT', 'OR 1=1', "'; --", '" OR "',
-            'eval(', 'exec(', 'system(', 'shell_exec'
-        ]
+    @staticmethod
+    def add_headers(response):
+        """Add the data quality headers, which every response has carried"""
+        response['X-Data-Quality-Check'] = 'enabled'
+        response['X-Validation-Version'] = '1.0'
+        return response
+    
+    def _check_suspicious_patterns(self, request, body=None, content_length=0):
+        """
+        Check the query string and the start of POST bodies for suspicious patterns
+        
+        Bodies are only read here when already read for JSON validation or
+        when they fit in the scanned prefix, so large uploads stay streamed.
+        """
         
         # Check URL parameters
-        query_string = request.META.get('QUERY_STRING', '').lower()
-        for pattern in suspicious_patterns:
-            if pattern.lower() in query_string:
-                logger.warning(f"Suspicious pattern '{pattern}' detected in query: {request.path}?{query_string}")
-                break
+        query_string = request.META.get('QUERY_STRING', '')
+        if query_string:
+            match = SUSPICIOUS_TEXT.search(unquote_plus(query_string[:BODY_SCAN_LIMIT]))
+            if match:
+                logger.warning(f"Suspicious pattern '{match.group(0)}' detected in query: {request.path}?{query_string}")
         
         # Check POST data
-        if request.method == 'POST' and hasattr(request, 'body'):
-            try:
-                body_str = request.body.decode('utf-8').lower()
-                for pattern in suspicious_patterns:
-                    if pattern.lower() in body_str:
-                        logger.warning(f"Suspicious pattern '{pattern}' detected in POST body for {request.path}")
-                        break
-            except UnicodeDecodeError:
-                pass
+        if request.method == 'POST':
+            if body is None and content_length <= BODY_SCAN_LIMIT:
+                body = request.body
+            if body:
+                match = SUSPICIOUS_BYTES.search(body, 0, BODY_SCAN_LIMIT)
+                if match:
+                    pattern = match.group(0).decode('ascii', 'replace')
+                    logger.warning(f"Suspicious pattern '{pattern}' detected in POST body for {request.path}")
 
 
 class ErrorHandlingMiddleware(MiddlewareMixin):
@@ -172,6 +179,19 @@ class ErrorHandlingMiddleware(MiddlewareMixin):
             logger.error(f"Validation error on {request.path}: {str(exception)}")
             return JsonResponse(error_response, status=status.HTTP_400_BAD_REQUEST)
         
+        # Queries cancelled by the statement timeout budget of the route
+        if is_statement_timeout(exception):
+            error_response = {
+                'error': 'Query Timeout',
+                'message': 'The query took too long and was cancelled. Please narrow it down or try again later.',
+                'code': 'QUERY_TIMEOUT',
+                'timestamp': self._get_timestamp(),
+                'path': request.path
+            }
+            
+            logger.warning(f"Statement timeout on {request.path}: {str(exception)}")
+            return JsonResponse(error_response, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        
         # Handle database errors
         if 'database' in str(type(exception)).lower():
             error_response = {
@@ -227,6 +247,11 @@ class APIVersioningMiddleware(MiddlewareMixin):
         if not request.path.startswith('/api/'):
             return None
         
+        return self.check_version(request)
+    
+    def check_version(self, request):
+        """Set request.api_version, rejecting unsupported versions"""
+        
         # Extract version from URL or headers
         api_version = self._extract_version(request)
         
@@ -285,66 +310,180 @@ class APIVersioningMiddleware(MiddlewareMixin):
 
 
 class RequestLoggingMiddleware(MiddlewareMixin):
-    """Middleware for comprehensive request logging"""
+    """Middleware writing one structured access log record per request"""
     
     def __init__(self, get_response):
         self.get_response = get_response
+        self.access_log = AccessLog()
         super().__init__(get_response)
     
     def process_request(self, request):
-        """Log incoming requests"""
+        """Start timing incoming requests"""
         
         # Skip static files and admin
         if request.path.startswith('/static/') or request.path.startswith('/admin/'):
             return None
         
-        request.start_time = self._get_current_time()
-        
-        log_data = {
-            'method': request.method,
-            'path': request.path,
-            'query_params': dict(request.GET),
-            'user_agent': request.META.get('HTTP_USER_AGENT', ''),
-            'remote_addr': self._get_client_ip(request),
-            'timestamp': request.start_time.isoformat()
-        }
-        
-        logger.info(f"Request: {json.dumps(log_data)}")
-        
+        self.log_request(request)
         return None
     
+    def log_request(self, request):
+        """Record the start time of the request"""
+        self.access_log.start(request)
+    
     def process_response(self, request, response):
-        """Log response details"""
-        
-        if hasattr(request, 'start_time'):
-            end_time = self._get_current_time()
-            duration = (end_time - request.start_time).total_seconds() * 1000  # milliseconds
-            
-            log_data = {
-                'method': request.method,
-                'path': request.path,
-                'status_code': response.status_code,
-                'duration_ms': round(duration, 2),
-                'response_size': len(response.content) if hasattr(response, 'content') else 0
-            }
-            
-            if response.status_code >= 400:
-                logger.warning(f"Response: {json.dumps(log_data)}")
-            else:
-                logger.info(f"Response: {json.dumps(log_data)}")
-        
+        """Log the request once the response size is known"""
+        return self.access_log.finish(request, response)
+
+
+class RequestPipelineMiddleware:
+    """
+    Single middleware replacing SecurityHeaders, RequestLogging, DataQuality,
+    APIVersioning and ErrorHandling middleware
+
+    The stages a request runs through are looked up once per request in a
+    path table compiled at startup, instead of every middleware re-checking
+    path prefixes: static files and health probes only get the security and
+    data quality headers, the admin skips logging and validation, and only
+    API requests pay for versioning. Each stage reuses the logic of the standalone
+    middleware class it replaces.
+
+    Unless ``METRICS_ENABLED`` is off, the inner handler is also timed for
+    the per-route metrics exposed at /metrics, and unless ``SERVER_TIMING``
+    is off the phases of requests beyond the headers-only routes are
+    reported in a Server-Timing header.
+
+    Under ASGI it runs as async middleware, so requests reach async views
+    without a thread hop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    HEADERS = 1
+    LOGGING = 2
+    VALIDATION = 4
+    VERSIONING = 8
+
+    DEFAULT_STAGES = HEADERS | LOGGING | VALIDATION
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.logging = RequestLoggingMiddleware(get_response)
+        self.data_quality = DataQualityMiddleware(get_response)
+        self.versioning = APIVersioningMiddleware(get_response)
+        self.error_handling = ErrorHandlingMiddleware(get_response)
+        self.header_sets = SecurityHeaderSets.from_settings()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Static files, health probes and the admin are not phase-timed
+        self.handle_light = self.wrap_metrics(get_response)
+        if getattr(settings, 'SERVER_TIMING', True):
+            timer = atime_request if self.async_mode else time_request
+            self.handle = self.wrap_metrics(functools.partial(timer, get_response))
+        else:
+            self.handle = self.handle_light
+        self.routes, self.route_stages = self.compile_routes(self.get_route_table())
+
+    def wrap_metrics(self, handler):
+        if getattr(settings, 'METRICS_ENABLED', True):
+            return functools.partial(atrack_request if self.async_mode else track_request, handler)
+        return handler
+
+    def get_route_table(self):
+        """Return (path prefix, stages) pairs, first match wins"""
+        return [
+            (settings.STATIC_URL, self.HEADERS),
+            ('/health/', self.HEADERS),
+            ('/metrics', self.HEADERS),
+            ('/admin/', self.HEADERS),
+            ('/api/', self.HEADERS | self.LOGGING | self.VALIDATION | self.VERSIONING),
+        ]
+
+    @staticmethod
+    def compile_routes(table):
+        """Compile the route table into one anchored regex with a group per route"""
+        pattern = '|'.join(f'(?P<r{i}>{re.escape(prefix)})' for i, (prefix, _) in enumerate(table))
+        return re.compile(pattern), {f'r{i}': stages for i, (_, stages) in enumerate(table)}
+
+    def get_stages(self, path):
+        match = self.routes.match(path)
+        return self.route_stages[match.lastgroup] if match else self.DEFAULT_STAGES
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stages = self.get_stages(request.path)
+        if stages == self.HEADERS:
+            return self.header_sets.apply(request.path, self.data_quality.add_headers(self.handle_light(request)))
+
+        response = self.process_request(request, stages)
+        if response is None:
+            response = self.handle(request)
+        return self.process_response(request, response, stages)
+
+    async def __acall__(self, request):
+        stages = self.get_stages(request.path)
+        if stages == self.HEADERS:
+            response = await self.handle_light(request)
+            return self.header_sets.apply(request.path, self.data_quality.add_headers(response))
+
+        response = self.process_request(request, stages)
+        if response is None:
+            response = await self.handle(request)
+        return self.process_response(request, response, stages)
+
+    def process_request(self, request, stages):
+        """Run the request stages; return a response to short-circuit the view"""
+        response = None
+        if stages & self.LOGGING:
+            self.logging.log_request(request)
+        if stages & self.VALIDATION:
+            response = self.data_quality.validate_request(request)
+        if response is None and stages & self.VERSIONING:
+            response = self.versioning.check_version(request)
         return response
-    
-    def _get_current_time(self):
-        """Get current datetime"""
-        from datetime import datetime
-        return datetime.now()
-    
-    def _get_client_ip(self, request):
-        """Get client IP address"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
+
+    def process_response(self, request, response, stages):
+        if stages & self.VERSIONING:
+            response = self.versioning.process_response(request, response)
+        if stages & self.VALIDATION:
+            response = self.data_quality.process_response(request, response)
+        if stages & self.LOGGING:
+            response = self.logging.process_response(request, response)
+        return self.header_sets.apply(request.path, response)
+
+    def process_exception(self, request, exception):
+        return self.error_handling.process_exception(request, exception)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that can also run as async middleware
+
+    WhiteNoise's own middleware is sync-only, which under ASGI would send
+    every request through a thread. Here only requests for a static file
+    leave the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
         else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
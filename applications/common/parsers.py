@@ -0,0 +1,24 @@
+"""
+Request parsers for Visor I2D Backend
+"""
+from rest_framework.parsers import JSONParser
+
+
+class SharedJSONParser(JSONParser):
+    """
+    JSONParser reusing the body already parsed by DataQualityMiddleware
+
+    The middleware parses JSON bodies to validate them and stores the result
+    on the request as ``parsed_json``; reusing it means every body is decoded
+    and parsed once. Bodies with a charset other than UTF-8, which the
+    middleware does not decode the way this parser would, are parsed again.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get('request')
+        django_request = getattr(request, '_request', None)
+        if django_request is not None and hasattr(django_request, 'parsed_json'):
+            charset = django_request.content_params.get('charset', 'utf-8').lower()
+            if charset in ('utf-8', 'utf8'):
+                return django_request.parsed_json
+        return super().parse(stream, media_type, parser_context)
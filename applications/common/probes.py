@@ -0,0 +1,243 @@
+"""
+External dependency probes for Visor I2D Backend
+
+Probes are configured in the ``DEPENDENCY_PROBES`` setting, one dict per
+dependency::
+
+    DEPENDENCY_PROBES = [
+        {'name': 'geoserver', 'type': 'http', 'url': 'https://.../geoserver/web/', 'critical': True},
+        {'name': 'gbif_db', 'type': 'sql', 'sql': 'SELECT 1 FROM gbif_consultas.mpio_queries LIMIT 1'},
+        {'name': 'redis', 'type': 'tcp', 'host': 'redis', 'port': 6379},
+    ]
+
+Common keys: ``timeout`` (seconds, default 5), ``interval`` (seconds a
+result is kept, default 60), ``critical`` (a failure makes /health/
+unhealthy instead of warning), and circuit breaker ``failure_threshold``
+(default 3) and ``reset_timeout`` (default 60).
+
+HealthCheckService runs every probe as a ``dependency:<name>`` check, on its
+pool and background ticker, so dependency latency is measured continuously
+off the request path and observed in ``dependency_probe_duration_seconds``.
+After ``failure_threshold`` consecutive failures a probe's circuit opens and
+the dependency is not contacted again until ``reset_timeout`` has passed;
+then one trial call closes the circuit or opens it again.
+"""
+import functools
+import socket
+import threading
+import time
+
+import requests
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from .metrics import Gauge, Histogram, registry
+from .statement_timeout import statement_timeout
+
+
+PROBE_DURATION = Histogram('dependency_probe_duration_seconds', 'Latency of dependency probes', ['probe'])
+PROBE_UP = Gauge('dependency_up', 'Whether the last probe of a dependency succeeded', ['probe'])
+PROBE_CIRCUIT_OPEN = Gauge('dependency_circuit_open', 'Whether the circuit of a dependency is open', ['probe'])
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class ProbeError(Exception):
+    """The dependency answered, but not as expected"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker"""
+
+    def __init__(self, failure_threshold=3, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def retry_in(self):
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def allow(self):
+        """Return True if a call may go through (closed, or the half-open trial)"""
+        with self.lock:
+            state = self.state
+            if state == HALF_OPEN:
+                # Let a single trial through; others wait for its outcome
+                self.opened_at = time.monotonic()
+            return state != OPEN
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class Probe:
+    """Base class: subclasses implement probe() and raise on failure"""
+    type = None
+
+    def __init__(self, name, timeout=5, interval=60, critical=False, failure_threshold=3, reset_timeout=60):
+        self.name = name
+        self.timeout = timeout
+        self.interval = interval
+        self.critical = critical
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.up = None
+
+    def probe(self):
+        """Contact the dependency; return a dict of extra details"""
+        raise NotImplementedError
+
+    def describe(self):
+        return self.type
+
+    def check(self):
+        """Run the probe through the circuit breaker and return a health check result"""
+        failure_status = 'unhealthy' if self.critical else 'warning'
+        base = {'type': self.type, 'target': self.describe(), 'critical': self.critical}
+
+        if not self.breaker.allow():
+            return {
+                **base,
+                'status': failure_status,
+                'message': f'Circuit open after {self.breaker.failures} failures; '
+                           f'retrying in {self.breaker.retry_in():.0f}s',
+                'circuit': OPEN,
+                'timestamp': time.time()
+            }
+
+        start = time.perf_counter()
+        try:
+            details = self.probe() or {}
+        except Exception as e:
+            self.breaker.record_failure()
+            self.up = False
+            status_level, message, details = failure_status, f'{self.name} probe failed: {e}', {}
+        else:
+            self.breaker.record_success()
+            self.up = True
+            status_level, message = 'healthy', f'{self.name} is reachable'
+        duration = time.perf_counter() - start
+        PROBE_DURATION.observe(duration, probe=self.name)
+
+        return {
+            **base,
+            **details,
+            'status': status_level,
+            'message': message,
+            'response_time_ms': round(duration * 1000, 2),
+            'circuit': self.breaker.state,
+            'timestamp': time.time()
+        }
+
+
+class HTTPProbe(Probe):
+    """GET `url` and expect a status in `expected_status` (default: any 2xx or 3xx)"""
+    type = 'http'
+
+    def __init__(self, name, url, expected_status=None, method='GET', **kwargs):
+        super().__init__(name, **kwargs)
+        self.url = url
+        self.expected_status = set(expected_status) if expected_status else None
+        self.method = method
+
+    def describe(self):
+        return self.url
+
+    def probe(self):
+        response = requests.request(self.method, self.url, timeout=self.timeout, allow_redirects=False)
+        response.close()
+        ok = response.status_code in self.expected_status if self.expected_status else response.status_code < 400
+        if not ok:
+            raise ProbeError(f'HTTP {response.status_code}')
+        return {'http_status': response.status_code}
+
+
+class TCPProbe(Probe):
+    """Open a TCP connection to `host`:`port`"""
+    type = 'tcp'
+
+    def __init__(self, name, host, port, **kwargs):
+        super().__init__(name, **kwargs)
+        self.host = host
+        self.port = int(port)
+
+    def describe(self):
+        return f'{self.host}:{self.port}'
+
+    def probe(self):
+        socket.create_connection((self.host, self.port), timeout=self.timeout).close()
+
+
+class SQLProbe(Probe):
+    """Run `sql` on database `alias`"""
+    type = 'sql'
+
+    def __init__(self, name, sql='SELECT 1', alias='default', **kwargs):
+        super().__init__(name, **kwargs)
+        self.sql = sql
+        self.alias = alias
+
+    def describe(self):
+        return f'{self.alias}: {self.sql}'
+
+    def probe(self):
+        with statement_timeout('health', self.timeout * 1000), connections[self.alias].cursor() as cursor:
+            cursor.execute(self.sql)
+            cursor.fetchone()
+
+
+PROBE_TYPES = {
+    'http': HTTPProbe,
+    'tcp': TCPProbe,
+    'sql': SQLProbe,
+}
+
+
+def build_probe(config):
+    """Build a probe from a DEPENDENCY_PROBES entry; 'type' is a PROBE_TYPES key or a dotted path"""
+    config = dict(config)
+    probe_type = config.pop('type')
+    probe_class = PROBE_TYPES.get(probe_type) or import_string(probe_type)
+    return probe_class(**config)
+
+
+@functools.lru_cache(maxsize=None)
+def get_probes():
+    """Return the probes of the DEPENDENCY_PROBES setting, built once per process"""
+    from django.conf import settings
+
+    return [build_probe(config) for config in getattr(settings, 'DEPENDENCY_PROBES', [])]
+
+
+def _probe_collector():
+    if not get_probes.cache_info().currsize:
+        return []
+    samples = []
+    for probe in get_probes():
+        labels = {'probe': probe.name}
+        if probe.up is not None:
+            samples.append((PROBE_UP, labels, int(probe.up)))
+        samples.append((PROBE_CIRCUIT_OPEN, labels, int(probe.breaker.state == OPEN)))
+    return samples
+
+
+registry.add_collector(_probe_collector)
@@ -0,0 +1,176 @@
+"""
+Sampling CPU profiler for live workers
+
+``GET /admin/cpu-profile/?seconds=10`` (staff only) samples the stacks of
+every thread of the worker that serves it for the given time and returns
+them in the collapsed-stack format read by flamegraph.pl and speedscope::
+
+    gevent/hub.py:run;applications/gbif/views.py:descargarzip;applications/gbif/views.py:generar_csv 412
+
+The sampler is a native thread even under gevent's monkey patching, so it
+keeps sampling while a greenlet hogs the CPU; in the gevent worker every
+greenlet runs on the main thread, and the sample shows whichever greenlet
+is running. Samples of threads blocked in a wait (idle log listeners, the
+gevent hub with nothing to do) are left out unless ``idle=1``.
+"""
+import os
+import sys
+import sysconfig
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_http_methods
+
+try:
+    from gevent import monkey
+except ImportError:  # pragma: no cover - gevent is only installed in production images
+    monkey = None
+
+
+MAX_SECONDS = 60
+# Python-level leaf frames of threads blocked outside the application
+IDLE_FUNCTIONS = {'wait', '_wait_for_tstate_lock', 'get', 'select', 'poll', 'accept', 'sleep', 'run', 'readline'}
+
+
+def _native(module, name):
+    """Return the unpatched `module.name` when gevent has monkey-patched it"""
+    if monkey is not None:
+        return monkey.get_original(module, name)
+    return getattr(__import__(module), name)
+
+
+start_new_thread = _native('_thread', 'start_new_thread')
+get_ident = _native('_thread', 'get_ident')
+allocate_lock = _native('_thread', 'allocate_lock')
+native_sleep = _native('time', 'sleep')
+
+# One profile per process at a time
+_profile_lock = allocate_lock()
+
+
+# 'file:function' per code object, with project, site-packages and stdlib prefixes removed
+_labels = {}
+
+
+def _frame_label(code):
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        for prefix in (str(settings.BASE_DIR) + os.sep, 'site-packages' + os.sep,
+                       sysconfig.get_paths()['stdlib'] + os.sep):
+            index = filename.rfind(prefix)
+            if index != -1:
+                filename = filename[index + len(prefix):]
+                break
+        label = _labels[code] = f'{filename}:{code.co_name}'
+    return label
+
+
+class StackSampler:
+    """Sample the stacks of all threads every `interval` seconds on a native thread"""
+
+    def __init__(self, interval=0.005, include_idle=False, exclude=()):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.exclude = set(exclude)
+        self.stacks = Counter()
+        self.samples = 0
+        self.running = False
+        self.finished = allocate_lock()
+        self.base_dir = str(settings.BASE_DIR)
+
+    def start(self):
+        self.running = True
+        self.finished.acquire()
+        start_new_thread(self._run, ())
+
+    def stop(self):
+        """Stop sampling and wait (at most one interval) for the sampler thread to finish"""
+        self.running = False
+        self.finished.acquire()
+        self.finished.release()
+
+    def _run(self):
+        self.exclude.add(get_ident())
+        try:
+            while self.running:
+                self.sample()
+                native_sleep(self.interval)
+        finally:
+            self.finished.release()
+
+    def sample(self):
+        self.samples += 1
+        for ident, frame in sys._current_frames().items():
+            if ident in self.exclude:
+                continue
+            if not self.include_idle and self.is_idle(frame.f_code):
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(labels))] += 1
+
+    def is_idle(self, code):
+        return code.co_name in IDLE_FUNCTIONS and not code.co_filename.startswith(self.base_dir)
+
+    def collapsed(self):
+        """Return the samples in the collapsed-stack format, one 'stack count' line per stack"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def profile(seconds, interval=0.005, include_idle=False):
+    """Sample this process for `seconds` and return the StackSampler"""
+    if monkey is not None and monkey.is_module_patched('threading'):
+        # Every greenlet runs on this thread, and this one yields while it sleeps
+        exclude = ()
+    else:
+        exclude = (get_ident(),)
+    sampler = StackSampler(interval, include_idle, exclude)
+    sampler.start()
+    try:
+        # Patched (cooperative) under gevent, so the worker keeps serving requests
+        time.sleep(seconds)
+    finally:
+        sampler.stop()
+    return sampler
+
+
+def _float_param(request, name, default, minimum, maximum):
+    try:
+        value = float(request.GET.get(name, default))
+    except ValueError:
+        return None
+    return value if minimum <= value <= maximum else None
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def cpu_profile(request):
+    """
+    Sample this worker for ?seconds= (default 10, at most 60) every
+    ?interval= milliseconds (default 5) and return the collapsed stacks
+    """
+    seconds = _float_param(request, 'seconds', 10, 0.1, MAX_SECONDS)
+    interval = _float_param(request, 'interval', 5, 1, 1000)
+    if seconds is None or interval is None:
+        return JsonResponse(
+            {'error': f'seconds must be between 0.1 and {MAX_SECONDS}, interval between 1 and 1000 ms'},
+            status=400,
+        )
+
+    if not _profile_lock.acquire(False):
+        return JsonResponse({'error': 'A profile of this worker is already running'}, status=409)
+    try:
+        sampler = profile(seconds, interval / 1000, request.GET.get('idle') == '1')
+    finally:
+        _profile_lock.release()
+
+    response = HttpResponse(sampler.collapsed(), content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename=cpu-{os.getpid()}-{int(time.time())}.collapsed'
+    response['X-Profile-Samples'] = str(sampler.samples)
+    return response
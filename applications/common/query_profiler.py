@@ -0,0 +1,204 @@
+"""
+Per-request SQL query profiling for Visor I2D Backend
+
+Opt-in: every request is profiled when the ``QUERY_PROFILING`` setting is on
+(development), and a single request can ask for it with an
+``X-Query-Profile`` header when DEBUG is on or the user is staff.
+
+The profile has the query count, total database time, queries run more than
+once with the same parameters, and N+1 patterns: the same query shape run at
+least ``QUERY_PROFILING_N_PLUS_ONE_THRESHOLD`` times from the same line of
+application code. It is returned in a ``Server-Timing`` header, and with
+``X-Query-Profile: json`` JSON responses are wrapped as
+``{"data": <response>, "query_profile": {...}}``. N+1 patterns are also
+logged as warnings.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_QUERY_PROFILE'
+APPLICATIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+
+# IN (%s, %s, ...) lists vary with the number of ids, not with the query shape
+IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)')
+WHITESPACE = re.compile(r'\s+')
+
+# Frames of the database execute wrappers themselves
+WRAPPER_FILES = {os.path.join(APPLICATIONS_DIR, 'common', name) for name in ('query_profiler.py', 'metrics.py')}
+
+
+def fingerprint(sql):
+    """Return the shape of `sql` shared by runs with different parameters"""
+    return IN_LIST.sub('IN (...)', WHITESPACE.sub(' ', sql).strip())
+
+
+def get_caller():
+    """Return 'file:line in function' of the innermost application frame running a query"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APPLICATIONS_DIR) and filename not in WRAPPER_FILES:
+            return f'{os.path.relpath(filename, APPLICATIONS_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+class QueryProfile:
+    """Database execute wrapper recording every query of a request"""
+
+    def __init__(self, n_plus_one_threshold=5):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, repr(params), time.perf_counter() - start, get_caller()))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration_ms(self):
+        return sum(query[2] for query in self.queries) * 1000
+
+    def duplicates(self):
+        """Queries run more than once with the same parameters"""
+        counts = Counter((sql, params) for sql, params, _, _ in self.queries)
+        return [
+            {'sql': sql, 'count': count}
+            for (sql, _), count in counts.most_common() if count > 1
+        ]
+
+    def n_plus_one(self):
+        """Query shapes run at least n_plus_one_threshold times from the same caller"""
+        groups = defaultdict(list)
+        for sql, _, duration, caller in self.queries:
+            groups[(fingerprint(sql), caller)].append(duration)
+        return sorted(
+            (
+                {
+                    'fingerprint': hashlib.md5(sql.encode(), usedforsecurity=False).hexdigest()[:12],
+                    'sql': sql,
+                    'caller': caller,
+                    'count': len(durations),
+                    'duration_ms': round(sum(durations) * 1000, 2),
+                }
+                for (sql, caller), durations in groups.items()
+                if len(durations) >= self.n_plus_one_threshold
+            ),
+            key=lambda pattern: pattern['count'], reverse=True,
+        )
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'duration_ms': round(self.duration_ms, 2),
+            'duplicates': self.duplicates(),
+            'n_plus_one': self.n_plus_one(),
+        }
+
+    def server_timing(self, summary):
+        desc = f"{summary['count']} queries, {len(summary['duplicates'])} duplicated, " \
+               f"{len(summary['n_plus_one'])} N+1"
+        return f'queries;dur={summary["duration_ms"]};desc="{desc}"'
+
+
+class QueryProfilingMiddleware:
+    """
+    Profile the SQL queries of opted-in requests
+
+    Listed after AuthenticationMiddleware so the staff check can see the
+    session user; queries made by earlier middleware are not included.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.always = getattr(settings, 'QUERY_PROFILING', False)
+        self.threshold = getattr(settings, 'QUERY_PROFILING_N_PLUS_ONE_THRESHOLD', 5)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def is_requested(self, request):
+        if self.always:
+            return True
+        if PROFILE_HEADER not in request.META:
+            return False
+        user = getattr(request, 'user', None)
+        return settings.DEBUG or bool(user is not None and user.is_staff)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.is_requested(request):
+            return self.get_response(request)
+
+        profile = QueryProfile(self.threshold)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+        return self.report(request, response, profile)
+
+    async def __acall__(self, request):
+        # The session user is loaded lazily with a database query, so only opted-in requests check it
+        if not (self.always or PROFILE_HEADER in request.META) or not await sync_to_async(self.is_requested)(request):
+            return await self.get_response(request)
+
+        profile = QueryProfile(self.threshold)
+        with ExitStack() as stack:
+            # Connections are context-local, so the views' sync_to_async threads use these
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = await self.get_response(request)
+        return self.report(request, response, profile)
+
+    def report(self, request, response, profile):
+        """Log N+1 patterns and add the profile to the response"""
+        summary = profile.summary()
+        for pattern in summary['n_plus_one']:
+            logger.warning(
+                'N+1 queries on %s: %s queries from %s: %s',
+                request.path, pattern['count'], pattern['caller'], pattern['sql'][:200],
+            )
+
+        timing = profile.server_timing(summary)
+        existing = response.get('Server-Timing')
+        response['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+        if request.META.get(PROFILE_HEADER) == 'json':
+            self.add_envelope(response, summary)
+        return response
+
+    @staticmethod
+    def add_envelope(response, summary):
+        """Wrap a JSON response body as {"data": ..., "query_profile": ...}"""
+        if response.streaming or not response.get('Content-Type', '').startswith('application/json'):
+            return
+        try:
+            data = json.loads(response.content)
+        except ValueError:
+            return
+        response.content = json.dumps({'data': data, 'query_profile': summary}, cls=DjangoJSONEncoder)
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
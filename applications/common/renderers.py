@@ -0,0 +1,120 @@
+"""
+High-performance JSON renderers for Visor I2D Backend
+"""
+import json
+import logging
+import math
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+from .timing import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+class GeoJSONEncoder(encoders.JSONEncoder):
+    """DRF JSON encoder that also knows how to encode GEOS geometries"""
+
+    def default(self, obj):
+        if isinstance(obj, GEOSGeometry):
+            return json.loads(obj.geojson)
+        return super().default(obj)
+
+
+# Raw UTF-8 encodings of U+2028 / U+2029, escaped by DRF for JS compatibility
+_LINE_SEPARATOR = '\u2028'.encode()
+_PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+def has_non_finite(data):
+    """Return whether `data` contains NaN or infinite floats (or Decimals)"""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, Decimal):
+            if not value.is_finite():
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+def get_json_backend():
+    """
+    Return the JSON backend in use: 'orjson' or 'stdlib'
+
+    Controlled by the JSON_RENDERER_BACKEND setting ('auto', 'orjson' or
+    'stdlib'). 'auto' uses orjson when it is installed.
+    """
+    backend = getattr(settings, 'JSON_RENDERER_BACKEND', 'auto')
+    if backend == 'stdlib' or orjson is None:
+        return 'stdlib'
+    return 'orjson'
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer backed by orjson
+
+    Produces JSON equivalent to JSONRenderer's compact output; number
+    formatting may differ (orjson writes ``1e16`` and ``1e-7`` where json
+    writes ``1e+16`` and ``1e-07``). Types orjson does not handle natively
+    (Decimal, datetimes, lazy strings, GEOS geometries...) are passed
+    through the DRF encoder so their representation does not change.
+    Falls back to the stdlib renderer when orjson is unavailable,
+    pretty-printing is requested or the payload cannot be encoded by
+    orjson (e.g. integers wider than 64 bits). orjson writes NaN and
+    Infinity as ``null``, so with ``STRICT_JSON`` on (DRF's default) a
+    payload containing them goes to the stdlib renderer too, which raises
+    ValueError exactly like JSONRenderer.
+    """
+    encoder_class = GeoJSONEncoder
+
+    if orjson is not None:
+        ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    else:  # pragma: no cover
+        ORJSON_OPTIONS = 0
+
+    def __init__(self):
+        super().__init__()
+        self._encoder = self.encoder_class()
+
+    @timed('render')
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render `data` into JSON, returning a bytestring"""
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if (get_json_backend() == 'stdlib'
+                or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self._encoder.default, option=self.ORJSON_OPTIONS)
+        except (orjson.JSONEncodeError, TypeError) as e:
+            logger.debug(f"orjson could not encode payload, using stdlib json: {e}")
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Non-finite floats are the only values orjson turns into null
+        if self.strict and b'null' in ret and has_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if _LINE_SEPARATOR in ret or _PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(_LINE_SEPARATOR, b'\\u2028').replace(_PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
@@ -0,0 +1,142 @@
+"""
+Pre-rendered OpenAPI schema for Visor I2D Backend
+
+Generating the schema walks every view and ``swagger_auto_schema``
+decorator, so it is rendered once, when the image is built, by
+
+    python manage.py generate_openapi_schema
+
+into ``OPENAPI_SCHEMA_DIR`` (``schema.json`` and ``schema.yaml``). The spec
+responses of ``/api/schema/``, ``/api/docs/`` and ``/api/redoc/``
+(``?format=openapi``, ``json`` or ``yaml``) serve those bytes with a
+content-hash ETag, so clients revalidate with a 304; the Swagger UI and
+ReDoc pages themselves never needed the full schema.
+
+With ``OPENAPI_SCHEMA_LIVE`` on (the default of settings.local), or when
+the artifact is missing, the schema is rendered in the process on first
+use instead. The development server restarts on code changes, so the live
+schema always matches the code.
+"""
+import functools
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from rest_framework import permissions
+from rest_framework.request import Request
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_NAMES = {'json': 'schema.json', 'yaml': 'schema.yaml'}
+
+
+def get_api_info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="Visor I2D API",
+        default_version='v1',
+        description="Colombian Biodiversity Data API - Instituto Alexander von Humboldt",
+        terms_of_service="https://www.google.com/policies/terms/",
+        contact=openapi.Contact(email="contact@humboldt.org.co"),
+        license=openapi.License(name="BSD License"),
+    )
+
+
+def render_schema():
+    """Return the public schema rendered in each format, as {format: bytes}"""
+    from drf_yasg.app_settings import swagger_settings
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+
+    # No host or scheme: the docs use those of the page, whatever proxy serves it
+    generator = swagger_settings.DEFAULT_GENERATOR_CLASS(get_api_info(), url='')
+    # Views read the query string of the (anonymous) request in get_queryset()
+    schema = generator.get_schema(request=Request(HttpRequest()), public=True)
+    return {
+        'json': OpenAPICodecJson(validators=[]).encode(schema),
+        'yaml': OpenAPICodecYaml(validators=[]).encode(schema),
+    }
+
+
+def write_schema(directory=None):
+    """Render the schema into `directory` (default OPENAPI_SCHEMA_DIR); return the written paths"""
+    directory = Path(directory or settings.OPENAPI_SCHEMA_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for fmt, content in render_schema().items():
+        path = directory / ARTIFACT_NAMES[fmt]
+        path.write_bytes(content)
+        paths.append(path)
+    return paths
+
+
+class SchemaArtifact:
+    """One rendering of the schema and its ETag"""
+
+    def __init__(self, content):
+        self.content = content
+        self.etag = quote_etag(hashlib.sha256(content).hexdigest()[:32])
+
+
+_artifacts = None
+_lock = threading.Lock()
+
+
+def load_artifacts():
+    if not getattr(settings, 'OPENAPI_SCHEMA_LIVE', False):
+        directory = Path(settings.OPENAPI_SCHEMA_DIR)
+        try:
+            return {fmt: SchemaArtifact((directory / name).read_bytes()) for fmt, name in ARTIFACT_NAMES.items()}
+        except FileNotFoundError:
+            logger.warning('No OpenAPI schema in %s, rendering it in process '
+                           '(run manage.py generate_openapi_schema at build time)', directory)
+    return {fmt: SchemaArtifact(content) for fmt, content in render_schema().items()}
+
+
+def get_artifact(fmt):
+    """Return the SchemaArtifact of `fmt`, loading or rendering the schema once per process"""
+    global _artifacts
+    if _artifacts is None:
+        with _lock:
+            if _artifacts is None:
+                _artifacts = load_artifacts()
+    return _artifacts[fmt]
+
+
+def reset_artifacts():
+    global _artifacts
+    _artifacts = None
+
+
+@functools.lru_cache(maxsize=None)
+def get_schema_view():
+    """Return the drf_yasg SchemaView class answering spec requests with the pre-rendered schema"""
+    from drf_yasg.renderers import OpenAPIRenderer, SwaggerJSONRenderer, SwaggerYAMLRenderer
+    from drf_yasg.views import get_schema_view as get_yasg_schema_view
+
+    base = get_yasg_schema_view(get_api_info(), public=True, permission_classes=(permissions.AllowAny,))
+
+    class SchemaView(base):
+        def get(self, request, version='', format=None):
+            renderer = request.accepted_renderer
+            if isinstance(renderer, SwaggerYAMLRenderer):
+                artifact = get_artifact('yaml')
+            elif isinstance(renderer, (OpenAPIRenderer, SwaggerJSONRenderer)):
+                artifact = get_artifact('json')
+            else:
+                # Swagger UI / ReDoc page, which loads the spec with ?format=openapi
+                return super().get(request, version, format)
+
+            response = get_conditional_response(request, etag=artifact.etag) or \
+                HttpResponse(artifact.content, content_type=renderer.media_type)
+            response['ETag'] = artifact.etag
+            # Let clients keep the schema but revalidate it on every use
+            patch_cache_control(response, public=True, no_cache=True)
+            return response
+
+    return SchemaView
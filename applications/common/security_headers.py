@@ -0,0 +1,124 @@
+"""
+Security response headers for Visor I2D Backend
+
+The headers sent on every response are compiled once, at startup, into
+one header set per path prefix: DEFAULT_SECURITY_HEADERS merged with the
+``SECURITY_HEADERS`` setting, then with the longest matching entry of
+``SECURITY_HEADER_OVERRIDES``. A header mapped to None is removed. Each set
+is validated once and kept as (name, value) pairs, so applying it only
+assigns them through the response's public headers API.
+
+Kept free of module-level Django imports so settings modules can reference
+add_static_security_headers() as WHITENOISE_ADD_HEADERS_FUNCTION.
+"""
+import functools
+import re
+
+DEFAULT_CSP = (
+    "default-src 'self'; "
+    "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
+    "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; "
+    "font-src 'self' https://fonts.gstatic.com; "
+    "img-src 'self' data: https:; "
+    "connect-src 'self' https://api.gbif.org; "
+    "frame-ancestors 'none';"
+)
+
+DEFAULT_SECURITY_HEADERS = {
+    'Content-Security-Policy': DEFAULT_CSP,
+    'X-Frame-Options': 'DENY',
+    'X-Content-Type-Options': 'nosniff',
+    'X-XSS-Protection': '1; mode=block',
+    'Referrer-Policy': 'strict-origin-when-cross-origin',
+    'Permissions-Policy': (
+        "geolocation=(), microphone=(), camera=(), "
+        "payment=(), usb=(), magnetometer=(), gyroscope=()"
+    ),
+    'Server': None,
+}
+
+DEFAULT_SECURITY_HEADER_OVERRIDES = {
+    # JSON responses load nothing, so they get the strictest policy
+    '/api/': {
+        'Content-Security-Policy': "default-src 'none'; frame-ancestors 'none'",
+    },
+    # Swagger UI and ReDoc pages (ReDoc runs a web worker from a blob: URL)
+    '/api/docs/': {
+        'Content-Security-Policy': DEFAULT_CSP + " worker-src 'self' blob:;",
+    },
+    '/api/redoc/': {
+        'Content-Security-Policy': DEFAULT_CSP + " worker-src 'self' blob:;",
+    },
+    # Admin URLs carry object ids; keep them out of Referer headers to other sites
+    '/admin/': {
+        'Referrer-Policy': 'same-origin',
+    },
+}
+
+
+class HeaderSet:
+    """Precompiled headers to set and header names to remove"""
+
+    def __init__(self, headers):
+        from django.http.response import ResponseHeaders
+
+        self.headers = {name: value for name, value in headers.items() if value is not None}
+        # Raises BadHeaderError at startup for names or values HttpResponse would reject
+        self.items = tuple(ResponseHeaders(self.headers).items())
+        self.removed = [name for name, value in headers.items() if value is None]
+
+    def apply(self, response):
+        headers = response.headers
+        for name, value in self.items:
+            headers[name] = value
+        for name in self.removed:
+            headers.pop(name, None)
+        return response
+
+
+class SecurityHeaderSets:
+    """Header sets for every configured path prefix, matched with one precompiled regex"""
+
+    def __init__(self, headers=None, overrides=None):
+        base = dict(DEFAULT_SECURITY_HEADERS)
+        base.update(headers or {})
+        self.default = HeaderSet(base)
+
+        prefixes = sorted(overrides or {}, key=len, reverse=True)
+        self.sets = [HeaderSet({**base, **overrides[prefix]}) for prefix in prefixes]
+        # Alternatives are tried in order, so the longest prefix wins
+        self.pattern = re.compile('|'.join(f'({re.escape(prefix)})' for prefix in prefixes)) if prefixes else None
+
+    @classmethod
+    def from_settings(cls):
+        from django.conf import settings
+
+        return cls(
+            getattr(settings, 'SECURITY_HEADERS', None),
+            getattr(settings, 'SECURITY_HEADER_OVERRIDES', DEFAULT_SECURITY_HEADER_OVERRIDES),
+        )
+
+    def for_path(self, path):
+        match = self.pattern.match(path) if self.pattern else None
+        return self.sets[match.lastindex - 1] if match else self.default
+
+    def apply(self, path, response):
+        """Add the security headers for `path` to `response`"""
+        return self.for_path(path).apply(response)
+
+
+@functools.lru_cache(maxsize=None)
+def get_security_header_sets():
+    """Return the SecurityHeaderSets compiled from the settings, built once per process"""
+    return SecurityHeaderSets.from_settings()
+
+
+def add_static_security_headers(headers, path, url):
+    """
+    WhiteNoise hook: add the security headers to a static file
+
+    WhiteNoise calls this once per file when it builds its file index, so
+    static responses carry the headers at no per-request cost.
+    """
+    for name, value in get_security_header_sets().for_path(url).headers.items():
+        headers[name] = value
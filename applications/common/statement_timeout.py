@@ -0,0 +1,165 @@
+"""
+Per-route statement timeouts for Visor I2D Backend
+
+Every request gets the statement timeout budget of its route class
+(``STATEMENT_TIMEOUT_ROUTES`` maps path prefixes to classes, anything else
+is ``interactive``; ``STATEMENT_TIMEOUTS`` holds the budget of each class in
+milliseconds). On PostgreSQL each query of the request is sent as
+
+    SET LOCAL statement_timeout = 25000; <query>
+
+in the same round trip. The two statements run as one implicit
+transaction (or inside the open ``atomic`` block), so the limit never
+outlives the query and cannot leak into the next request through a pooled
+connection. Postgres cancels a query that runs over its budget; the
+cancellation is counted in ``db_statement_timeouts_total``, logged, and
+answered with a 503 by ErrorHandlingMiddleware instead of the worker
+hanging until gunicorn kills it.
+
+Code outside requests (health check threads, management commands) sets a
+budget with ``with statement_timeout('health'):``.
+"""
+import logging
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import Counter
+
+try:
+    import psycopg2
+    from psycopg2.extensions import QueryCanceledError
+except ImportError:  # pragma: no cover - psycopg2 is installed wherever PostgreSQL is used
+    psycopg2 = None
+    QueryCanceledError = None
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_TIMEOUTS_TOTAL = Counter(
+    'db_statement_timeouts_total', 'Queries cancelled for exceeding the statement timeout budget', ['route_class']
+)
+
+DEFAULT_ROUTE_CLASS = 'interactive'
+
+
+class Budget:
+    """Statement timeout of the current request or block"""
+    __slots__ = ('route_class', 'milliseconds', 'path', 'prefix')
+
+    def __init__(self, route_class, milliseconds, path=None):
+        self.route_class = route_class
+        self.milliseconds = int(milliseconds)
+        self.path = path
+        self.prefix = f'SET LOCAL statement_timeout = {self.milliseconds}; '
+
+    def record_timeout(self, sql):
+        STATEMENT_TIMEOUTS_TOTAL.inc(route_class=self.route_class)
+        logger.warning(
+            'Query cancelled after %sms (%s budget) on %s: %s',
+            self.milliseconds, self.route_class, self.path or '-', str(sql)[:200],
+        )
+
+
+_budget = ContextVar('statement_timeout_budget', default=None)
+
+
+def get_budget_ms(route_class):
+    timeouts = getattr(settings, 'STATEMENT_TIMEOUTS', {})
+    return timeouts.get(route_class, timeouts.get(DEFAULT_ROUTE_CLASS))
+
+
+@contextmanager
+def statement_timeout(route_class, milliseconds=None, path=None):
+    """Apply the budget of `route_class` (or `milliseconds`) to the queries of this block"""
+    if milliseconds is None:
+        milliseconds = get_budget_ms(route_class)
+    token = _budget.set(Budget(route_class, milliseconds, path) if milliseconds else None)
+    try:
+        yield
+    finally:
+        _budget.reset(token)
+
+
+def current_budget():
+    return _budget.get()
+
+
+def is_statement_timeout(exception):
+    """Whether `exception` (or the database error it wraps) is a statement timeout cancellation"""
+    if QueryCanceledError is None:
+        return False
+    while exception is not None:
+        if isinstance(exception, QueryCanceledError):
+            return True
+        exception = exception.__cause__
+    return False
+
+
+if psycopg2 is not None:
+    class StatementTimeoutCursor(psycopg2.extensions.cursor):
+        """psycopg2 cursor prefixing queries with the budget of the current request"""
+
+        def execute(self, query, vars=None):
+            budget = _budget.get()
+            # Server-side (named) cursors wrap the query in DECLARE, which takes a single statement
+            if budget is None or self.name is not None or not isinstance(query, str):
+                return super().execute(query, vars)
+            try:
+                return super().execute(budget.prefix + query, vars)
+            except QueryCanceledError:
+                budget.record_timeout(query)
+                raise
+
+        def executemany(self, query, vars_list):
+            budget = _budget.get()
+            if budget is None or self.name is not None or not isinstance(query, str):
+                return super().executemany(query, vars_list)
+            try:
+                return super().executemany(budget.prefix + query, vars_list)
+            except QueryCanceledError:
+                budget.record_timeout(query)
+                raise
+
+
+@receiver(connection_created)
+def install_statement_timeout_cursor(sender, connection, **kwargs):
+    """Make PostgreSQL (psycopg2) connections create StatementTimeoutCursors"""
+    if connection.vendor == 'postgresql' and psycopg2 is not None and \
+            isinstance(connection.connection, psycopg2.extensions.connection):
+        connection.connection.cursor_factory = StatementTimeoutCursor
+
+
+class StatementTimeoutMiddleware:
+    """Give each request the statement timeout budget of its route class"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        routes = getattr(settings, 'STATEMENT_TIMEOUT_ROUTES', [])
+        self.routes = re.compile('|'.join(
+            f'(?P<r{i}>{re.escape(prefix)})' for i, (prefix, _) in enumerate(routes)
+        )) if routes else None
+        self.route_classes = {f'r{i}': route_class for i, (_, route_class) in enumerate(routes)}
+
+    def get_route_class(self, path):
+        match = self.routes.match(path) if self.routes is not None else None
+        return self.route_classes[match.lastgroup] if match else DEFAULT_ROUTE_CLASS
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with statement_timeout(self.get_route_class(request.path), path=request.path):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with statement_timeout(self.get_route_class(request.path), path=request.path):
+            return await self.get_response(request)
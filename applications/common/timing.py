@@ -0,0 +1,146 @@
+"""
+Server-Timing instrumentation for Visor I2D Backend
+
+Hot paths mark their phases with ``timed``, as a context manager or a
+decorator:
+
+    with timed('zip'):
+        ...
+
+    @timed('render')
+    def render(self, data, ...):
+
+While a request is being timed (``SERVER_TIMING`` setting, on by default)
+the phase durations are added up per request, sent in a W3C
+``Server-Timing`` header (``sql;dur=12.1, csv;dur=40.3, db;dur=12.4, total;dur=58.0``)
+and observed in the ``request_phase_duration_seconds`` histogram of the
+metrics registry. Outside a timed request, ``timed`` only reads a context
+variable. A phase nested in a phase of the same name (nested serializers)
+is not counted twice.
+"""
+import functools
+import time
+from contextvars import ContextVar
+
+from rest_framework import serializers
+
+from .metrics import Histogram, current_query_counter, get_route
+
+
+PHASE_DURATION = Histogram(
+    'request_phase_duration_seconds', 'Time spent per request phase', ['route', 'phase']
+)
+
+_timings = ContextVar('server_timings', default=None)
+
+
+class Timings:
+    """Phase durations of one request"""
+
+    def __init__(self):
+        self.durations = {}
+        self.active = set()
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def header(self):
+        return ', '.join(f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.durations.items())
+
+
+class timed:
+    """Context manager and decorator timing the phase `name` of the current request"""
+    __slots__ = ('name', 'timings', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        timings = _timings.get()
+        if timings is not None and self.name not in timings.active:
+            timings.active.add(self.name)
+            self.timings = timings
+            self.start = time.perf_counter()
+        else:
+            self.timings = None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings.add(self.name, time.perf_counter() - self.start)
+            self.timings.active.discard(self.name)
+            self.timings = None
+
+    def __call__(self, func):
+        name = self.name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def time_request(get_response, request):
+    """Call get_response(request) collecting its phase timings"""
+    timings = Timings()
+    token = _timings.set(timings)
+    start = time.perf_counter()
+    try:
+        response = get_response(request)
+    finally:
+        _timings.reset(token)
+    return _add_timings(request, response, timings, start)
+
+
+async def atime_request(get_response, request):
+    """time_request for an async get_response"""
+    timings = Timings()
+    token = _timings.set(timings)
+    start = time.perf_counter()
+    try:
+        response = await get_response(request)
+    finally:
+        _timings.reset(token)
+    return _add_timings(request, response, timings, start)
+
+
+def _add_timings(request, response, timings, start):
+    # All database time of the request, counted by the metrics query wrapper
+    queries = current_query_counter()
+    if queries is not None and queries.count:
+        timings.add('db', queries.seconds)
+    timings.add('total', time.perf_counter() - start)
+
+    route = get_route(request)
+    for name, seconds in timings.durations.items():
+        if name not in ('db', 'total'):
+            PHASE_DURATION.observe(seconds, route=route, phase=name)
+
+    header = timings.header()
+    existing = response.get('Server-Timing')
+    response['Server-Timing'] = f'{existing}, {header}' if existing else header
+    return response
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """ListSerializer reporting .data as the 'serialize' phase"""
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+class TimedModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer reporting .data as the 'serialize' phase
+
+    Set ``list_serializer_class = TimedListSerializer`` in Meta to time
+    many=True serialization too.
+    """
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
@@ -0,0 +1,152 @@
+"""
+Shared API views for Visor I2D Backend
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import QuerySet
+from rest_framework import serializers
+from rest_framework.generics import ListAPIView
+from rest_framework.response import Response
+
+
+# Serializer fields whose to_representation() is a no-op for the Python
+# values returned by the database driver
+PASSTHROUGH_FIELDS = {
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.FloatField,
+    serializers.BooleanField,
+}
+
+
+class ValuesListAPIView(ListAPIView):
+    """
+    Read-only list view that skips per-instance serializer work
+
+    Rows are fetched with ``.values_list()`` on the columns declared by
+    ``serializer_class.Meta.fields`` and turned into dicts directly, so no
+    model instances or per-row serializer objects are created. Fields whose
+    representation is not the raw database value (dates, decimals...) are
+    converted with the serializer field's ``to_representation()``, so the
+    JSON shape is exactly what ``serializer_class`` produces.
+
+    ``serializer_class`` is still used for the OpenAPI schema and for
+    ``get_queryset()`` results that are not a QuerySet.
+
+    With ``ASYNC_VIEWS`` on (the ASGI deployment), ``as_view()`` returns an
+    async view: authentication, permission checks and the queries run in a
+    worker thread and the JSON is rendered on the event loop, so the async
+    middleware chain is not switched to a thread for the whole request.
+    """
+
+    @classmethod
+    def get_values_fields(cls):
+        """Return (field_name, source, converter) triples, computed once per view"""
+        cached = cls.__dict__.get('_values_fields')
+        if cached is None:
+            cached = []
+            for name, field in cls.serializer_class().fields.items():
+                converter = None if type(field) in PASSTHROUGH_FIELDS else field.to_representation
+                cached.append((name, field.source, converter))
+            cls._values_fields = cached
+        return cached
+
+    @classmethod
+    def rows_to_data(cls, rows):
+        """Convert ``values_list()`` rows into serializer-shaped dicts"""
+        fields = cls.get_values_fields()
+        names = [name for name, _, _ in fields]
+        converters = [(i, convert) for i, (_, _, convert) in enumerate(fields) if convert is not None]
+
+        if not converters:
+            return [dict(zip(names, row)) for row in rows]
+
+        data = []
+        for row in rows:
+            row = list(row)
+            for i, convert in converters:
+                if row[i] is not None:
+                    row[i] = convert(row[i])
+            data.append(dict(zip(names, row)))
+        return data
+
+    def get_data(self):
+        """Return the response data of the list (runs the database queries)"""
+        queryset = self.filter_queryset(self.get_queryset())
+        if not isinstance(queryset, QuerySet):
+            # Plain iterables (e.g. precomputed lists) go through the serializer
+            return self.get_serializer(queryset, many=True).data
+
+        sources = [source for _, source, _ in self.get_values_fields()]
+        return self.rows_to_data(queryset.values_list(*sources))
+
+    def list(self, request, *args, **kwargs):
+        return Response(self.get_data())
+
+    def get_unrendered_response(self, request):
+        """Run the DRF checks and the queries of a GET, like dispatch() minus rendering"""
+        try:
+            self.initial(request)
+            return Response(self.get_data())
+        except Exception as exc:
+            return self.handle_exception(exc)
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        if not getattr(settings, 'ASYNC_VIEWS', False):
+            return view
+
+        async def async_view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await sync_to_async(view)(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            self.setup(request, *args, **kwargs)
+            request = self.initialize_request(request, *args, **kwargs)
+            self.request = request
+            self.headers = self.default_response_headers
+            response = await sync_to_async(self.get_unrendered_response)(request)
+            return self.finalize_response(request, response, *args, **kwargs).render()
+
+        # cls, initkwargs, csrf_exempt... keep URL resolution and the OpenAPI generator working
+        async_view.__dict__.update(view.__dict__)
+        del async_view.__wrapped__
+        async_view.__name__ = async_view.__qualname__ = view.__name__
+        async_view.__doc__, async_view.__module__ = view.__doc__, view.__module__
+        return async_view
+
+
+class FieldSelectionMixin:
+    """
+    Let clients pick the serialized fields with ``?fields=a,b,c``
+
+    Unselected fields are dropped from the serializer before it runs, so
+    nested or computed fields that were not asked for cost nothing. Views
+    can call ``wants_field()`` in ``get_queryset()`` to skip prefetches.
+    """
+    fields_query_param = 'fields'
+
+    def get_requested_fields(self):
+        """Return the set of requested field names, or None for all fields"""
+        value = self.request.query_params.get(self.fields_query_param) if self.request else None
+        if not value:
+            return None
+        return {name.strip() for name in value.split(',') if name.strip()}
+
+    def wants_field(self, name):
+        requested = self.get_requested_fields()
+        return requested is None or name in requested
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        requested = self.get_requested_fields()
+        if requested is not None and self.request.method == 'GET':
+            target = getattr(serializer, 'child', serializer)
+            unknown = requested - set(target.fields)
+            if unknown:
+                raise serializers.ValidationError({
+                    self.fields_query_param: f"Unknown fields: {', '.join(sorted(unknown))}"
+                })
+            for name in set(target.fields) - requested:
+                target.fields.pop(name)
+        return serializer
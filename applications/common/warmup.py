@@ -0,0 +1,185 @@
+"""
+Worker warm-up for Visor I2D Backend
+
+A worker recycled by gunicorn's ``max_requests`` starts cold: no database
+connection, an unpopulated URL resolver, serializer fields never built and
+empty local-memory caches, all paid by its first requests. ``warm_up()``
+pays them before the worker accepts connections. i2dbackend/gunicorn.conf.py
+calls it from the ``post_worker_init`` hook, which runs once the worker has
+loaded the application (and gevent has patched it). The steps:
+
+- ``urls``: populate the URL resolver (pattern compilation, reverse lookups)
+- ``serializers``: instantiate the serializer of every API view and build
+  the ValuesListAPIView field tables
+- ``database``: connect to every database (the pooled backend keeps the
+  connections for the first requests) and measure replica lag
+- ``caches``: build the cached layer group index of every project
+- ``requests``: call the views of ``WARMUP_PATHS`` (municipality search,
+  charts...) directly, without middleware, so their queries, serializers
+  and renderers have run once and they do not count as traffic
+
+Each step is observed in ``worker_warmup_seconds`` and the worker logs its
+total. A failing step is logged and skipped, and once the database cannot
+be reached the steps that need it are skipped too. The steps run in a
+thread given ``WARMUP_TIMEOUT`` seconds in total (well below gunicorn's
+``timeout``, as the worker does not heartbeat before it serves): past the
+deadline the worker starts serving and the thread is left to finish on
+its own, so warm-up never keeps a worker from starting.
+"""
+import io
+import logging
+import os
+import threading
+import time
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import OperationalError, connections
+from django.urls import URLResolver, get_resolver
+
+from .db_router import get_router
+from .metrics import Histogram
+from .statement_timeout import DEFAULT_ROUTE_CLASS, statement_timeout
+
+logger = logging.getLogger(__name__)
+
+WARMUP_SECONDS = Histogram('worker_warmup_seconds', 'Time spent warming up a new worker', ['step'])
+
+
+def iter_callbacks(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_callbacks(pattern.url_patterns)
+        else:
+            yield pattern.callback
+
+
+def warm_urls():
+    resolver = get_resolver()
+    # Compiles every pattern and builds the reverse lookup tables
+    resolver.reverse_dict
+
+
+def warm_serializers():
+    from .views import ValuesListAPIView
+
+    seen = set()
+    for callback in iter_callbacks(get_resolver().url_patterns):
+        view_class = getattr(callback, 'cls', None)
+        serializer_class = getattr(view_class, 'serializer_class', None)
+        if serializer_class is None or view_class in seen:
+            continue
+        seen.add(view_class)
+        try:
+            if issubclass(view_class, ValuesListAPIView):
+                view_class.get_values_fields()
+            else:
+                serializer_class().fields
+        except Exception as e:
+            logger.debug('Could not warm up the serializer of %s: %s', view_class.__name__, e)
+
+
+def warm_database():
+    for alias in connections:
+        connections[alias].ensure_connection()
+    replica_router = get_router()
+    if replica_router is not None:
+        replica_router.measure_all()
+
+
+def warm_caches():
+    from applications.projects.group_index import get_group_index
+    from applications.projects.models import Project
+
+    for project_id in Project.objects.values_list('pk', flat=True):
+        get_group_index(project_id)
+
+
+def make_request(path):
+    """Return an anonymous GET request for `path` (which may include a query string)"""
+    path, _, query_string = path.partition('?')
+    host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+    return WSGIRequest({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query_string,
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'HTTP_HOST': host,
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+    })
+
+
+def warm_requests():
+    resolver = get_resolver()
+    for path in getattr(settings, 'WARMUP_PATHS', []):
+        request = make_request(path)
+        try:
+            match = resolver.resolve(request.path_info)
+            view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+            with statement_timeout(DEFAULT_ROUTE_CLASS, path=path):
+                response = view(request, *match.args, **match.kwargs)
+                if callable(getattr(response, 'render', None)):
+                    response.render()
+        except OperationalError:
+            # The database went away: the other paths would wait on it too
+            raise
+        except Exception as e:
+            logger.warning('Warm-up request %s failed: %s', path, e)
+            continue
+        if response.status_code >= 400:
+            logger.warning('Warm-up request %s answered %s', path, response.status_code)
+
+
+# (name, function, needs the database)
+STEPS = [
+    ('urls', warm_urls, False),
+    ('serializers', warm_serializers, False),
+    ('database', warm_database, True),
+    ('caches', warm_caches, True),
+    ('requests', warm_requests, True),
+]
+
+
+def run_steps(durations):
+    """Run every step, recording the duration of each in `durations`"""
+    database_down = False
+    try:
+        for step, warm, needs_database in STEPS:
+            if needs_database and database_down:
+                logger.warning('Worker warm-up step %s skipped: database unavailable', step)
+                continue
+            step_start = time.perf_counter()
+            try:
+                warm()
+            except OperationalError as e:
+                logger.warning('Worker warm-up step %s failed: %s', step, e)
+                database_down = True
+            except Exception as e:
+                logger.warning('Worker warm-up step %s failed: %s', step, e)
+            durations[step] = time.perf_counter() - step_start
+            WARMUP_SECONDS.observe(durations[step], step=step)
+    finally:
+        # Pooled connections go back to the pool for the first requests
+        connections.close_all()
+
+
+def warm_up():
+    """Run the warm-up steps for at most WARMUP_TIMEOUT seconds; return {step: seconds} of those completed"""
+    if not getattr(settings, 'WARMUP_ENABLED', True):
+        return {}
+    durations = {}
+    start = time.perf_counter()
+    thread = threading.Thread(target=run_steps, args=(durations,), name='worker-warmup', daemon=True)
+    thread.start()
+    thread.join(getattr(settings, 'WARMUP_TIMEOUT', 10))
+    total = time.perf_counter() - start
+    completed = ', '.join(f'{step} {seconds * 1000:.0f} ms' for step, seconds in list(durations.items()))
+    if thread.is_alive():
+        logger.warning('Worker %d warm-up did not finish within %.0f ms, serving anyway (%s)',
+                       os.getpid(), total * 1000, completed)
+        return dict(durations)
+    logger.info('Worker %d warmed up in %.0f ms (%s)', os.getpid(), total * 1000, completed)
+    return durations
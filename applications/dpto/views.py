@@ -1,11 +1,11 @@
 from django.shortcuts import render
-from rest_framework.generics import ListAPIView
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from applications.common.views import ValuesListAPIView
 from .models import DptoQueries, DptoAmenazas
 from .serializers import dptoQueriesSerializer, dptoDangerSerializer
 
-class dptoQuery(ListAPIView):
+class dptoQuery(ValuesListAPIView):
     """
     API endpoint for retrieving biodiversity data charts by department.
     
@@ -51,7 +51,7 @@ class dptoQuery(ListAPIView):
         return DptoQueries.objects.filter(codigo=kid).exclude(tipo__isnull=True).distinct('tipo')
 
 
-class dptoDanger(ListAPIView):
+class dptoDanger(ValuesListAPIView):
     """
     API endpoint for retrieving threat/danger data by department.
     
@@ -1,8 +1,10 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 from . import views
 
 urlpatterns = [
     path('api/gbif/gbifinfo', views.GbifInfo.as_view()),
-    path('api/gbif/descargarz', views.descargarzip, name='descargarzip'),
+    path('api/gbif/descargarz', views.adescargarzip if settings.ASYNC_VIEWS else views.descargarzip,
+         name='descargarzip'),
 ]
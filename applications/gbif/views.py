@@ -1,11 +1,11 @@
 from django.shortcuts import render
 import io
+import re
 import csv
 import zipfile
-from django.http import HttpResponse
-from django.db import connection
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 
-from rest_framework.generics import ListAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -13,10 +13,15 @@ from rest_framework.decorators import api_view
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+from applications.common.db_router import read_connection
+from applications.common.metrics import EXPORT_SIZE
+from applications.common.statement_timeout import current_budget, statement_timeout
+from applications.common.timing import timed
+from applications.common.views import ValuesListAPIView
 from .models import gbifInfo
 from .serializers import gbifInfoSerializer
 
-class GbifInfo(ListAPIView):
+class GbifInfo(ValuesListAPIView):
     """
     API endpoint for retrieving GBIF (Global Biodiversity Information Facility) data.
 
@@ -50,15 +55,142 @@ class GbifInfo(ListAPIView):
 
 def generar_csv(query, params):
     output = io.StringIO()
-    with connection.cursor() as cursor:
-        cursor.execute(query, params)
-        columns = [col[0] for col in cursor.description]
-        writer = csv.writer(output)
-        writer.writerow(columns)
-        for row in cursor:
-            writer.writerow(row)
+    # Export scans run on a read replica when one is available
+    with read_connection('gbif').cursor() as cursor:
+        with timed('sql'):
+            cursor.execute(query, params)
+        with timed('csv'):
+            columns = [col[0] for col in cursor.description]
+            writer = csv.writer(output)
+            writer.writerow(columns)
+            for row in cursor:
+                writer.writerow(row)
     return output.getvalue()
 
+EXPORT_CHUNK_ROWS = 2000
+
+
+def parse_export_params(query_params):
+    """
+    Validate the download parameters.
+
+    Returns (registros_query, especies_query, codigo, nombre), or the error
+    message when the parameters are missing or invalid.
+    """
+    # Validate input parameters
+    codigo_mpio = query_params.get('codigo_mpio')
+    codigo_dpto = query_params.get('codigo_dpto')
+
+    if not codigo_mpio and not codigo_dpto:
+        return 'Debe proporcionar codigo_mpio o codigo_dpto'
+
+    # Validate code format to prevent SQL injection
+    if codigo_mpio:
+        if not re.match(r'^\d{5}$', codigo_mpio):
+            return 'Código de municipio inválido (debe ser 5 dígitos)'
+        table_name = 'mpio_queries'
+        codigo = codigo_mpio
+    else:
+        if not re.match(r'^\d{2}$', codigo_dpto):
+            return 'Código de departamento inválido (debe ser 2 dígitos)'
+        table_name = 'dpto_queries'
+        codigo = codigo_dpto
+
+    # Validate and sanitize filename
+    nombre = query_params.get('nombre', 'descarga_datos')[:50]
+    nombre = re.sub(r'[^a-zA-Z0-9_-]', '', nombre) or 'descarga_datos'
+
+    # Use parameterized queries to prevent SQL injection
+    registros_query = f"""
+        SELECT codigo, tipo, registers, species, exoticas, endemicas, nombre 
+        FROM gbif_consultas.{table_name} 
+        WHERE codigo = %s
+    """
+    
+    especies_query = f"""
+        SELECT DISTINCT 
+            'Animalia' as reino, '' as filo, '' as clase, '' as orden, 
+            '' as familia, '' as genero, species as especies, 
+            endemicas, 0 as amenazadas, exoticas
+        FROM gbif_consultas.{table_name} 
+        WHERE codigo = %s
+    """
+    return registros_query, especies_query, codigo, nombre
+
+
+class ZipChunks:
+    """Unseekable file object collecting what zipfile writes, so the archive can be streamed"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_zip(files, budget=None):
+    """
+    Yield a ZIP archive of CSV exports while it is built.
+
+    `files` is a list of (name, query, params). Rows are fetched and
+    compressed EXPORT_CHUNK_ROWS at a time, so neither the CSV nor the ZIP is
+    held in memory. `budget` is the statement timeout of the request, which
+    has already left the middleware when a streamed body is produced.
+    """
+    buffer = ZipChunks()
+    size = 0
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for name, query, params in files:
+            with zip_file.open(name, 'w') as member, read_connection('gbif').cursor() as cursor:
+                text = io.TextIOWrapper(member, encoding='utf-8', newline='')
+                if budget is not None:
+                    with statement_timeout(budget.route_class, budget.milliseconds, budget.path):
+                        cursor.execute(query, params)
+                else:
+                    cursor.execute(query, params)
+                writer = csv.writer(text)
+                writer.writerow([col[0] for col in cursor.description])
+                while True:
+                    rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+                    if not rows:
+                        break
+                    writer.writerows(rows)
+                    text.flush()
+                    chunk = buffer.take()
+                    if chunk:
+                        size += len(chunk)
+                        yield chunk
+                text.flush()
+                text.detach()
+    chunk = buffer.take()
+    size += len(chunk)
+    EXPORT_SIZE.observe(size, export='descargarzip')
+    yield chunk
+
+
+async def aiterate(iterator):
+    """Iterate a sync generator that queries the database without blocking the event loop"""
+    next_chunk = sync_to_async(next)
+    try:
+        while True:
+            chunk = await next_chunk(iterator, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # Close the cursor on the request's thread when the client goes away mid-download
+        await sync_to_async(iterator.close)()
+
+
 @swagger_auto_schema(
     method='get',
     operation_description="Download biodiversity data as ZIP file containing CSV files",
@@ -116,67 +248,52 @@ def descargarzip(request):
     
     SECURITY: SQL injection protection with input validation.
     """
-    import re
-    
-    # Validate input parameters
-    codigo_mpio = request.GET.get('codigo_mpio')
-    codigo_dpto = request.GET.get('codigo_dpto')
-    
-    if not codigo_mpio and not codigo_dpto:
-        return Response(
-            {'error': 'Debe proporcionar codigo_mpio o codigo_dpto'}, 
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    # Validate code format to prevent SQL injection
-    if codigo_mpio:
-        if not re.match(r'^\d{5}$', codigo_mpio):
-            return Response(
-                {'error': 'Código de municipio inválido (debe ser 5 dígitos)'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        table_name = 'mpio_queries'
-        codigo = codigo_mpio
-    else:
-        if not re.match(r'^\d{2}$', codigo_dpto):
-            return Response(
-                {'error': 'Código de departamento inválido (debe ser 2 dígitos)'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        table_name = 'dpto_queries'
-        codigo = codigo_dpto
-    
-    # Validate and sanitize filename
-    nombre = request.GET.get('nombre', 'descarga_datos')[:50]
-    nombre = re.sub(r'[^a-zA-Z0-9_-]', '', nombre) or 'descarga_datos'
-    
-    # Use parameterized queries to prevent SQL injection
-    registros_query = f"""
-        SELECT codigo, tipo, registers, species, exoticas, endemicas, nombre 
-        FROM gbif_consultas.{table_name} 
-        WHERE codigo = %s
-    """
-    
-    especies_query = f"""
-        SELECT DISTINCT 
-            'Animalia' as reino, '' as filo, '' as clase, '' as orden, 
-            '' as familia, '' as genero, species as especies, 
-            endemicas, 0 as amenazadas, exoticas
-        FROM gbif_consultas.{table_name} 
-        WHERE codigo = %s
-    """
-    
+    params = parse_export_params(request.GET)
+    if isinstance(params, str):
+        return Response({'error': params}, status=status.HTTP_400_BAD_REQUEST)
+    registros_query, especies_query, codigo, nombre = params
+
     # Execute with parameters (prevents SQL injection)
     registros_csv = generar_csv(registros_query, [codigo])
     especies_csv = generar_csv(especies_query, [codigo])
 
     # Empaquetar ZIP
     zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+    with timed('zip'), zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
         zip_file.writestr('registros.csv', registros_csv)
         zip_file.writestr('lista_especies.csv', especies_csv)
 
+    EXPORT_SIZE.observe(zip_buffer.tell(), export='descargarzip')
     zip_buffer.seek(0)
     response = HttpResponse(zip_buffer, content_type='application/zip')
     response['Content-Disposition'] = f'attachment; filename={nombre}.zip'
     return response
+
+
+async def adescargarzip(request):
+    """
+    Download biodiversity data as ZIP file, streamed (async view).
+
+    Same parameters and archive as descargarzip, used when ASYNC_VIEWS is on:
+    the queries run in a worker thread and the archive is sent as it is
+    compressed instead of being built in memory first.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    params = parse_export_params(request.GET)
+    if isinstance(params, str):
+        return JsonResponse({'error': params}, status=status.HTTP_400_BAD_REQUEST)
+    registros_query, especies_query, codigo, nombre = params
+
+    files = [
+        ('registros.csv', registros_query, [codigo]),
+        ('lista_especies.csv', especies_query, [codigo]),
+    ]
+    response = StreamingHttpResponse(aiterate(stream_zip(files, current_budget())), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename={nombre}.zip'
+    return response
+
+
+# Documented in the OpenAPI schema as descargarzip
+adescargarzip.__dict__.update(descargarzip.__dict__)
+del adescargarzip.__wrapped__
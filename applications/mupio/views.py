@@ -3,11 +3,12 @@ from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from applications.common.views import ValuesListAPIView
 from .models import MpioQueries, MpioAmenazas
 from .serializers import mpioQueriesSerializer, mpioDangerSerializer
 from applications.mupiopolitico.models import MpioPolitico
 
-class mpioQuery(ListAPIView):
+class mpioQuery(ValuesListAPIView):
     """
     API endpoint for retrieving biodiversity data charts by municipality.
     
@@ -53,7 +54,7 @@ class mpioQuery(ListAPIView):
         return MpioQueries.objects.filter(codigo=kid).exclude(tipo__isnull=True).distinct('tipo')
 
 
-class mpioDanger(ListAPIView):
+class mpioDanger(ValuesListAPIView):
     """
     API endpoint for retrieving threat/danger data by municipality.
     
@@ -1,11 +1,11 @@
 from django.shortcuts import render
-from rest_framework.generics import ListAPIView
 from django.db.models import Q
+from applications.common.views import ValuesListAPIView
 from .models import MpioPolitico
 from .serializers import mpioPoliticoSerializer
 from unidecode import unidecode
 
-class mupioSearch(ListAPIView):
+class mupioSearch(ValuesListAPIView):
     serializer_class = mpioPoliticoSerializer
 
     def get_queryset(self):
@@ -16,12 +16,14 @@ class mupioSearch(ListAPIView):
 
         qmupios = MpioPolitico.objects.filter(
             Q(nombre__icontains=q1) | Q(nombre_unaccented__icontains=q1)
-        )[:5]
+        )
 
-        if qmupios and numberParams > 1:
+        if numberParams > 1:
+            # The department term is already unaccented and the table has no unaccented copy of it
             q2 = unidecode(queryParams[1])
-            qmupios = qmupios.filter(
-                Q(dpto_nombre__icontains=q2) | Q(dpto_nombre_unaccented__icontains=q2)
-            )[:5]
+            qmupios = qmupios.filter(dpto_nombre__icontains=q2)
+
+        # Sliced last so the whole search runs as the single values_list() query
+        qmupios = qmupios[:5]
 
         return qmupios
@@ -1,8 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django import forms
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.html import format_html
 from .models import Project, LayerGroup, Layer
+from .tree import clone_project
 
 
 @admin.register(Project)
@@ -14,6 +16,7 @@ class ProjectAdmin(admin.ModelAdmin):
     list_filter = ['panel_visible', 'base_map_visible', 'created_at']
     search_fields = ['nombre_corto', 'nombre']
     readonly_fields = ['created_at', 'updated_at']
+    actions = ['clone_projects']
 
     fieldsets = (
         ('Basic Information', {
@@ -34,6 +37,29 @@ class ProjectAdmin(admin.ModelAdmin):
         }),
     )
 
+    @admin.action(description='Clonar proyectos seleccionados (con grupos y capas)')
+    def clone_projects(self, request, queryset):
+        """Deep-copy the selected projects as '<nombre_corto>-copia'"""
+        taken = set(Project.objects.values_list('nombre_corto', flat=True))
+        for project in queryset:
+            base = f"{project.nombre_corto}-copia"[:47]
+            nombre_corto, suffix = base, 2
+            while nombre_corto in taken:
+                nombre_corto = f"{base}{suffix}"
+                suffix += 1
+            taken.add(nombre_corto)
+            try:
+                clone = clone_project(project, nombre_corto, f"{project.nombre} (copia)"[:200])
+            except ValidationError as e:
+                # Taken by a concurrent clone since the names were loaded
+                self.message_user(request, '; '.join(e.messages), messages.ERROR)
+                continue
+            self.message_user(
+                request,
+                f'Proyecto "{project.nombre_corto}" clonado como "{clone.nombre_corto}"',
+                messages.SUCCESS
+            )
+
 
 class LayerGroupAdminForm(forms.ModelForm):
     """
@@ -57,6 +83,8 @@ class LayerGroupAdmin(admin.ModelAdmin):
     """
     form = LayerGroupAdminForm
     list_display = ['nombre', 'proyecto', 'parent_group', 'orden', 'fold_state', 'color_preview']
+    # parent_group is displayed with its project name
+    list_select_related = ['proyecto', 'parent_group__proyecto']
     list_filter = ['proyecto', 'fold_state', 'parent_group']
     search_fields = ['nombre', 'proyecto__nombre_corto']
     list_editable = ['orden']
@@ -165,6 +193,7 @@ class LayerAdmin(admin.ModelAdmin):
     """
     form = LayerAdminForm
     list_display = ['nombre_display', 'get_proyecto', 'grupo', 'nombre_geoserver', 'store_geoserver', 'estado_inicial', 'orden']
+    list_select_related = ['grupo__proyecto']
     list_filter = ['grupo__proyecto', 'grupo', 'estado_inicial', 'store_geoserver']
     search_fields = ['nombre_display', 'nombre_geoserver', 'grupo__nombre', 'grupo__proyecto__nombre_corto']
     list_editable = ['orden', 'estado_inicial']
@@ -5,3 +5,7 @@ class ProjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'applications.projects'
     verbose_name = 'Project Management'
+
+    def ready(self):
+        # Connect the group index cache invalidation receivers
+        from . import group_index  # noqa: F401
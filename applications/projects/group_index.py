@@ -0,0 +1,112 @@
+"""
+Cached per-project layer group index for the admin group picker
+
+The index lists every group of a project with its full breadcrumb name
+(``"Conservación → Páramos → Humedales"``). Building it means loading all
+the groups of the project and walking their parents, so it is cached per
+project together with a fingerprint of the project's groups.
+
+The fingerprint (project and latest group ``updated_at`` plus the group
+count) is read with a single aggregate query on every request. It doubles
+as the ETag, and a cached index whose fingerprint no longer matches is
+rebuilt, so workers with separate local-memory caches never serve stale
+groups. Saving or deleting a group or project also drops the cached entry
+right away through the signal receivers below.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from applications.common.metrics import record_cache_lookup
+
+from .models import Project, LayerGroup
+
+
+BREADCRUMB_SEPARATOR = ' → '
+CACHE_KEY = 'projects:group-index:{}'
+
+
+def _cache_key(project_id):
+    return CACHE_KEY.format(project_id)
+
+
+def get_group_index_fingerprint(project_id):
+    """
+    Return the fingerprint of the groups of `project_id`
+
+    Raises Project.DoesNotExist if there is no such project.
+    """
+    row = (
+        Project.objects.filter(pk=project_id)
+        .annotate(groups_updated=Max('layer_groups__updated_at'), groups_count=Count('layer_groups'))
+        .values_list('updated_at', 'groups_updated', 'groups_count')
+        .get()
+    )
+    return hashlib.md5(repr(row).encode(), usedforsecurity=False).hexdigest()
+
+
+def build_group_index(project_id):
+    """Return the picker payload for `project_id` (2 queries)"""
+    project = Project.objects.only('nombre_corto').get(pk=project_id)
+    groups = list(
+        LayerGroup.objects.filter(proyecto_id=project_id)
+        .order_by('orden', 'nombre')
+        .values_list('pk', 'nombre', 'parent_group_id', 'orden')
+    )
+    names = {pk: nombre for pk, nombre, _, _ in groups}
+    parents = {pk: parent_id for pk, _, parent_id, _ in groups}
+
+    def breadcrumb(pk):
+        path, seen = [], set()
+        while pk is not None and pk in names and pk not in seen:
+            seen.add(pk)
+            path.append(names[pk])
+            pk = parents[pk]
+        return BREADCRUMB_SEPARATOR.join(reversed(path))
+
+    groups_data = [
+        {'id': pk, 'nombre': breadcrumb(pk), 'parent_id': parent_id, 'orden': orden}
+        for pk, _, parent_id, orden in groups
+    ]
+    return {
+        'success': True,
+        'groups': groups_data,
+        'project_name': project.nombre_corto,
+        'count': len(groups_data),
+    }
+
+
+def get_group_index(project_id):
+    """
+    Return (etag, payload) for `project_id`, from the cache when current
+
+    Raises Project.DoesNotExist if there is no such project.
+    """
+    fingerprint = get_group_index_fingerprint(project_id)
+    cached = cache.get(_cache_key(project_id))
+    hit = cached is not None and cached[0] == fingerprint
+    record_cache_lookup('group_index', hit)
+    if hit:
+        return fingerprint, cached[1]
+
+    payload = build_group_index(project_id)
+    cache.set(_cache_key(project_id), (fingerprint, payload), getattr(settings, 'GROUP_INDEX_CACHE_TIMEOUT', 3600))
+    return fingerprint, payload
+
+
+def invalidate_group_index(project_id):
+    cache.delete(_cache_key(project_id))
+
+
+@receiver([post_save, post_delete], sender=LayerGroup)
+def _invalidate_on_group_change(sender, instance, **kwargs):
+    invalidate_group_index(instance.proyecto_id)
+
+
+@receiver([post_save, post_delete], sender=Project)
+def _invalidate_on_project_change(sender, instance, **kwargs):
+    invalidate_group_index(instance.pk)
@@ -0,0 +1,99 @@
+import io
+import json
+import sys
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from applications.projects.models import Project
+from applications.projects.tree import export_project_tree, import_project_tree
+
+
+class Command(BaseCommand):
+    help = 'Import or export a whole project layer tree from/to a JSON or YAML document'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='action', required=True)
+
+        export_parser = subparsers.add_parser('export', help='Export a project tree')
+        export_parser.add_argument('nombre_corto', help='Short name of the project to export')
+        export_parser.add_argument('-o', '--output', help='Output file (default: stdout)')
+        export_parser.add_argument('--format', choices=['json', 'yaml'], help='Defaults to the output file extension, or json')
+
+        import_parser = subparsers.add_parser('import', help='Create or update a project from a tree document')
+        import_parser.add_argument('path', help="Tree document (.json, .yaml or .yml), or '-' for stdin")
+        import_parser.add_argument('--format', choices=['json', 'yaml'], help='Defaults to the file extension, or json')
+        import_parser.add_argument('--prune', action='store_true', help='Delete groups and layers missing from the document')
+        import_parser.add_argument('--dry-run', action='store_true', help='Validate and report changes without saving them')
+
+    def handle(self, *args, **options):
+        if options['action'] == 'export':
+            self.export_tree(options)
+        else:
+            self.import_tree(options)
+
+    def export_tree(self, options):
+        try:
+            project = Project.objects.get(nombre_corto=options['nombre_corto'])
+        except Project.DoesNotExist:
+            raise CommandError(f"Project '{options['nombre_corto']}' does not exist")
+
+        document = export_project_tree(project)
+        fmt = options['format'] or self.format_from_path(options['output'])
+        content = self.dump(document, fmt)
+
+        if options['output']:
+            Path(options['output']).write_text(content, encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f"Exported project '{project.nombre_corto}' to {options['output']}"))
+        else:
+            self.stdout.write(content, ending='')
+
+    def import_tree(self, options):
+        path = options['path']
+        fmt = options['format'] or self.format_from_path(path)
+        try:
+            content = sys.stdin.read() if path == '-' else Path(path).read_text(encoding='utf-8')
+            document = self.load(content, fmt)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read {path}: {e}')
+
+        with CaptureQueriesContext(connection) as queries:
+            try:
+                result = import_project_tree(document, prune=options['prune'], dry_run=options['dry_run'])
+            except ValidationError as e:
+                raise CommandError('; '.join(e.messages))
+
+        action = 'Would apply' if options['dry_run'] else 'Applied'
+        self.stdout.write(
+            f"{action} tree for project '{document['project']['nombre_corto']}' "
+            f"({'created' if result.project_created else 'updated' if result.project_updated else 'unchanged'}): "
+            f"groups +{result.groups_created} ~{result.groups_updated} -{result.groups_deleted}, "
+            f"layers +{result.layers_created} ~{result.layers_updated} -{result.layers_deleted}"
+        )
+        self.stdout.write(self.style.SUCCESS(f'Done in {len(queries)} queries'))
+
+    @staticmethod
+    def format_from_path(path):
+        return 'yaml' if path and path.lower().endswith(('.yaml', '.yml')) else 'json'
+
+    @staticmethod
+    def load(content, fmt):
+        if fmt == 'yaml':
+            from ruamel.yaml import YAML
+            return YAML(typ='safe').load(content)
+        return json.loads(content)
+
+    @staticmethod
+    def dump(document, fmt):
+        if fmt == 'yaml':
+            from ruamel.yaml import YAML
+            yaml = YAML()
+            yaml.default_flow_style = False
+            yaml.allow_unicode = True
+            stream = io.StringIO()
+            yaml.dump(document, stream)
+            return stream.getvalue()
+        return json.dumps(document, indent=2, ensure_ascii=False) + '\n'
@@ -0,0 +1,33 @@
+# Generated migration to add keyset pagination and filter indexes
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_layergroup_color'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='layergroup',
+            index=models.Index(fields=['proyecto', 'orden', 'id'], name='layer_groups_proy_orden_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='layergroup',
+            index=models.Index(fields=['orden', 'id'], name='layer_groups_orden_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='layer',
+            index=models.Index(fields=['grupo', 'orden', 'id'], name='layers_grupo_orden_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='layer',
+            index=models.Index(fields=['estado_inicial', 'orden', 'id'], name='layers_estado_orden_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='layer',
+            index=models.Index(fields=['orden', 'id'], name='layers_orden_id_idx'),
+        ),
+    ]
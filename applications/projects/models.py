@@ -82,6 +82,10 @@ class LayerGroup(models.Model):
         verbose_name = 'Layer Group'
         verbose_name_plural = 'Layer Groups'
         ordering = ['orden', 'nombre']
+        indexes = [
+            models.Index(fields=['proyecto', 'orden', 'id'], name='layer_groups_proy_orden_idx'),
+            models.Index(fields=['orden', 'id'], name='layer_groups_orden_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.proyecto.nombre_corto} - {self.nombre}"
@@ -111,6 +115,11 @@ class Layer(models.Model):
         verbose_name = 'Layer'
         verbose_name_plural = 'Layers'
         ordering = ['orden', 'nombre_display']
+        indexes = [
+            models.Index(fields=['grupo', 'orden', 'id'], name='layers_grupo_orden_idx'),
+            models.Index(fields=['estado_inicial', 'orden', 'id'], name='layers_estado_orden_idx'),
+            models.Index(fields=['orden', 'id'], name='layers_orden_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.grupo.proyecto.nombre_corto} - {self.nombre_display}"
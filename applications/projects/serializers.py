@@ -1,21 +1,25 @@
 from rest_framework import serializers
 import re
+
+from applications.common.timing import TimedListSerializer, TimedModelSerializer
 from .models import Project, LayerGroup, Layer
+from .tree import nombre_corto_taken
 
 
-class LayerSerializer(serializers.ModelSerializer):
+class LayerSerializer(TimedModelSerializer):
     """
     Serializer for Layer model
     """
     class Meta:
         model = Layer
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'nombre_geoserver', 'nombre_display', 'store_geoserver',
             'estado_inicial', 'metadata_id', 'orden'
         ]
 
 
-class LayerGroupSerializer(serializers.ModelSerializer):
+class LayerGroupSerializer(TimedModelSerializer):
     """
     Serializer for LayerGroup model with nested layers
     """
@@ -24,6 +28,7 @@ class LayerGroupSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = LayerGroup
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'nombre', 'orden', 'fold_state', 'parent_group',
             'color', 'layers', 'subgroups'
@@ -48,12 +53,13 @@ class LayerGroupSerializer(serializers.ModelSerializer):
         return LayerGroupSerializer(subgroups, many=True).data
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(TimedModelSerializer):
     """
     Serializer for Project model
     """
     class Meta:
         model = Project
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'nombre_corto', 'nombre', 'logo_pequeno_url', 'logo_completo_url',
             'nivel_zoom', 'coordenada_central_x', 'coordenada_central_y',
@@ -61,15 +67,32 @@ class ProjectSerializer(serializers.ModelSerializer):
         ]
 
 
-class ProjectDetailSerializer(serializers.ModelSerializer):
+class ProjectDetailSerializer(TimedModelSerializer):
     """
     Detailed serializer for Project model with related data
     """
     layer_groups = LayerGroupSerializer(many=True, read_only=True)
     class Meta:
         model = Project
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'nombre_corto', 'nombre', 'logo_pequeno_url', 'logo_completo_url',
             'nivel_zoom', 'coordenada_central_x', 'coordenada_central_y',
             'panel_visible', 'base_map_visible', 'layer_groups', 'created_at', 'updated_at'
         ]
+
+
+class ProjectCloneSerializer(serializers.Serializer):
+    """
+    Input serializer for cloning a project
+    """
+    nombre_corto = serializers.CharField(max_length=50)
+    nombre = serializers.CharField(max_length=200, required=False)
+
+    def validate_nombre_corto(self, value):
+        """
+        Ensure the new short name is not taken
+        """
+        if Project.objects.filter(nombre_corto=value).exists():
+            raise serializers.ValidationError(nombre_corto_taken(value))
+        return value
@@ -41,8 +41,8 @@ class LayerGroupColorAPITests(APITestCase):
         url = '/api/layer-groups/'
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertGreater(len(response.data), 0)
-        self.assertIn('color', response.data[0])
+        self.assertGreater(len(response.data['results']), 0)
+        self.assertIn('color', response.data['results'][0])
 
     def test_create_layer_group_with_color(self):
         """Test POST creates group with color"""
@@ -205,8 +205,8 @@ class LayerGroupColorAPITests(APITestCase):
         url = f'/api/layer-groups/?project={self.project.id}'
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertGreater(len(response.data), 0)
-        self.assertIn('color', response.data[0])
+        self.assertGreater(len(response.data['results']), 0)
+        self.assertIn('color', response.data['results'][0])
 
     def test_nested_serialization_includes_color(self):
         """Test nested serialization in project detail includes color"""
@@ -0,0 +1,82 @@
+"""
+Tests for the cached admin group picker index
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from applications.projects.group_index import get_group_index
+from applications.projects.models import Project, LayerGroup
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class GroupIndexTests(TestCase):
+    """Test cases for filter_groups_by_project and the group index"""
+
+    url = '/admin/projects/layer/ajax/filter-groups-by-project/'
+
+    def setUp(self):
+        """Set up a project with a three-level group tree"""
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(self.admin)
+        self.project = Project.objects.create(
+            nombre_corto='test', nombre='Test Project',
+            coordenada_central_x=-74.0, coordenada_central_y=4.0
+        )
+        self.root = LayerGroup.objects.create(proyecto=self.project, nombre='Conservación', orden=0)
+        self.child = LayerGroup.objects.create(proyecto=self.project, nombre='Páramos', orden=1, parent_group=self.root)
+        self.leaf = LayerGroup.objects.create(proyecto=self.project, nombre='Humedales', orden=2, parent_group=self.child)
+
+    def test_breadcrumb_names(self):
+        """Groups are named with their full path from the root"""
+        response = self.client.get(self.url, {'project_id': self.project.pk})
+        self.assertEqual(response.status_code, 200)
+        names = {group['id']: group['nombre'] for group in response.json()['groups']}
+        self.assertEqual(names[self.root.pk], 'Conservación')
+        self.assertEqual(names[self.leaf.pk], 'Conservación → Páramos → Humedales')
+        self.assertEqual(response.json()['count'], 3)
+
+    def test_etag_not_modified(self):
+        """A matching If-None-Match returns 304 with the same ETag"""
+        response = self.client.get(self.url, {'project_id': self.project.pk})
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        response = self.client.get(self.url, {'project_id': self.project.pk}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_cached_index_reused(self):
+        """A current cached index costs only the fingerprint query"""
+        get_group_index(self.project.pk)
+        with self.assertNumQueries(1):
+            get_group_index(self.project.pk)
+
+    def test_rename_invalidates_index(self):
+        """Renaming a parent group changes the ETag and the breadcrumbs below it"""
+        etag, _ = get_group_index(self.project.pk)
+        self.child.nombre = 'Páramos y humedales'
+        self.child.save()
+
+        new_etag, payload = get_group_index(self.project.pk)
+        self.assertNotEqual(new_etag, etag)
+        names = {group['id']: group['nombre'] for group in payload['groups']}
+        self.assertEqual(names[self.leaf.pk], 'Conservación → Páramos y humedales → Humedales')
+
+    def test_stale_cache_entry_rebuilt(self):
+        """Changes made without signals (e.g. by another worker) are still picked up"""
+        get_group_index(self.project.pk)
+        LayerGroup.objects.filter(pk=self.leaf.pk).update(nombre='Turberas', updated_at=timezone.now())
+        _, payload = get_group_index(self.project.pk)
+        names = {group['id']: group['nombre'] for group in payload['groups']}
+        self.assertEqual(names[self.leaf.pk], 'Conservación → Páramos → Turberas')
+
+    def test_unknown_project(self):
+        """Unknown projects return 404"""
+        response = self.client.get(self.url, {'project_id': 9999})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,96 @@
+"""
+Tests for keyset pagination, field selection and filters on layer endpoints
+"""
+import base64
+import json
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from applications.projects.models import Project, LayerGroup, Layer
+
+
+class LayerKeysetPaginationTests(APITestCase):
+    """Test cases for the paginated LayerViewSet and LayerGroupViewSet lists"""
+
+    def setUp(self):
+        """Set up two projects with several layers sharing the same orden"""
+        self.project = Project.objects.create(
+            nombre_corto='test', nombre='Test Project',
+            coordenada_central_x=-74.0, coordenada_central_y=4.0
+        )
+        self.other = Project.objects.create(
+            nombre_corto='other', nombre='Other Project',
+            coordenada_central_x=-74.0, coordenada_central_y=4.0
+        )
+        self.group = LayerGroup.objects.create(proyecto=self.project, nombre='Grupo', orden=1)
+        self.other_group = LayerGroup.objects.create(proyecto=self.other, nombre='Otro', orden=0)
+        for i in range(7):
+            Layer.objects.create(
+                grupo=self.group, nombre_geoserver=f'capa_{i}', nombre_display=f'Capa {i}',
+                store_geoserver='store', orden=i % 3, estado_inicial=i % 2 == 0
+            )
+        Layer.objects.create(
+            grupo=self.other_group, nombre_geoserver='ajena', nombre_display='Ajena',
+            store_geoserver='store', orden=0
+        )
+
+    def collect(self, url):
+        """Follow next links and return all results and the number of pages"""
+        results, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results.extend(response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return results, pages
+
+    def test_pages_cover_all_layers_in_order(self):
+        """Walking the cursors returns every layer once, ordered by (orden, id)"""
+        results, pages = self.collect('/api/layers/?page_size=3')
+        expected = list(Layer.objects.order_by('orden', 'id').values_list('id', flat=True))
+        self.assertEqual([layer['id'] for layer in results], expected)
+        self.assertEqual(pages, 3)
+
+    def test_filters(self):
+        """project, group and estado_inicial narrow the results"""
+        results, _ = self.collect(f'/api/layers/?project={self.project.id}&estado_inicial=true')
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(layer['estado_inicial'] for layer in results))
+
+        results, _ = self.collect(f'/api/layers/?group={self.other_group.id}')
+        self.assertEqual([layer['nombre_geoserver'] for layer in results], ['ajena'])
+
+    def test_invalid_filters_return_400(self):
+        """Malformed filter values are rejected instead of causing server errors"""
+        for query in ('project=abc', 'group=1.5', 'estado_inicial=maybe'):
+            response = self.client.get(f'/api/layers/?{query}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+
+    def test_invalid_cursor_returns_404(self):
+        """Tampered cursors are rejected"""
+        response = self.client.get('/api/layers/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_invalid_values_returns_404(self):
+        """Well-formed cursors whose values do not fit the ordering fields are rejected"""
+        for position in (['abc', 1], [{}, 1], [1, None], [[1], 2]):
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            response = self.client.get(f'/api/layers/?cursor={cursor}')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
+
+    def test_field_selection(self):
+        """?fields= limits the serialized fields"""
+        response = self.client.get('/api/layers/?fields=id,nombre_display')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'nombre_display'})
+
+        response = self.client.get('/api/layers/?fields=id,bogus')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_group_field_selection_skips_nested_queries(self):
+        """Groups listed without layers/subgroups need no prefetch queries"""
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/layer-groups/?project={self.project.id}&fields=id,nombre,color')
+        self.assertEqual(response.data['results'], [{'id': self.group.id, 'nombre': 'Grupo', 'color': '#e3e3e3'}])
+        self.assertIsNone(response.data['next'])
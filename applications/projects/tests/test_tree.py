@@ -0,0 +1,282 @@
+"""
+Tests for bulk import/export of project layer trees
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from applications.projects.models import Project, LayerGroup, Layer
+from applications.projects.serializers import ProjectCloneSerializer
+from applications.projects.tree import clone_project, export_project_tree, import_project_tree
+
+
+def layer(nombre, orden=0, **extra):
+    return {
+        'nombre_geoserver': nombre, 'nombre_display': nombre.title(),
+        'store_geoserver': 'ecoreservas', 'estado_inicial': False,
+        'metadata_id': None, 'orden': orden, **extra,
+    }
+
+
+def tree_document(**project):
+    return {
+        'project': {
+            'nombre_corto': 'ecoreservas', 'nombre': 'Ecoreservas',
+            'coordenada_central_x': -8249332, 'coordenada_central_y': 544737, **project,
+        },
+        'groups': [
+            {
+                'nombre': 'Ecoregión', 'orden': 2, 'color': '#17a2b8',
+                'layers': [layer('limite')],
+                'subgroups': [
+                    {
+                        'nombre': 'Compensación', 'orden': 0, 'color': '#28a745',
+                        'subgroups': [
+                            {'nombre': 'Preservación', 'layers': [layer('pres_a'), layer('pres_b', 1)]},
+                            {'nombre': 'Restauración', 'layers': [layer('rest_a')]},
+                        ],
+                    },
+                ],
+            },
+            {'nombre': 'Historicos', 'orden': 3, 'layers': [layer('aicas'), layer('bst2018', 1)]},
+        ],
+    }
+
+
+class ProjectTreeImportTests(TestCase):
+    """Test cases for import_project_tree"""
+
+    def test_import_creates_full_tree(self):
+        """Test a new document creates the project, nested groups and layers"""
+        result = import_project_tree(tree_document())
+
+        project = Project.objects.get(nombre_corto='ecoreservas')
+        self.assertTrue(result.project_created)
+        self.assertEqual(result.groups_created, 5)
+        self.assertEqual(result.layers_created, 6)
+        preservacion = LayerGroup.objects.get(proyecto=project, nombre='Preservación')
+        self.assertEqual(preservacion.parent_group.nombre, 'Compensación')
+        self.assertEqual(preservacion.parent_group.parent_group.nombre, 'Ecoregión')
+        self.assertEqual(preservacion.layers.count(), 2)
+
+    def test_import_uses_constant_queries_per_level(self):
+        """Test the import does not issue one query per object"""
+        # savepoint, project lookup + insert, group load, 3 levels of group
+        # inserts, layer load + insert, release
+        with self.assertNumQueries(10):
+            import_project_tree(tree_document())
+
+    def test_reimport_is_a_no_op(self):
+        """Test importing the same document twice changes nothing"""
+        import_project_tree(tree_document())
+        result = import_project_tree(tree_document())
+        self.assertFalse(result.project_created or result.project_updated)
+        self.assertEqual((result.groups_created, result.groups_updated), (0, 0))
+        self.assertEqual((result.layers_created, result.layers_updated), (0, 0))
+
+    def test_import_updates_changed_objects(self):
+        """Test changed fields are bulk updated in place"""
+        import_project_tree(tree_document())
+        document = tree_document(nivel_zoom=9.2)
+        document['groups'][1]['color'] = '#FF0000'
+        document['groups'][1]['layers'][0]['estado_inicial'] = True
+
+        result = import_project_tree(document)
+
+        self.assertTrue(result.project_updated)
+        self.assertEqual((result.groups_updated, result.layers_updated), (1, 1))
+        self.assertEqual(Project.objects.get(nombre_corto='ecoreservas').nivel_zoom, 9.2)
+        self.assertEqual(LayerGroup.objects.get(nombre='Historicos').color, '#FF0000')
+        self.assertTrue(Layer.objects.get(nombre_geoserver='aicas').estado_inicial)
+
+    def test_prune_deletes_missing_objects(self):
+        """Test --prune removes groups and layers absent from the document"""
+        import_project_tree(tree_document())
+        document = tree_document()
+        document['groups'][0]['subgroups'][0]['subgroups'].pop()  # Restauración
+        document['groups'][1]['layers'].pop()  # bst2018
+
+        result = import_project_tree(document, prune=True)
+
+        self.assertEqual((result.groups_deleted, result.layers_deleted), (1, 2))
+        self.assertFalse(LayerGroup.objects.filter(nombre='Restauración').exists())
+        self.assertFalse(Layer.objects.filter(nombre_geoserver__in=['rest_a', 'bst2018']).exists())
+
+    def test_invalid_document_leaves_database_untouched(self):
+        """Test a validation error rolls back the whole import"""
+        document = tree_document()
+        document['groups'][1]['layers'][1]['nombre_display'] = ''
+
+        with self.assertRaises(ValidationError):
+            import_project_tree(document)
+        self.assertFalse(Project.objects.exists())
+        self.assertFalse(LayerGroup.objects.exists())
+
+    def test_malformed_document_rejected(self):
+        """Test documents with wrongly typed parts raise ValidationError, not a crash"""
+        malformed = []
+        for change in (
+            lambda document: document['groups'][0]['layers'].append('ecoreservas_1'),
+            lambda document: document['groups'][1].update(layers={'nombre_geoserver': 'x'}),
+            lambda document: document['groups'][0].update(subgroups='Preservación'),
+            lambda document: document.update(groups={'nombre': 'Compensación'}),
+            lambda document: document.update(project=['ecoreservas']),
+        ):
+            document = tree_document()
+            change(document)
+            malformed.append(document)
+        malformed.append([tree_document()])
+
+        for case, document in enumerate(malformed):
+            with self.subTest(case=case), self.assertRaises(ValidationError):
+                import_project_tree(document)
+        self.assertFalse(Project.objects.exists())
+
+    def test_dry_run_does_not_save(self):
+        """Test dry runs report changes without saving them"""
+        result = import_project_tree(tree_document(), dry_run=True)
+        self.assertEqual(result.layers_created, 6)
+        self.assertFalse(Project.objects.exists())
+
+    def test_export_round_trips(self):
+        """Test an exported document re-imports as a no-op"""
+        import_project_tree(tree_document())
+        exported = export_project_tree(Project.objects.get(nombre_corto='ecoreservas'))
+        self.assertEqual([group['nombre'] for group in exported['groups']], ['Ecoregión', 'Historicos'])
+
+        result = import_project_tree(exported)
+        self.assertEqual((result.groups_updated, result.layers_updated), (0, 0))
+
+
+class ProjectTreeCommandTests(TestCase):
+    """Test cases for the project_tree management command"""
+
+    def test_export_then_import_yaml(self):
+        """Test the command round-trips a project through a YAML file"""
+        import_project_tree(tree_document())
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'ecoreservas.yaml')
+            call_command('project_tree', 'export', 'ecoreservas', '-o', path, stdout=StringIO())
+            Project.objects.all().delete()
+
+            out = StringIO()
+            call_command('project_tree', 'import', path, stdout=out)
+
+        self.assertIn('groups +5', out.getvalue())
+        self.assertEqual(Layer.objects.filter(grupo__proyecto__nombre_corto='ecoreservas').count(), 6)
+
+    def test_import_json(self):
+        """Test the command imports a JSON document"""
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(tree_document(), f)
+        try:
+            call_command('project_tree', 'import', f.name, stdout=StringIO())
+        finally:
+            os.unlink(f.name)
+        self.assertTrue(Project.objects.filter(nombre_corto='ecoreservas').exists())
+
+    def test_import_malformed_document_fails_cleanly(self):
+        """Test the command reports a malformed document as a CommandError"""
+        document = tree_document()
+        document['groups'][0]['layers'] = [['ecoreservas_1']]
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(document, f)
+        try:
+            with self.assertRaisesMessage(CommandError, 'must be an object'):
+                call_command('project_tree', 'import', f.name, stdout=StringIO())
+        finally:
+            os.unlink(f.name)
+
+
+class ProjectCloneTests(APITestCase):
+    """Test cases for project cloning"""
+
+    def setUp(self):
+        import_project_tree(tree_document())
+        self.project = Project.objects.get(nombre_corto='ecoreservas')
+        self.admin = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+
+    def test_clone_copies_tree(self):
+        """Test the clone has the same groups, hierarchy and layers"""
+        clone = clone_project(self.project, 'ecoreservas-2', 'Ecoreservas 2')
+
+        original = export_project_tree(self.project)
+        copied = export_project_tree(clone)
+        self.assertEqual(copied['groups'], original['groups'])
+        self.assertEqual(copied['project']['nombre'], 'Ecoreservas 2')
+        self.assertEqual(LayerGroup.objects.filter(proyecto=self.project).count(), 5)
+        self.assertEqual(Layer.objects.filter(grupo__proyecto=self.project).count(), 6)
+
+    def test_clone_uses_constant_queries_per_level(self):
+        """Test cloning does not issue one query per object"""
+        # savepoint, project insert in its own savepoint (3), group load,
+        # 3 levels of group inserts, layer load + insert, release
+        with self.assertNumQueries(11):
+            clone_project(self.project, 'ecoreservas-2')
+
+    def test_clone_endpoint(self):
+        """Test POST /api/projects/<id>/clone/ creates the copy"""
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post(
+            f'/api/projects/{self.project.id}/clone/', {'nombre_corto': 'nuevo-visor'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['nombre_corto'], 'nuevo-visor')
+        self.assertEqual(Layer.objects.filter(grupo__proyecto__nombre_corto='nuevo-visor').count(), 6)
+
+    def test_clone_endpoint_rejects_taken_name(self):
+        """Test cloning onto an existing nombre_corto returns 400"""
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.post(
+            f'/api/projects/{self.project.id}/clone/', {'nombre_corto': 'ecoreservas'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('nombre_corto', response.data)
+
+    def test_clone_onto_taken_name_raises_validation_error(self):
+        """Test a taken nombre_corto is a ValidationError and leaves nothing behind"""
+        with self.assertRaises(ValidationError) as raised:
+            clone_project(self.project, 'ecoreservas')
+        self.assertIn('nombre_corto', raised.exception.message_dict)
+        self.assertEqual(Project.objects.count(), 1)
+        self.assertEqual(LayerGroup.objects.count(), 5)
+
+    def test_clone_endpoint_concurrent_clone_returns_400(self):
+        """Test a name taken after validation (by a concurrent clone) returns 400, not 500"""
+        self.client.force_authenticate(user=self.admin)
+        with mock.patch.object(ProjectCloneSerializer, 'validate_nombre_corto', lambda serializer, value: value):
+            response = self.client.post(
+                f'/api/projects/{self.project.id}/clone/', {'nombre_corto': 'ecoreservas'}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['nombre_corto'], ['A project with nombre_corto "ecoreservas" already exists'])
+
+    def test_clone_endpoint_requires_staff(self):
+        """Test non-staff users cannot clone projects"""
+        response = self.client.post(
+            f'/api/projects/{self.project.id}/clone/', {'nombre_corto': 'nuevo-visor'}, format='json'
+        )
+        self.assertIn(response.status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
+        self.assertFalse(Project.objects.filter(nombre_corto='nuevo-visor').exists())
+
+    def test_admin_clone_action(self):
+        """Test the admin action clones with a unique short name"""
+        self.admin.is_superuser = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+        data = {'action': 'clone_projects', '_selected_action': [self.project.pk]}
+
+        self.client.post('/admin/projects/project/', data)
+        self.client.post('/admin/projects/project/', data)
+
+        self.assertTrue(Project.objects.filter(nombre_corto='ecoreservas-copia').exists())
+        self.assertTrue(Project.objects.filter(nombre_corto='ecoreservas-copia2').exists())
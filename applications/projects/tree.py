@@ -0,0 +1,342 @@
+"""
+Bulk import/export and cloning of project layer trees
+
+A project tree document describes a Project with its nested LayerGroups and
+Layers:
+
+    {
+        "project": {"nombre_corto": "ecoreservas", "nombre": "Ecoreservas", ...},
+        "groups": [
+            {
+                "nombre": "Compensación", "orden": 0, "color": "#28a745",
+                "layers": [{"nombre_geoserver": "...", "nombre_display": "...", ...}],
+                "subgroups": [...]
+            }
+        ]
+    }
+
+Groups are matched against the database by their name path from the root
+(e.g. ``("Compensación", "Preservación")``) and layers by ``nombre_geoserver``
+within their group, the same keys the old provisioning scripts used with
+``get_or_create``. Importing is done in a single transaction with a fixed
+number of queries per tree level instead of one per object.
+"""
+from dataclasses import dataclass
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Project, LayerGroup, Layer
+
+
+PROJECT_FIELDS = [
+    'nombre', 'logo_pequeno_url', 'logo_completo_url', 'nivel_zoom',
+    'coordenada_central_x', 'coordenada_central_y', 'panel_visible', 'base_map_visible',
+]
+GROUP_FIELDS = ['nombre', 'orden', 'fold_state', 'color']
+LAYER_FIELDS = [
+    'nombre_geoserver', 'nombre_display', 'store_geoserver',
+    'estado_inicial', 'metadata_id', 'orden',
+]
+FOREIGN_KEYS = ['proyecto', 'parent_group', 'grupo']
+
+
+@dataclass
+class ImportResult:
+    """Counts of the changes applied by an import"""
+    project_created: bool = False
+    project_updated: bool = False
+    groups_created: int = 0
+    groups_updated: int = 0
+    groups_deleted: int = 0
+    layers_created: int = 0
+    layers_updated: int = 0
+    layers_deleted: int = 0
+
+
+def export_project_tree(project):
+    """Return the tree document for `project` (3 queries)"""
+    groups = list(LayerGroup.objects.filter(proyecto=project).order_by('orden', 'nombre', 'id'))
+    layers = Layer.objects.filter(grupo__proyecto=project).order_by('orden', 'nombre_display', 'id')
+
+    layers_by_group = {}
+    for layer in layers:
+        layers_by_group.setdefault(layer.grupo_id, []).append(
+            {field: getattr(layer, field) for field in LAYER_FIELDS}
+        )
+
+    nodes = {}
+    for group in groups:
+        node = {field: getattr(group, field) for field in GROUP_FIELDS}
+        node['layers'] = layers_by_group.get(group.pk, [])
+        node['subgroups'] = []
+        nodes[group.pk] = node
+
+    roots = []
+    for group in groups:
+        if group.parent_group_id is None:
+            roots.append(nodes[group.pk])
+        else:
+            nodes[group.parent_group_id]['subgroups'].append(nodes[group.pk])
+
+    document = {'project': {'nombre_corto': project.nombre_corto}, 'groups': roots}
+    document['project'].update({field: getattr(project, field) for field in PROJECT_FIELDS})
+    return document
+
+
+def _build(model, fields, data, label):
+    """
+    Instantiate an unsaved `model` from `data`
+
+    Only the fields present in `data` are validated here, so documents may
+    update a subset of fields; new objects are fully validated by _validate_new.
+    """
+    unknown = set(data) - set(fields) - {'layers', 'subgroups'}
+    if unknown:
+        raise ValidationError(f"{label}: unknown fields {sorted(unknown)}")
+    instance = model(**{field: data[field] for field in fields if field in data})
+    omitted = [field.name for field in model._meta.fields if field.name not in data]
+    _clean(instance, label, exclude=omitted)
+    return instance
+
+
+def _validate_new(instance, label):
+    """Validate all fields of an object about to be created"""
+    _clean(instance, label, exclude=FOREIGN_KEYS)
+
+
+def _clean(instance, label, exclude):
+    """Run field validation, prefixing errors with the object label"""
+    try:
+        instance.clean_fields(exclude=exclude)
+    except ValidationError as e:
+        raise ValidationError(f"{label}: {e.message_dict}")
+
+
+def _apply(instance, source, fields):
+    """Copy `fields` from `source` onto `instance`; return True if anything changed"""
+    changed = False
+    for field in fields:
+        value = getattr(source, field)
+        if getattr(instance, field) != value:
+            setattr(instance, field, value)
+            changed = True
+    return changed
+
+
+def _as_list(value, label):
+    """Return `value`, a list in the document, raising ValidationError if it is anything else"""
+    if not isinstance(value, list):
+        raise ValidationError(f'{label} must be a list')
+    return value
+
+
+def _flatten_groups(document):
+    """
+    Walk the document groups breadth-first, checking the document structure
+
+    Returns a list of tree levels, each a list of (path, parent_path, data)
+    """
+    levels = []
+    current = [((), group) for group in _as_list(document.get('groups', []), 'groups')]
+    seen = set()
+    while current:
+        level, following = [], []
+        for parent_path, data in current:
+            if not isinstance(data, dict) or not data.get('nombre'):
+                raise ValidationError(f"Group under {'/'.join(parent_path) or 'root'} has no nombre")
+            path = parent_path + (data['nombre'],)
+            if path in seen:
+                raise ValidationError(f"Duplicate group {'/'.join(path)}")
+            seen.add(path)
+            label = f"group {'/'.join(path)}"
+            for index, layer in enumerate(_as_list(data.get('layers', []), f'layers of {label}')):
+                if not isinstance(layer, dict):
+                    raise ValidationError(f'Layer {index} of {label} must be an object')
+            level.append((path, parent_path, data))
+            following.extend((path, child) for child in _as_list(data.get('subgroups', []), f'subgroups of {label}'))
+        levels.append(level)
+        current = following
+    return levels
+
+
+def import_project_tree(document, prune=False, dry_run=False):
+    """
+    Create or update the project described by `document`
+
+    With ``prune=True`` groups and layers not present in the document are
+    deleted. With ``dry_run=True`` the transaction is rolled back after
+    computing the changes. Returns an ImportResult. Raises ValidationError on invalid
+    documents, leaving the database untouched.
+    """
+    if not isinstance(document, dict):
+        raise ValidationError('The tree document must be an object')
+    result = ImportResult()
+    project_data = document.get('project') or {}
+    if not isinstance(project_data, dict):
+        raise ValidationError('project must be an object')
+    nombre_corto = project_data.get('nombre_corto')
+    if not nombre_corto:
+        raise ValidationError('project.nombre_corto is required')
+
+    levels = _flatten_groups(document)
+    now = timezone.now()
+
+    with transaction.atomic():
+        incoming_project = _build(
+            Project, ['nombre_corto'] + PROJECT_FIELDS, project_data, f'project {nombre_corto}'
+        )
+        project = Project.objects.filter(nombre_corto=nombre_corto).first()
+        if project is None:
+            _validate_new(incoming_project, f'project {nombre_corto}')
+            incoming_project.save()
+            project = incoming_project
+            result.project_created = True
+        else:
+            fields = [field for field in PROJECT_FIELDS if field in project_data]
+            if _apply(project, incoming_project, fields):
+                project.save(update_fields=fields + ['updated_at'])
+                result.project_updated = True
+
+        existing_groups = list(LayerGroup.objects.filter(proyecto=project).order_by())
+        by_pk = {group.pk: group for group in existing_groups}
+        paths = {}
+
+        def path_of(group):
+            if group.pk not in paths:
+                parent = by_pk.get(group.parent_group_id)
+                paths[group.pk] = (path_of(parent) if parent else ()) + (group.nombre,)
+            return paths[group.pk]
+
+        groups_by_path = {path_of(group): group for group in existing_groups}
+        kept_group_ids = set()
+        layer_specs = []
+
+        for level in levels:
+            to_create, to_update = [], []
+            for path, parent_path, data in level:
+                label = f"group {'/'.join(path)}"
+                incoming = _build(LayerGroup, GROUP_FIELDS, data, label)
+                parent = groups_by_path[parent_path] if parent_path else None
+                group = groups_by_path.get(path)
+                if group is None:
+                    _validate_new(incoming, label)
+                    incoming.proyecto = project
+                    incoming.parent_group = parent
+                    groups_by_path[path] = incoming
+                    to_create.append(incoming)
+                else:
+                    kept_group_ids.add(group.pk)
+                    if _apply(group, incoming, [field for field in GROUP_FIELDS if field in data]):
+                        group.updated_at = now
+                        to_update.append(group)
+                layer_specs.append((path, data.get('layers', [])))
+
+            LayerGroup.objects.bulk_create(to_create)
+            LayerGroup.objects.bulk_update(to_update, GROUP_FIELDS + ['updated_at'])
+            kept_group_ids.update(group.pk for group in to_create)
+            result.groups_created += len(to_create)
+            result.groups_updated += len(to_update)
+
+        existing_layers = {
+            (layer.grupo_id, layer.nombre_geoserver): layer
+            for layer in Layer.objects.filter(grupo__proyecto=project).order_by()
+        }
+        kept_layer_ids = set()
+        layers_to_create, layers_to_update = [], []
+        for path, layers in layer_specs:
+            group = groups_by_path[path]
+            seen = set()
+            for data in layers:
+                label = f"layer {'/'.join(path)}/{data.get('nombre_geoserver')}"
+                incoming = _build(Layer, LAYER_FIELDS, data, label)
+                key = (group.pk, incoming.nombre_geoserver)
+                if key in seen:
+                    raise ValidationError(f"Duplicate {label}")
+                seen.add(key)
+                layer = existing_layers.get(key)
+                if layer is None:
+                    _validate_new(incoming, label)
+                    incoming.grupo = group
+                    layers_to_create.append(incoming)
+                else:
+                    kept_layer_ids.add(layer.pk)
+                    if _apply(layer, incoming, [field for field in LAYER_FIELDS if field in data]):
+                        layer.updated_at = now
+                        layers_to_update.append(layer)
+
+        Layer.objects.bulk_create(layers_to_create)
+        Layer.objects.bulk_update(layers_to_update, LAYER_FIELDS + ['updated_at'])
+        result.layers_created = len(layers_to_create)
+        result.layers_updated = len(layers_to_update)
+
+        if prune:
+            stale_layers = [
+                layer.pk for layer in existing_layers.values()
+                if layer.pk not in kept_layer_ids and layer.grupo_id in kept_group_ids
+            ]
+            stale_groups = [pk for pk in by_pk if pk not in kept_group_ids]
+            # Layers of stale groups are removed by the cascade
+            result.layers_deleted = len(existing_layers) - len(kept_layer_ids)
+            result.groups_deleted = len(stale_groups)
+            Layer.objects.filter(pk__in=stale_layers).delete()
+            LayerGroup.objects.filter(pk__in=stale_groups).delete()
+
+        if dry_run:
+            transaction.set_rollback(True)
+
+    return result
+
+
+def nombre_corto_taken(nombre_corto):
+    return f'A project with nombre_corto "{nombre_corto}" already exists'
+
+
+def clone_project(project, nombre_corto, nombre=None):
+    """
+    Deep-copy `project` with all its layer groups and layers
+
+    Groups are copied one tree level at a time so every copy can point to
+    its already-inserted parent, and layers are copied in batches, so the
+    number of queries depends on the tree depth, not on its size.
+    Returns the new Project. Raises ValidationError if `nombre_corto` is
+    taken, including by a concurrent clone.
+    """
+    with transaction.atomic():
+        clone = Project(**{field: getattr(project, field) for field in PROJECT_FIELDS})
+        clone.nombre_corto = nombre_corto
+        clone.nombre = nombre or project.nombre
+        try:
+            with transaction.atomic():
+                clone.save()
+        except IntegrityError:
+            raise ValidationError({'nombre_corto': [nombre_corto_taken(nombre_corto)]})
+
+        groups = list(LayerGroup.objects.filter(proyecto=project).order_by())
+        children = {}
+        for group in groups:
+            children.setdefault(group.parent_group_id, []).append(group)
+
+        new_ids = {}
+        level = children.get(None, [])
+        while level:
+            copies = []
+            for group in level:
+                copy = LayerGroup(
+                    proyecto=clone,
+                    parent_group_id=new_ids.get(group.parent_group_id),
+                    **{field: getattr(group, field) for field in GROUP_FIELDS},
+                )
+                copies.append(copy)
+            LayerGroup.objects.bulk_create(copies)
+            new_ids.update((group.pk, copy.pk) for group, copy in zip(level, copies))
+            level = [child for group in level for child in children.get(group.pk, [])]
+
+        layers = Layer.objects.filter(grupo__proyecto=project).order_by().values('grupo_id', *LAYER_FIELDS)
+        Layer.objects.bulk_create(
+            (Layer(grupo_id=new_ids[row.pop('grupo_id')], **row) for row in layers.iterator()),
+            batch_size=1000,
+        )
+
+    return clone
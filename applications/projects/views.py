@@ -1,17 +1,53 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 import json
+from applications.common.pagination import KeysetPagination
+from applications.common.views import FieldSelectionMixin
 from .models import Project, LayerGroup, Layer
 from .serializers import (
     ProjectSerializer, ProjectDetailSerializer, LayerGroupSerializer,
-    LayerSerializer
+    LayerSerializer, ProjectCloneSerializer
 )
+from .group_index import get_group_index
+from .tree import clone_project
+
+
+def _int_param(request, name):
+    """
+    Return query parameter `name` as an int, None if absent; 400 if malformed
+    """
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: 'Must be an integer'})
+
+
+def _bool_param(request, name):
+    """
+    Return query parameter `name` as a bool, None if absent; 400 if malformed
+    """
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    value = value.lower()
+    if value in ('true', '1'):
+        return True
+    if value in ('false', '0'):
+        return False
+    raise ValidationError({name: 'Must be true or false'})
 
 
 @staff_member_required
@@ -19,7 +55,8 @@ from .serializers import (
 def filter_groups_by_project(request):
     """
     AJAX view to filter layer groups by project for admin interface
-    Returns JSON response with groups for the selected project
+    Returns JSON response with groups for the selected project, named with
+    their full breadcrumb and served from the cached group index with an ETag
     """
     # Check if user is staff and has proper permissions
     if not request.user.is_staff:
@@ -50,30 +87,14 @@ def filter_groups_by_project(request):
     try:
         # Validate project_id is a valid integer
         project_id = int(project_id)
-        project = Project.objects.get(pk=project_id)
-        groups = LayerGroup.objects.filter(proyecto=project).select_related('parent_group').order_by('orden', 'nombre')
-
-        # Build hierarchical group data
-        groups_data = []
-        for group in groups:
-            if group.parent_group:
-                display_name = f"{group.parent_group.nombre} → {group.nombre}"
-            else:
-                display_name = group.nombre
-
-            groups_data.append({
-                'id': group.pk,
-                'nombre': display_name,
-                'parent_id': group.parent_group.pk if group.parent_group else None,
-                'orden': group.orden
-            })
+        etag, payload = get_group_index(project_id)
+        etag = quote_etag(etag)
 
-        return JsonResponse({
-            'success': True,
-            'groups': groups_data,
-            'project_name': project.nombre_corto,
-            'count': len(groups_data)
-        })
+        response = get_conditional_response(request, etag=etag) or JsonResponse(payload)
+        response['ETag'] = etag
+        # Let the browser keep the index but revalidate it on every use
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
     except ValueError:
         return JsonResponse({'error': 'Invalid project_id format'}, status=400)
@@ -133,24 +154,47 @@ class ProjectViewSet(viewsets.ReadOnlyModelViewSet):
         serializer = LayerSerializer(layers, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def clone(self, request, pk=None):
+        """
+        Deep-copy a project with all its layer groups and layers
+        """
+        project = self.get_object()
+        serializer = ProjectCloneSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            clone = clone_project(project, **serializer.validated_data)
+        except DjangoValidationError as e:
+            # A concurrent clone took the name after it was validated
+            raise ValidationError(e.message_dict)
+        return Response(ProjectSerializer(clone).data, status=status.HTTP_201_CREATED)
 
 
-class LayerGroupViewSet(viewsets.ModelViewSet):
+class LayerGroupViewSet(FieldSelectionMixin, viewsets.ModelViewSet):
     """
     ViewSet for LayerGroup model with full CRUD operations
+
+    Lists are keyset-paginated by (orden, id) and accept ``?project=``
+    and ``?fields=``.
     """
     queryset = LayerGroup.objects.all()
     serializer_class = LayerGroupSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """
-        Filter by project if provided
+        Filter by project if provided, prefetching only the requested nested data
         """
         queryset = LayerGroup.objects.all()
-        project_id = self.request.query_params.get('project', None)
+        project_id = _int_param(self.request, 'project')
         if project_id is not None:
             queryset = queryset.filter(proyecto_id=project_id)
+
+        if self.wants_field('layers'):
+            queryset = queryset.prefetch_related('layers')
+        if self.wants_field('subgroups'):
+            queryset = queryset.prefetch_related('subgroups__layers', 'subgroups__subgroups')
         return queryset
 
     def perform_create(self, serializer):
@@ -166,24 +210,31 @@ class LayerGroupViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 
-class LayerViewSet(viewsets.ReadOnlyModelViewSet):
+class LayerViewSet(FieldSelectionMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for Layer model
+
+    Lists are keyset-paginated by (orden, id) and accept ``?project=``,
+    ``?group=``, ``?estado_inicial=`` and ``?fields=``.
     """
     queryset = Layer.objects.all()
     serializer_class = LayerSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """
-        Filter by project or group if provided
+        Filter by project, group or initial state if provided
         """
         queryset = Layer.objects.all()
-        project_id = self.request.query_params.get('project', None)
-        group_id = self.request.query_params.get('group', None)
+        project_id = _int_param(self.request, 'project')
+        group_id = _int_param(self.request, 'group')
+        estado_inicial = _bool_param(self.request, 'estado_inicial')
 
         if project_id is not None:
             queryset = queryset.filter(grupo__proyecto_id=project_id)
         if group_id is not None:
             queryset = queryset.filter(grupo_id=group_id)
+        if estado_inicial is not None:
+            queryset = queryset.filter(estado_inicial=estado_inicial)
 
         return queryset
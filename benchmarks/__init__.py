@@ -0,0 +1,77 @@
+"""
+Micro-benchmarks for Visor I2D Backend
+
+Benchmarks run against the in-memory SQLite test settings, so they need no
+external services. Run them from the project root, e.g.:
+
+    python -m benchmarks.bench_renderers
+"""
+import os
+import timeit
+
+
+def setup_django(settings_module='tests.test_settings'):
+    """Configure Django and create the tables of the managed models"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    os.environ.setdefault('DJANGO_SECRET_KEY', 'benchmark-secret-key')
+
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command('migrate', run_syncdb=True, verbosity=0)
+
+
+def best_of(func, number=200, repeat=5):
+    """Return the best per-call time of `func` in milliseconds"""
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1000
+
+
+def seed_project_tree(nombre_corto='bench', groups=10, subgroups=3, layers=8):
+    """
+    Create a project with `groups` top-level groups, each with `subgroups`
+    subgroups, and `layers` layers in every group
+    """
+    from applications.projects.models import Project, LayerGroup, Layer
+
+    project = Project.objects.create(
+        nombre_corto=nombre_corto,
+        nombre=f'Proyecto {nombre_corto}',
+        coordenada_central_x=-8113332,
+        coordenada_central_y=464737,
+    )
+
+    def add_layers(group):
+        Layer.objects.bulk_create([
+            Layer(
+                grupo=group,
+                nombre_geoserver=f'{group.nombre}_capa_{i}',
+                nombre_display=f'Capa {i} – {group.nombre}',
+                store_geoserver='Historicos',
+                metadata_id='09ee583d-d397-4eb8-99df-92bb6f0d0c4c',
+                orden=i,
+            )
+            for i in range(layers)
+        ])
+
+    for g in range(groups):
+        group = LayerGroup.objects.create(proyecto=project, nombre=f'Grupo {g}', orden=g)
+        add_layers(group)
+        for s in range(subgroups):
+            subgroup = LayerGroup.objects.create(
+                proyecto=project, nombre=f'Subgrupo {g}.{s}', orden=s, parent_group=group
+            )
+            add_layers(subgroup)
+
+    return project
+
+
+def print_table(title, rows):
+    """Print benchmark results as an aligned table"""
+    print(title)
+    print('-' * len(title))
+    width = max(len(name) for name, _ in rows)
+    for name, value in rows:
+        print(f'{name:<{width}}  {value}')
+    print()
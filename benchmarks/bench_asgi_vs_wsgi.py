@@ -0,0 +1,69 @@
+"""
+Load test comparing the two deployment modes on the same endpoints:
+gunicorn with gevent workers serving i2dbackend.wsgi, and gunicorn with
+uvicorn workers serving i2dbackend.asgi (async views)
+
+Unlike the other benchmarks this one drives real servers over HTTP, so it
+needs a configured database and, with ``--start``, gevent and uvicorn
+installed. ``--start`` launches both servers from i2dbackend/gunicorn.conf.py
+(same workers, timeouts and settings, only SERVER_INTERFACE differs);
+otherwise point ``--wsgi-url`` and ``--asgi-url`` at running servers.
+
+`--concurrency` keep-alive connections per server each send requests back
+to back for `--duration` seconds, endpoint by endpoint, and the latency
+percentiles, throughput and error count of every endpoint are reported.
+
+    python -m benchmarks.bench_asgi_vs_wsgi --start [--concurrency 200] [--duration 20]
+    python -m benchmarks.bench_asgi_vs_wsgi --wsgi-url http://10.0.0.5:8001 --asgi-url http://10.0.0.6:8001
+"""
+import argparse
+import asyncio
+from urllib.parse import urlsplit
+
+from benchmarks import print_table
+from benchmarks.loadgen import format_stats, latency_stats, load, start_server, wait_until_up
+
+DEFAULT_PATHS = [
+    '/health/live/',
+    '/health/',
+    '/api/gbif/gbifinfo',
+    '/api/dpto/charts/05',
+    '/api/mpio/charts/05001',
+    '/api/mpio/search/bogota',
+    '/api/gbif/descargarz?codigo_dpto=05',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--wsgi-url', default='http://127.0.0.1:8101')
+    parser.add_argument('--asgi-url', default='http://127.0.0.1:8102')
+    parser.add_argument('--start', action='store_true', help='start both servers on the --*-url ports')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per endpoint and server')
+    parser.add_argument('--path', action='append', dest='paths', help='endpoint to test (repeatable)')
+    args = parser.parse_args()
+
+    servers = {'gevent WSGI': args.wsgi_url.rstrip('/'), 'uvicorn ASGI': args.asgi_url.rstrip('/')}
+    processes = []
+    try:
+        if args.start:
+            processes = [start_server('wsgi', urlsplit(args.wsgi_url).port),
+                         start_server('asgi', urlsplit(args.asgi_url).port)]
+        for base_url in servers.values():
+            wait_until_up(base_url)
+
+        for path in args.paths or DEFAULT_PATHS:
+            rows = []
+            for label, base_url in servers.items():
+                stats = latency_stats(*asyncio.run(load(base_url, path, args.concurrency, args.duration)))
+                rows.append((label, format_stats(stats)))
+            print_table(f'GET {path}  ({args.concurrency} connections, {args.duration:g} s)', rows)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
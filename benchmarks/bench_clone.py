@@ -0,0 +1,42 @@
+"""
+Measure project cloning time and query count on a large seeded project
+
+    python -m benchmarks.bench_clone [--groups N] [--subgroups N] [--layers N]
+"""
+import argparse
+import time
+
+from benchmarks import setup_django, seed_project_tree, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--subgroups', type=int, default=5)
+    parser.add_argument('--layers', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from applications.projects.models import LayerGroup, Layer
+    from applications.projects.tree import clone_project
+
+    project = seed_project_tree(groups=args.groups, subgroups=args.subgroups, layers=args.layers)
+
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        clone = clone_project(project, 'bench-clone')
+        elapsed = (time.perf_counter() - start) * 1000
+
+    print_table('Project clone', [
+        ('groups copied', LayerGroup.objects.filter(proyecto=clone).count()),
+        ('layers copied', Layer.objects.filter(grupo__proyecto=clone).count()),
+        ('queries', len(queries)),
+        ('time', f'{elapsed:.1f} ms'),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Load test of per-request database connection overhead: a new connection per
+request (Django's CONN_MAX_AGE = 0 with the plain postgis backend) against
+checkouts from the applications.common.db_pool ConnectionPool
+
+`--clients` threads each run `--requests` requests of one query. With
+``--dsn`` the requests connect to a real PostgreSQL server and run
+``SELECT 1``; without it the connection handshake and the query are
+simulated with sleeps of ``--connect-ms`` and ``--query-ms``.
+
+    python -m benchmarks.bench_db_pool [--dsn "dbname=... host=..."] [--clients 50] [--pool-size 20]
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from benchmarks import setup_django, print_table
+
+
+class SimulatedConnection:
+    def __init__(self, connect_ms, query_ms):
+        time.sleep(connect_ms / 1000)
+        self.query_ms = query_ms
+        self.closed = 0
+
+    def query(self):
+        time.sleep(self.query_ms / 1000)
+
+    def close(self):
+        self.closed = 1
+
+
+class PostgresConnection:
+    def __init__(self, dsn):
+        import psycopg2
+
+        self.connection = psycopg2.connect(dsn)
+        self.connection.autocommit = True
+
+    @property
+    def closed(self):
+        return self.connection.closed
+
+    def query(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+
+    def close(self):
+        self.connection.close()
+
+
+def run_load(request, clients, requests):
+    """Run `request()` `requests` times on each of `clients` threads; return latencies in ms and wall time"""
+    latencies = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(clients + 1)
+
+    def client():
+        own = []
+        start_barrier.wait()
+        for _ in range(requests):
+            start = time.perf_counter()
+            request()
+            own.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start
+
+
+def summarize(label, latencies, wall, opened):
+    quantiles = statistics.quantiles(latencies, n=100)
+    return (label, f'p50 {quantiles[49]:7.2f} ms  p95 {quantiles[94]:7.2f} ms  '
+                   f'{len(latencies) / wall:8.0f} req/s  {opened:5d} connections opened')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dsn', help='libpq connection string of a PostgreSQL server to use')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--pool-size', type=int, default=20)
+    parser.add_argument('--connect-ms', type=float, default=5.0, help='simulated handshake time')
+    parser.add_argument('--query-ms', type=float, default=1.0, help='simulated query time')
+    args = parser.parse_args()
+
+    setup_django()
+
+    from applications.common.db_pool.pool import ConnectionPool, POOL_WAIT
+
+    opened = []
+
+    def connect():
+        connection = PostgresConnection(args.dsn) if args.dsn else SimulatedConnection(args.connect_ms, args.query_ms)
+        opened.append(connection)
+        return connection
+
+    def unpooled_request():
+        connection = connect()
+        try:
+            connection.query()
+        finally:
+            connection.close()
+
+    pool = ConnectionPool('bench', max_size=args.pool_size, timeout=60,
+                          reset=lambda connection: not connection.closed)
+
+    def pooled_request():
+        connection = pool.acquire(connect)
+        try:
+            connection.query()
+        finally:
+            pool.release(connection)
+
+    rows = []
+    latencies, wall = run_load(unpooled_request, args.clients, args.requests)
+    rows.append(summarize('connection per request', latencies, wall, len(opened)))
+
+    opened.clear()
+    latencies, wall = run_load(pooled_request, args.clients, args.requests)
+    rows.append(summarize(f'pool of {args.pool_size}', latencies, wall, len(opened)))
+    counts = POOL_WAIT.values[('bench',)]
+    rows.append(('pool wait', f'mean {counts[-1] / sum(counts[:-1]) * 1000:7.2f} ms per checkout'))
+    pool.close_idle()
+
+    target = 'PostgreSQL' if args.dsn else f'simulated ({args.connect_ms} ms connect, {args.query_ms} ms query)'
+    print_table(f'{args.clients} clients x {args.requests} requests, {target}', rows)
+
+
+if __name__ == '__main__':
+    main()
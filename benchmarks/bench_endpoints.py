@@ -0,0 +1,201 @@
+"""
+Load test of the public API endpoints with saved baselines
+
+Seeds a benchmark database with production-like volumes (benchmarks.seed:
+33 departments, 1,100 municipalities, large layer trees), starts gunicorn
+on it from i2dbackend/gunicorn.conf.py and drives the chart, search,
+project, gbifinfo and descargarzip endpoints over HTTP. Every endpoint gets
+`--warmup` seconds of discarded load, then `--concurrency` keep-alive
+connections for `--duration` seconds; p50/p95/p99 latency, requests/s and
+errors (4xx/5xx and failed connections) are reported.
+
+It needs PostgreSQL/PostGIS: the server of the DB_* settings hosts the
+benchmark database (``<DB_NAME>_bench``, recreated on every run unless
+``--keepdb``), and the configured database itself is never touched.
+``--database`` only accepts names ending in ``_bench`` unless ``--force``
+is given, since the database is dropped and recreated. With
+``--url`` an already running server (with its own data) is loaded instead.
+
+``--save-baseline NAME`` writes the results to benchmarks/baselines/NAME.json,
+``--compare NAME`` reports the change against it and exits with status 1
+when an endpoint's p95 rose, or its throughput fell, by more than
+``--tolerance``, or it started failing. Compare runs of the same
+concurrency, duration and machine.
+
+    python -m benchmarks.bench_endpoints --save-baseline main
+    python -m benchmarks.bench_endpoints --keepdb --compare main [--concurrency 50] [--duration 10]
+    python -m benchmarks.bench_endpoints --url http://localhost:8001 --compare main
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks import print_table
+from benchmarks.loadgen import PROJECT_ROOT, format_stats, latency_stats, load, start_server, wait_until_up
+
+BASELINE_DIR = Path(__file__).resolve().parent / 'baselines'
+
+DEFAULT_PATHS = [
+    '/api/dpto/charts/05',
+    '/api/dpto/dangerCharts/05',
+    '/api/mpio/charts/05001',
+    '/api/mpio/dangerCharts/05001',
+    '/api/mpio/search/buca',
+    '/api/mpio/search/san',
+    '/api/projects/',
+    '/api/projects/by-name/bench-0/',
+    '/api/gbif/gbifinfo',
+    '/api/gbif/descargarz?codigo_mpio=05001',
+    '/api/gbif/descargarz?codigo_dpto=05',
+]
+
+
+def prepare_database(args):
+    """Create and seed the benchmark database; return its name"""
+    os.environ['DJANGO_SETTINGS_MODULE'] = args.settings
+    import django
+
+    django.setup()
+    from django.db import connection
+
+    from benchmarks.seed import BENCH_SUFFIX, create_database, seed, table_counts
+
+    name = args.database or f'{connection.settings_dict["NAME"]}{BENCH_SUFFIX}'
+    if create_database(name, keepdb=args.keepdb, force=args.force):
+        counts = table_counts()
+    else:
+        counts = seed(municipalities=args.municipalities, projects=args.projects)
+    print_table(f'Benchmark database {name}', [(table, f'{count:8d} rows') for table, count in counts.items()])
+    connection.close()
+    return name
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def baseline_path(name):
+    return BASELINE_DIR / f'{name}.json'
+
+
+def save_baseline(name, results, args):
+    BASELINE_DIR.mkdir(exist_ok=True)
+    baseline = {
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'interface': args.interface,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'results': results,
+    }
+    path = baseline_path(name)
+    path.write_text(json.dumps(baseline, indent=2) + '\n')
+    return path
+
+
+def change(current, previous):
+    return (current - previous) / previous if previous else 0.0
+
+
+def compare(results, baseline, tolerance):
+    """Return the comparison table rows and the paths that regressed"""
+    rows, regressions = [], []
+    for path, stats in results.items():
+        previous = baseline['results'].get(path)
+        if previous is None:
+            rows.append((path, 'not in baseline'))
+            continue
+        if 'p95' not in stats or 'p95' not in previous:
+            regressed = stats['errors'] > previous['errors']
+            rows.append((path, f'{stats["errors"]} errors (baseline {previous["errors"]})'))
+        else:
+            p95_change = change(stats['p95'], previous['p95'])
+            rps_change = change(stats['rps'], previous['rps'])
+            regressed = (p95_change > tolerance or rps_change < -tolerance
+                         or (stats['errors'] > 0 and previous['errors'] == 0))
+            rows.append((path, f'p95 {previous["p95"]:8.2f} -> {stats["p95"]:8.2f} ms ({p95_change:+6.1%})  '
+                               f'{previous["rps"]:7.0f} -> {stats["rps"]:7.0f} req/s ({rps_change:+6.1%})  '
+                               f'errors {previous["errors"]} -> {stats["errors"]}'))
+        if regressed:
+            regressions.append(path)
+            rows[-1] = (rows[-1][0], rows[-1][1] + '  REGRESSION')
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='load a running server instead of seeding and starting one')
+    parser.add_argument('--port', type=int, default=8103, help='port of the started server')
+    parser.add_argument('--interface', choices=['wsgi', 'asgi'], default=os.getenv('SERVER_INTERFACE', 'wsgi'),
+                        help='SERVER_INTERFACE of the started server')
+    parser.add_argument('--settings', default=os.getenv('DJANGO_SETTINGS_MODULE', 'i2dbackend.settings.prod'))
+    parser.add_argument('--database', help='benchmark database name, ending in _bench (default <DB_NAME>_bench)')
+    parser.add_argument('--force', action='store_true',
+                        help='allow a --database name not ending in _bench (it is dropped and recreated)')
+    parser.add_argument('--keepdb', action='store_true', help='reuse the benchmark database and its data')
+    parser.add_argument('--municipalities', type=int, default=1100)
+    parser.add_argument('--projects', type=int, default=3, help='projects with large layer trees')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds per endpoint')
+    parser.add_argument('--warmup', type=float, default=2.0, help='discarded seconds per endpoint')
+    parser.add_argument('--path', action='append', dest='paths', help='endpoint to test (repeatable)')
+    parser.add_argument('--save-baseline', metavar='NAME', help='save the results as benchmarks/baselines/NAME.json')
+    parser.add_argument('--compare', metavar='NAME', help='compare the results with a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='relative p95 increase or throughput drop reported as a regression')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads(baseline_path(args.compare).read_text())
+
+    process = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            database = prepare_database(args)
+            # A host in the default ALLOWED_HOSTS of every settings module
+            base_url = f'http://localhost:{args.port}'
+            process = start_server(args.interface, args.port,
+                                   env={'DJANGO_SETTINGS_MODULE': args.settings, 'DB_NAME': database})
+        wait_until_up(base_url)
+
+        results, rows = {}, []
+        for path in args.paths or DEFAULT_PATHS:
+            if args.warmup:
+                asyncio.run(load(base_url, path, args.concurrency, args.warmup))
+            results[path] = latency_stats(*asyncio.run(load(base_url, path, args.concurrency, args.duration)))
+            rows.append((path, format_stats(results[path])))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print_table(f'{base_url}  ({args.concurrency} connections, {args.duration:g} s per endpoint)', rows)
+
+    if args.save_baseline:
+        print(f'Baseline saved to {save_baseline(args.save_baseline, results, args)}\n')
+
+    if baseline is not None:
+        if (baseline['concurrency'], baseline['duration']) != (args.concurrency, args.duration):
+            print(f'Warning: the baseline ran {baseline["concurrency"]} connections for '
+                  f'{baseline["duration"]:g} s per endpoint\n')
+        rows, regressions = compare(results, baseline, args.tolerance)
+        print_table(f'Against baseline {args.compare} ({baseline["revision"] or "unknown revision"}, '
+                    f'{baseline["created"]})', rows)
+        if regressions:
+            sys.exit(f'{len(regressions)} endpoint(s) regressed by more than {args.tolerance:.0%}')
+
+
+if __name__ == '__main__':
+    main()
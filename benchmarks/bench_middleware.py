@@ -0,0 +1,66 @@
+"""
+Compare per-request overhead of the five stacked custom middleware
+(SecurityHeaders, RequestLogging, DataQuality, APIVersioning, ErrorHandling)
+and the fused RequestPipelineMiddleware
+
+The stacked side uses the original classes (benchmarks.baseline_middleware),
+not the ones in applications/common/middleware.py, which have changed
+since. The view is a no-op returning a small response, so the numbers
+isolate the middleware work. Logging goes to a NullHandler at INFO level so
+formatting costs are included but nothing is written.
+
+    python -m benchmarks.bench_middleware [--number N]
+"""
+import argparse
+import logging
+
+from benchmarks import setup_django, best_of, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from applications.common.middleware import RequestPipelineMiddleware
+    from benchmarks.baseline_middleware import (
+        SecurityHeadersMiddleware, RequestLoggingMiddleware, DataQualityMiddleware,
+        APIVersioningMiddleware, ErrorHandlingMiddleware,
+    )
+
+    # The original middleware log requests here, the pipeline to the access log
+    for name in ('applications.common.middleware', 'applications.access'):
+        middleware_logger = logging.getLogger(name)
+        middleware_logger.handlers = [logging.NullHandler()]
+        middleware_logger.setLevel(logging.INFO)
+        middleware_logger.propagate = False
+
+    def view(request):
+        return HttpResponse(b'{}', content_type='application/json')
+
+    stacked = view
+    for middleware in (ErrorHandlingMiddleware, APIVersioningMiddleware, DataQualityMiddleware,
+                       RequestLoggingMiddleware, SecurityHeadersMiddleware):
+        stacked = middleware(stacked)
+    fused = RequestPipelineMiddleware(view)
+
+    factory = RequestFactory()
+    rows = []
+    for label, path in [('static', '/static/js/app.js'), ('health', '/health/'),
+                        ('admin', '/admin/'), ('api', '/api/projects/?page_size=10'),
+                        ('other', '/mpio/?mpio=05001')]:
+        request = factory.get(path)
+        stacked_ms = best_of(lambda: stacked(request), number=args.number)
+        fused_ms = best_of(lambda: fused(request), number=args.number)
+        rows.append((f'{label:<7} stacked', f'{stacked_ms * 1000:7.1f} µs'))
+        rows.append((f'{label:<7} fused', f'{fused_ms * 1000:7.1f} µs  ({stacked_ms / fused_ms:.1f}x)'))
+
+    print_table('Per-request middleware overhead', rows)
+
+
+if __name__ == '__main__':
+    main()
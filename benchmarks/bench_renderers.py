@@ -0,0 +1,44 @@
+"""
+Compare JSON render time of DRF's JSONRenderer and FastJSONRenderer on real
+ProjectDetailSerializer output
+
+    python -m benchmarks.bench_renderers [--groups N] [--subgroups N] [--layers N]
+"""
+import argparse
+
+from benchmarks import setup_django, best_of, seed_project_tree, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--groups', type=int, default=10)
+    parser.add_argument('--subgroups', type=int, default=3)
+    parser.add_argument('--layers', type=int, default=8)
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from rest_framework.renderers import JSONRenderer
+    from applications.common.renderers import FastJSONRenderer, get_json_backend
+    from applications.projects.serializers import ProjectDetailSerializer
+
+    project = seed_project_tree(groups=args.groups, subgroups=args.subgroups, layers=args.layers)
+    data = ProjectDetailSerializer(project).data
+
+    stdlib = JSONRenderer()
+    fast = FastJSONRenderer()
+    assert stdlib.render(data) == fast.render(data), 'renderers produced different output'
+
+    stdlib_ms = best_of(lambda: stdlib.render(data), number=args.number)
+    fast_ms = best_of(lambda: fast.render(data), number=args.number)
+
+    print_table(f'ProjectDetailSerializer payload ({len(stdlib.render(data)) / 1024:.1f} KiB)', [
+        ('JSONRenderer (stdlib json)', f'{stdlib_ms:.3f} ms'),
+        (f'FastJSONRenderer ({get_json_backend()})', f'{fast_ms:.3f} ms'),
+        ('speed-up', f'{stdlib_ms / fast_ms:.1f}x'),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Worker cold-start time and import-time breakdown
+
+Every run starts a fresh interpreter and boots it the way a gunicorn worker
+does: import i2dbackend.wsgi (settings, apps, middleware), then serve a
+first request, which imports the URLconf and every view module. Runs
+alternate between ``LAZY_LOADING`` on and off (see
+applications.common.lazy), and the median boot, first-request and total
+times of each mode are reported, followed by the ``python -X importtime``
+breakdown of one cold start: self time per top-level package and the
+modules with the largest cumulative import time.
+
+    python -m benchmarks.bench_startup [--runs 7] [--top 20] [--path /health/live/]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+
+from benchmarks import print_table
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+WORKER = '''
+import json, sys, time
+start = time.perf_counter()
+from i2dbackend.wsgi import application
+booted = time.perf_counter()
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'wsgi.url_scheme': 'http', 'wsgi.input': sys.stdin.buffer,
+    'wsgi.errors': sys.stderr,
+}
+statuses = []
+b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+served = time.perf_counter()
+print(json.dumps({'boot': booted - start, 'first_request': served - booted, 'status': statuses[0]}))
+'''
+
+IMPORT_TIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def run_worker(path, lazy, importtime=False, settings_module='tests.test_settings'):
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': settings_module,
+        'DJANGO_SECRET_KEY': os.environ.get('DJANGO_SECRET_KEY', 'benchmark-secret-key'),
+        'LAZY_LOADING': 'true' if lazy else 'false',
+        'LOG_LEVEL': 'ERROR',
+    }
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', WORKER, path]
+    result = subprocess.run(command, cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def import_breakdown(stderr):
+    """Return (self time per top-level package, cumulative time per module) in ms"""
+    packages, modules = Counter(), {}
+    for line in stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            own, cumulative, _, module = match.groups()
+            packages[module.split('.')[0]] += int(own) / 1000
+            modules[module] = int(cumulative) / 1000
+    return packages, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=7, help='cold starts per mode')
+    parser.add_argument('--top', type=int, default=20, help='rows of the import-time breakdown')
+    parser.add_argument('--path', default='/health/live/', help='path of the first request')
+    parser.add_argument('--settings', default='tests.test_settings', help='settings module of the workers')
+    args = parser.parse_args()
+
+    samples = {True: [], False: []}
+    for _ in range(args.runs):
+        for lazy in (True, False):
+            sample, _ = run_worker(args.path, lazy, settings_module=args.settings)
+            samples[lazy].append(sample)
+
+    rows = []
+    for lazy, label in ((False, 'eager (LAZY_LOADING=false)'), (True, 'lazy (LAZY_LOADING=true)')):
+        boot = statistics.median(sample['boot'] for sample in samples[lazy]) * 1000
+        first = statistics.median(sample['first_request'] for sample in samples[lazy]) * 1000
+        total = statistics.median(sample['boot'] + sample['first_request'] for sample in samples[lazy]) * 1000
+        rows.append((label, f'boot {boot:7.1f} ms  first request {first:7.1f} ms  total {total:7.1f} ms  '
+                            f'(HTTP {samples[lazy][0]["status"]})'))
+    print_table(f'Worker cold start, median of {args.runs} runs, first request GET {args.path}', rows)
+
+    _, stderr = run_worker(args.path, lazy=True, importtime=True, settings_module=args.settings)
+    packages, modules = import_breakdown(stderr)
+    print_table(f'Import self time by package (lazy, total {sum(packages.values()):.1f} ms)', [
+        (package, f'{ms:8.1f} ms') for package, ms in packages.most_common(args.top)
+    ])
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    print_table('Slowest imports, cumulative (lazy)', [(module, f'{ms:8.1f} ms') for module, ms in slowest])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Compare per-request CPU cost of the ModelSerializer read path and the
+values-based read path (ValuesListAPIView) for the biodiversity list endpoints
+
+Database time is excluded: both paths are fed the same in-memory rows, so the
+numbers isolate serialization and rendering.
+
+    python -m benchmarks.bench_values_views [--rows N]
+"""
+import argparse
+import datetime
+
+from benchmarks import setup_django, best_of, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=50, help='rows per response')
+    parser.add_argument('--number', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from applications.common.renderers import FastJSONRenderer
+    from applications.dpto.models import DptoQueries, DptoAmenazas
+    from applications.dpto.views import dptoQuery, dptoDanger
+    from applications.gbif.models import gbifInfo
+    from applications.gbif.views import GbifInfo
+    from applications.mupiopolitico.models import MpioPolitico
+    from applications.mupiopolitico.views import mupioSearch
+
+    renderer = FastJSONRenderer()
+    n = args.rows
+    cases = [
+        ('charts', dptoQuery, DptoQueries,
+         [(f'tipo_{i}', i * 10, i * 3, i, i * 2) for i in range(n)]),
+        ('dangerCharts', dptoDanger, DptoAmenazas,
+         [('05', 'CR'[i % 2], i, 'ANTIOQUIA') for i in range(n)]),
+        ('gbifinfo', GbifInfo, gbifInfo,
+         [(i, datetime.date(2024, 1, 1) + datetime.timedelta(days=i), f'10.15468/dl.{i}') for i in range(n)]),
+        ('search', mupioSearch, MpioPolitico,
+         [(i, f'MUNICIPIO {i}', 'SANTANDER', '[-73.1, 7.1]') for i in range(n)]),
+    ]
+
+    rows = []
+    for name, view, model, tuples in cases:
+        fields = [source for _, source, _ in view.get_values_fields()]
+        instances = [model(**dict(zip(fields, row))) for row in tuples]
+        serializer_class = view.serializer_class
+        assert renderer.render(serializer_class(instances, many=True).data) == \
+            renderer.render(view.rows_to_data(tuples)), f'{name}: output differs'
+
+        serializer_ms = best_of(
+            lambda: renderer.render(serializer_class(instances, many=True).data), number=args.number)
+        values_ms = best_of(
+            lambda: renderer.render(view.rows_to_data(tuples)), number=args.number)
+        rows.append((f'{name:<13} serializer', f'{serializer_ms * 1000:8.1f} µs'))
+        rows.append((f'{name:<13} values', f'{values_ms * 1000:8.1f} µs  ({serializer_ms / values_ms:.1f}x)'))
+
+    print_table(f'Serialize + render, {n} rows per request', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+HTTP load generation shared by the load-test benchmarks
+
+`load()` opens `concurrency` keep-alive connections that each send GET
+requests back to back for `duration` seconds and collects the latency of
+every successful response; `latency_stats()` reduces them to percentiles
+and throughput. `start_server()` launches gunicorn from
+i2dbackend/gunicorn.conf.py, the configuration production uses.
+"""
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from urllib.parse import urlsplit
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+class Connection:
+    """Minimal HTTP/1.1 keep-alive client"""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, path):
+        """GET `path`; return the status code after reading the whole body"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f'GET {path} HTTP/1.1\r\nHost: {self.host}\r\n\r\n'.encode())
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('connection closed by server')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        else:
+            await self.reader.read()
+            self.close()
+
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def load(base_url, path, concurrency, duration):
+    """Hit `path` from `concurrency` connections for `duration` seconds; return latencies (ms), errors, wall"""
+    url = urlsplit(base_url)
+    latencies, errors = [], 0
+    stop_at = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        connection = Connection(url.hostname, url.port or 80)
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                status = await connection.request(path)
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                errors += 1
+                connection.close()
+                continue
+            if status >= 400:
+                errors += 1
+            else:
+                latencies.append((time.perf_counter() - start) * 1000)
+        connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def latency_stats(latencies, errors, wall):
+    """Return the p50/p95/p99 latency (ms), throughput and error count of one load() run"""
+    stats = {'requests': len(latencies), 'errors': errors, 'rps': len(latencies) / wall if wall else 0.0}
+    if len(latencies) >= 2:
+        quantiles = statistics.quantiles(latencies, n=100)
+        stats.update(p50=quantiles[49], p95=quantiles[94], p99=quantiles[98])
+    return stats
+
+
+def format_stats(stats):
+    if 'p50' not in stats:
+        return f'{stats["requests"]} successful requests, {stats["errors"]} errors'
+    return (f'p50 {stats["p50"]:8.2f} ms  p95 {stats["p95"]:8.2f} ms  p99 {stats["p99"]:8.2f} ms  '
+            f'{stats["rps"]:8.0f} req/s  {stats["errors"]:5d} errors')
+
+
+def start_server(interface, port, env=None):
+    """Start gunicorn with i2dbackend/gunicorn.conf.py on 127.0.0.1:`port`"""
+    env = {**os.environ, **(env or {}), 'SERVER_INTERFACE': interface, 'GUNICORN_BIND': f'127.0.0.1:{port}'}
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'i2dbackend/gunicorn.conf.py'],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+
+
+def wait_until_up(base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'{base_url}/health/live/', timeout=1).close()
+            return
+        except urllib.error.HTTPError:
+            # Answering at all is enough (e.g. a 400 for a host not in ALLOWED_HOSTS)
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f'{base_url} did not come up within {timeout}s')
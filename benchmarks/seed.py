@@ -0,0 +1,205 @@
+"""
+Benchmark database with production-like volumes
+
+The chart, search and download endpoints read unmanaged PostGIS tables of
+the ``gbif_consultas`` schema (and the chart views use ``DISTINCT ON``), so
+the load tests need PostgreSQL/PostGIS; the in-memory SQLite settings of
+the micro-benchmarks cannot serve them. ``create_database()`` creates a
+separate database next to the configured one (``<DB_NAME>_bench`` by
+default; other names must also end in ``_bench``, and it is never the
+configured database itself) with the schemas of the
+search path, migrates it and points the ``default`` connection at it.
+``seed()`` then fills it, deterministically:
+
+- 33 departments and 1,100 municipalities (DIVIPOLA-style codes, so
+  ``05``/``05001`` and ``11``/``11001`` exist) with `types` chart rows of
+  `rows_per_type` rows each and three threat categories per area
+- the municipality search table, names drawn from common prefixes so
+  searches like ``san`` match many rows
+- `gbif_downloads` rows of GBIF download history
+- `projects` projects with large layer trees (benchmarks.seed_project_tree)
+"""
+import datetime
+import random
+
+from benchmarks import seed_project_tree
+
+BENCH_SUFFIX = '_bench'
+
+SCHEMAS = ['django', 'gbif_consultas', 'capas_base', 'geovisor']
+
+DEPARTMENTS = [
+    ('05', 'ANTIOQUIA'), ('08', 'ATLÁNTICO'), ('11', 'BOGOTÁ, D.C.'), ('13', 'BOLÍVAR'),
+    ('15', 'BOYACÁ'), ('17', 'CALDAS'), ('18', 'CAQUETÁ'), ('19', 'CAUCA'), ('20', 'CESAR'),
+    ('23', 'CÓRDOBA'), ('25', 'CUNDINAMARCA'), ('27', 'CHOCÓ'), ('41', 'HUILA'), ('44', 'LA GUAJIRA'),
+    ('47', 'MAGDALENA'), ('50', 'META'), ('52', 'NARIÑO'), ('54', 'NORTE DE SANTANDER'),
+    ('63', 'QUINDÍO'), ('66', 'RISARALDA'), ('68', 'SANTANDER'), ('70', 'SUCRE'), ('73', 'TOLIMA'),
+    ('76', 'VALLE DEL CAUCA'), ('81', 'ARAUCA'), ('85', 'CASANARE'), ('86', 'PUTUMAYO'),
+    ('88', 'SAN ANDRÉS'), ('91', 'AMAZONAS'), ('94', 'GUAINÍA'), ('95', 'GUAVIARE'), ('97', 'VAUPÉS'),
+    ('99', 'VICHADA'),
+]
+
+CAPITALS = {
+    '05001': 'MEDELLÍN', '08001': 'BARRANQUILLA', '11001': 'BOGOTÁ, D.C.', '68001': 'BUCARAMANGA',
+    '76001': 'CALI',
+}
+
+NAME_PREFIXES = ['SAN', 'SANTA', 'PUERTO', 'VILLA', 'LA', 'EL', 'NUEVO', 'SANTO']
+NAME_ROOTS = ['JOSÉ', 'ROSA', 'BOLÍVAR', 'NARIÑO', 'LIBERTAD', 'UNIÓN', 'ESPERANZA', 'PAZ', 'CARMEN',
+              'BÁRBARA', 'DOMINGO', 'RICO', 'VERDE', 'ALEGRE', 'BELÉN', 'CRUZ']
+
+TYPES = ['total', 'aves', 'mamiferos', 'reptiles', 'anfibios', 'peces', 'plantas', 'hongos',
+         'insectos', 'moluscos']
+# Critically endangered, endangered, vulnerable
+THREAT_TYPES = ['C', 'E', 'V']
+
+BATCH_SIZE = 5000
+
+TABLES = '''
+CREATE TABLE IF NOT EXISTS gbif_consultas.{queries} (
+    id serial PRIMARY KEY, codigo varchar(5), tipo text, registers bigint, species bigint,
+    exoticas bigint, endemicas bigint, geom geometry, nombre varchar(254)
+);
+CREATE INDEX IF NOT EXISTS {queries}_codigo ON gbif_consultas.{queries} (codigo);
+CREATE TABLE IF NOT EXISTS gbif_consultas.{threats} (
+    id serial PRIMARY KEY, codigo varchar(5), tipo varchar(1), amenazadas bigint, geom geometry,
+    nombre varchar(254)
+);
+CREATE INDEX IF NOT EXISTS {threats}_codigo ON gbif_consultas.{threats} (codigo);
+'''
+
+SEARCH_TABLES = '''
+CREATE TABLE IF NOT EXISTS gbif_consultas.mpio_politico (
+    gid serial PRIMARY KEY, codigo varchar(5), dpto_nombre varchar(254), nombre varchar(254),
+    nombre_unaccented varchar(254), area_ha numeric, geom geometry, coord_central text
+);
+CREATE TABLE IF NOT EXISTS gbif_consultas.gbif_info (
+    id serial PRIMARY KEY, download_date date NOT NULL, doi text
+);
+'''
+
+
+def create_database(name, keepdb=False, force=False):
+    """
+    Create (or with `keepdb`, reuse) database `name` on the server of the
+    ``default`` connection, switch ``default`` to it and migrate it; return
+    whether it already existed
+
+    Only names ending in ``_bench`` are accepted unless `force` is set.
+    """
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection
+
+    # It is dropped and recreated, so never accept an arbitrary database
+    if not name.endswith(BENCH_SUFFIX) and not force:
+        raise ValueError(f'Refusing to use {name!r}: benchmark database names must end in {BENCH_SUFFIX!r} '
+                         '(pass force=True to drop and recreate it anyway)')
+    if name == connection.settings_dict['NAME']:
+        raise ValueError('The benchmark database must not be the configured database')
+
+    with connection._nodb_cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_database WHERE datname = %s', [name])
+        exists = cursor.fetchone() is not None
+        if exists and not keepdb:
+            cursor.execute(f'DROP DATABASE {connection.ops.quote_name(name)}')
+            exists = False
+        if not exists:
+            cursor.execute(f'CREATE DATABASE {connection.ops.quote_name(name)}')
+
+    connection.close()
+    settings.DATABASES['default']['NAME'] = connection.settings_dict['NAME'] = name
+    with connection.cursor() as cursor:
+        # The search path (django, gbif_consultas, ...) has no public schema
+        for schema in SCHEMAS:
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {schema}')
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS postgis')
+    call_command('migrate', verbosity=0)
+    return exists
+
+
+def area_rows(model, code, name, rng, types, rows_per_type):
+    return [
+        model(codigo=code, tipo=kind, nombre=name, registers=rng.randint(100, 500_000),
+              species=rng.randint(10, 20_000), exoticas=rng.randint(0, 300), endemicas=rng.randint(0, 900))
+        for kind in types
+        for _ in range(rows_per_type)
+    ]
+
+
+def threat_rows(model, code, name, rng):
+    return [model(codigo=code, tipo=kind, nombre=name, amenazadas=rng.randint(0, 150)) for kind in THREAT_TYPES]
+
+
+def municipality_codes(count):
+    """Return `count` (code, department name) pairs spread evenly over the departments"""
+    codes = []
+    number = 1
+    while len(codes) < count:
+        for dpto, dpto_name in DEPARTMENTS[:count - len(codes)]:
+            codes.append((f'{dpto}{number:03d}', dpto_name))
+        number += 1
+    return codes
+
+
+def seed(municipalities=1100, types=len(TYPES), rows_per_type=3, gbif_downloads=600,
+         projects=3, groups=20, subgroups=5, layers=10, random_seed=1):
+    """Fill the benchmark database; return the row count of every table"""
+    from django.db import connection, transaction
+    from unidecode import unidecode
+
+    from applications.dpto.models import DptoQueries, DptoAmenazas
+    from applications.gbif.models import gbifInfo
+    from applications.mupio.models import MpioQueries, MpioAmenazas
+    from applications.mupiopolitico.models import MpioPolitico
+
+    rng = random.Random(random_seed)
+    kinds = TYPES[:types]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(TABLES.format(queries='dpto_queries', threats='dpto_amenazas'))
+        cursor.execute(TABLES.format(queries='mpio_queries', threats='mpio_amenazas'))
+        cursor.execute(SEARCH_TABLES)
+
+        dpto_rows, dpto_threats = [], []
+        for dpto, name in DEPARTMENTS:
+            dpto_rows += area_rows(DptoQueries, dpto, name, rng, kinds, rows_per_type)
+            dpto_threats += threat_rows(DptoAmenazas, dpto, name, rng)
+        DptoQueries.objects.bulk_create(dpto_rows)
+        DptoAmenazas.objects.bulk_create(dpto_threats)
+
+        mpio_rows, mpio_threats, towns = [], [], []
+        for code, dpto_name in municipality_codes(municipalities):
+            name = CAPITALS.get(code) or f'{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_ROOTS)}'
+            mpio_rows += area_rows(MpioQueries, code, name, rng, kinds, rows_per_type)
+            mpio_threats += threat_rows(MpioAmenazas, code, name, rng)
+            towns.append(MpioPolitico(
+                codigo=code, dpto_nombre=dpto_name, nombre=name, nombre_unaccented=unidecode(name),
+                coord_central=f'[{rng.uniform(-79, -67):.6f}, {rng.uniform(-4, 12):.6f}]',
+            ))
+        MpioQueries.objects.bulk_create(mpio_rows, batch_size=BATCH_SIZE)
+        MpioAmenazas.objects.bulk_create(mpio_threats, batch_size=BATCH_SIZE)
+        MpioPolitico.objects.bulk_create(towns)
+
+        first_download = datetime.date(2020, 1, 1)
+        gbifInfo.objects.bulk_create([
+            gbifInfo(download_date=first_download + datetime.timedelta(days=3 * i), doi=f'10.15468/dl.bench{i}')
+            for i in range(gbif_downloads)
+        ])
+
+        for index in range(projects):
+            seed_project_tree(f'bench-{index}', groups=groups, subgroups=subgroups, layers=layers)
+
+    return table_counts()
+
+
+def table_counts():
+    from applications.dpto.models import DptoQueries, DptoAmenazas
+    from applications.gbif.models import gbifInfo
+    from applications.mupio.models import MpioQueries, MpioAmenazas
+    from applications.mupiopolitico.models import MpioPolitico
+    from applications.projects.models import Project, LayerGroup, Layer
+
+    return {model._meta.db_table: model.objects.count() for model in (
+        DptoQueries, DptoAmenazas, MpioQueries, MpioAmenazas, MpioPolitico, gbifInfo, Project, LayerGroup, Layer,
+    )}
@@ -2,15 +2,33 @@
 ASGI config for i2dbackend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Served by gunicorn with uvicorn workers when ``SERVER_INTERFACE=asgi`` (see
+``i2dbackend/gunicorn.conf.py``); the read-only endpoints, the GBIF export
+stream and the health checks then run as async views (``ASYNC_VIEWS``).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 """
 
 import os
+from pathlib import Path
+
+# Optionally load environment variables from a .env file if present
+# This is a no-op if python-dotenv is not installed
+try:
+    from dotenv import load_dotenv  # type: ignore
+    # .env is expected at the project root (one level up from this file's directory)
+    env_path = Path(__file__).resolve().parent.parent / '.env'
+    if env_path.exists():
+        load_dotenv(dotenv_path=env_path)
+except Exception:
+    pass
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'i2dbackend.settings')
+# Use DJANGO_SETTINGS_MODULE from environment if provided; fallback to prod
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', os.getenv('DJANGO_SETTINGS_MODULE', 'i2dbackend.settings.prod'))
+# Async views only pay off under an event loop, so they are on by default here
+os.environ.setdefault('ASYNC_VIEWS', 'true')
 
 application = get_asgi_application()
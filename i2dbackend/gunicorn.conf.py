@@ -0,0 +1,45 @@
+"""
+Gunicorn configuration for Visor I2D Backend
+
+SERVER_INTERFACE selects the deployment mode:
+
+- ``wsgi`` (default): gevent workers serving i2dbackend.wsgi
+- ``asgi``: uvicorn workers serving i2dbackend.asgi, with async views for
+  the read-only endpoints, the streamed GBIF export and the health checks
+
+Both modes share the worker count, recycling and timeouts below so load
+tests compare the interface and nothing else (benchmarks/bench_asgi_vs_wsgi.py).
+
+Every new worker, including the ones replacing workers recycled after
+``max_requests``, is warmed up before it accepts connections
+(applications.common.warmup, ``WARMUP_ENABLED``) for at most
+``WARMUP_TIMEOUT`` seconds, which must stay well below ``timeout``.
+"""
+import os
+
+SERVER_INTERFACE = os.getenv('SERVER_INTERFACE', 'wsgi').lower()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8001')
+workers = int(os.getenv('GUNICORN_WORKERS', 3))
+max_requests = 1000
+max_requests_jitter = 100
+timeout = 30
+keepalive = 2
+loglevel = 'info'
+
+if SERVER_INTERFACE == 'asgi':
+    wsgi_app = 'i2dbackend.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+elif SERVER_INTERFACE == 'wsgi':
+    wsgi_app = 'i2dbackend.wsgi:application'
+    worker_class = 'gevent'
+    worker_connections = 1000
+else:
+    raise RuntimeError(f"SERVER_INTERFACE must be 'wsgi' or 'asgi', not {SERVER_INTERFACE!r}")
+
+
+def post_worker_init(worker):
+    # Runs after the worker loaded the application (and gevent patched it), before it serves
+    from applications.common.warmup import warm_up
+
+    warm_up()
@@ -4,11 +4,18 @@ from django.core.exceptions import ImproperlyConfigured
 import json
 import os
 
+from applications.common.logging_config import get_logging_config
+from applications.common.security_headers import (
+    DEFAULT_SECURITY_HEADER_OVERRIDES, add_static_security_headers
+)
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+# Static files are served by WhiteNoise before RequestPipelineMiddleware runs
+WHITENOISE_ADD_HEADERS_FUNCTION = add_static_security_headers
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/3.1/howto/deployment/checklist/
@@ -60,6 +67,7 @@ DJANGO_APPS = (
 )
 
 LOCAL_APPS = (
+    'applications.common',
     'applications.dpto',
     'applications.mupio',
     'applications.mupiopolitico',
@@ -78,19 +86,23 @@ INSTALLED_APPS = DJANGO_APPS + LOCAL_APPS + THIRD_PARTY_APPS
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'applications.common.middleware.SecurityHeadersMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise, async-capable for the ASGI mode
+    'applications.common.middleware.StaticFilesMiddleware',
     'corsheaders.middleware.CorsMiddleware',
-    'applications.common.middleware.RequestLoggingMiddleware',
-    'applications.common.middleware.DataQualityMiddleware',
-    'applications.common.middleware.APIVersioningMiddleware',
+    # Security headers, request logging, data quality, API versioning and error handling
+    'applications.common.middleware.RequestPipelineMiddleware',
+    # Unsafe requests and the admin read from the primary database, not a replica
+    'applications.common.db_router.ReplicaRoutingMiddleware',
+    # SET LOCAL statement_timeout per route class (STATEMENT_TIMEOUTS)
+    'applications.common.statement_timeout.StatementTimeoutMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Opt-in SQL profiling (QUERY_PROFILING, or X-Query-Profile from staff users)
+    'applications.common.query_profiler.QueryProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'applications.common.middleware.ErrorHandlingMiddleware',
 ]
 
 ROOT_URLCONF = 'i2dbackend.urls'
@@ -152,15 +164,145 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'applications.common.renderers.FastJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'applications.common.parsers.SharedJSONParser',
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.MultiPartParser',
     ],
 }
 
+# JSON rendering backend for FastJSONRenderer: 'auto' (orjson if installed), 'orjson' or 'stdlib'
+JSON_RENDERER_BACKEND = os.getenv('JSON_RENDERER_BACKEND', 'auto')
+
+# Seconds the admin group picker index of a project stays cached (it is also rebuilt on change)
+GROUP_INDEX_CACHE_TIMEOUT = int(os.getenv('GROUP_INDEX_CACHE_TIMEOUT', 3600))
+
+# Security headers, compiled once per process into a header set per path prefix
+# (applications/common/security_headers.py). SECURITY_HEADERS adds or replaces headers on every
+# response, SECURITY_HEADER_OVERRIDES does so for a path prefix (longest match wins); None removes a header.
+SECURITY_HEADERS = {}
+SECURITY_HEADER_OVERRIDES = DEFAULT_SECURITY_HEADER_OVERRIDES
+
+# Access log: fraction of successful (< 400) responses logged, per path prefix.
+# Error responses are always logged.
+ACCESS_LOG_DEFAULT_SAMPLE_RATE = float(os.getenv('ACCESS_LOG_DEFAULT_SAMPLE_RATE', 1.0))
+ACCESS_LOG_SAMPLE_RATES = {
+    # Search-as-you-type endpoints get a request per keystroke
+    '/api/mpio/search/': 0.1,
+}
+
+# applications.* loggers write through background queue listeners (see logging_config)
+LOGGING = get_logging_config(
+    level=os.getenv('LOG_LEVEL', 'INFO'),
+    log_file=os.getenv('LOG_FILE'),
+    queue_size=int(os.getenv('LOG_QUEUE_SIZE', 10000)),
+    batch_size=int(os.getenv('LOG_BATCH_SIZE', 100)),
+)
+
+# /health/ checks run concurrently in a pool of HEALTH_CHECK_WORKERS threads and
+# their results are cached per check (TTLs in applications.common.health,
+# overridable here as {'check name': seconds}); a ticker refreshes expired
+# results every HEALTH_CHECK_TICK seconds (0 disables it)
+HEALTH_CHECK_WORKERS = int(os.getenv('HEALTH_CHECK_WORKERS', 4))
+HEALTH_CHECK_TICK = float(os.getenv('HEALTH_CHECK_TICK', 5))
+HEALTH_CHECK_TTLS = {}
+
+# External dependencies probed by /health/ as 'dependency:<name>' checks
+# (types, options and circuit breaker in applications.common.probes)
+GEOSERVER_URL = os.getenv('GEOSERVER_URL', '').rstrip('/')
+GBIF_MIRROR_URL = os.getenv('GBIF_MIRROR_URL', '')
+DEPENDENCY_PROBES = [
+    {'name': 'gbif', 'type': 'http', 'url': 'https://api.gbif.org/v1/species/search?q=Puma&limit=1',
+     'timeout': 5, 'interval': 300},
+]
+if GEOSERVER_URL:
+    # Serves every Layer.nombre_geoserver
+    DEPENDENCY_PROBES.append({'name': 'geoserver', 'type': 'http', 'url': f'{GEOSERVER_URL}/web/', 'interval': 30})
+if GBIF_MIRROR_URL:
+    DEPENDENCY_PROBES.append({'name': 'gbif_mirror', 'type': 'http', 'url': GBIF_MIRROR_URL, 'interval': 60})
+
+# Per-route metrics exposed at /metrics (see applications.common.metrics). With
+# several gunicorn workers, point METRICS_MULTIPROCESS_DIR at an empty directory
+# shared by the workers so every scrape sums all of them.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_MULTIPROCESS_DIR = os.getenv('METRICS_MULTIPROCESS_DIR') or None
+# /metrics answers direct (not proxied) requests from these networks, or any
+# request with "Authorization: Bearer <METRICS_TOKEN>" when a token is set
+METRICS_ALLOWED_NETWORKS = [
+    network.strip() for network in os.getenv(
+        'METRICS_ALLOWED_NETWORKS', '127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16'
+    ).split(',') if network.strip()
+]
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+# Report request phases (sql, csv, zip, serialize, render, db, total) in a
+# Server-Timing header and the request_phase_duration_seconds metric
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'true').lower() == 'true'
+
+# Profile the SQL queries of every request (Server-Timing header, N+1 warnings).
+# Staff users can profile a single request with an X-Query-Profile header.
+QUERY_PROFILING = os.getenv('QUERY_PROFILING', 'false').lower() == 'true'
+QUERY_PROFILING_N_PLUS_ONE_THRESHOLD = int(os.getenv('QUERY_PROFILING_N_PLUS_ONE_THRESHOLD', 5))
+
+# Reads of the replicated apps go to the DATABASE_REPLICAS aliases (set up by
+# settings.prod from DB_REPLICA_HOSTS) while their replication lag is at most
+# REPLICA_MAX_LAG seconds; writes, unsafe requests and REPLICA_PINNED_PATHS
+# (the admin and its AJAX endpoints) use 'default'
+DATABASE_ROUTERS = ['applications.common.db_router.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_APPS = ('dpto', 'mupio', 'mupiopolitico', 'gbif', 'projects')
+REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 30))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_LAG_CHECK_INTERVAL', 5))
+REPLICA_PINNED_PATHS = ('/admin/', '/api/admin/', '/ajax/admin/')
+
+# PostgreSQL statement timeout budgets in milliseconds per route class; paths
+# not in STATEMENT_TIMEOUT_ROUTES are 'interactive'. Exports stay under
+# gunicorn's 30 s worker timeout.
+STATEMENT_TIMEOUTS = {
+    'interactive': int(os.getenv('STATEMENT_TIMEOUT_INTERACTIVE_MS', 5000)),
+    'export': int(os.getenv('STATEMENT_TIMEOUT_EXPORT_MS', 25000)),
+    'admin': int(os.getenv('STATEMENT_TIMEOUT_ADMIN_MS', 15000)),
+    'health': int(os.getenv('STATEMENT_TIMEOUT_HEALTH_MS', 2000)),
+}
+STATEMENT_TIMEOUT_ROUTES = [
+    ('/api/gbif/descargarz', 'export'),
+    ('/admin/', 'admin'),
+    ('/health/', 'health'),
+]
+
+# Serve the read-only list endpoints, the GBIF export stream and the health
+# checks with async views. i2dbackend.asgi turns this on; under WSGI the
+# sync views are used.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'false').lower() == 'true'
+
+# Build rarely used views (the Swagger/ReDoc schema views and drf_yasg's
+# generators) on their first request instead of at worker boot
+# (applications.common.lazy)
+LAZY_LOADING = os.getenv('LAZY_LOADING', 'true').lower() == 'true'
+
+# Warm-up of new gunicorn workers before they accept requests (URL resolver,
+# serializers, database connections, caches, and the views of WARMUP_PATHS
+# called once); see applications.common.warmup
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'true').lower() == 'true'
+# Seconds a worker waits for its warm-up before serving anyway; keep it well
+# below gunicorn's timeout (30), as the worker does not heartbeat until it serves
+WARMUP_TIMEOUT = float(os.getenv('WARMUP_TIMEOUT', 10))
+WARMUP_PATHS = [
+    '/api/mpio/search/bogota',
+    '/api/dpto/charts/05',
+    '/api/mpio/charts/05001',
+    '/api/gbif/gbifinfo',
+]
+
+# Pre-rendered OpenAPI schema served by /api/schema/, /api/docs/ and /api/redoc/
+# (manage.py generate_openapi_schema). OPENAPI_SCHEMA_LIVE renders it in process
+# instead, so it follows code changes; only settings.local turns it on by default
+OPENAPI_SCHEMA_DIR = os.getenv('OPENAPI_SCHEMA_DIR', str(BASE_DIR / 'openapi'))
+OPENAPI_SCHEMA_LIVE = os.getenv('OPENAPI_SCHEMA_LIVE', 'false').lower() == 'true'
+
 # DRF YASG Settings
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -33,6 +33,9 @@ DATABASES = {
     }
 }
 
+# Render the OpenAPI schema from the running code instead of the build-time artifact
+OPENAPI_SCHEMA_LIVE = os.getenv('OPENAPI_SCHEMA_LIVE', 'true').lower() == 'true'
+
 # Static files configuration
 STATIC_ROOT = os.getenv('STATIC_ROOT', '/app/static')
 MEDIA_ROOT = os.getenv('MEDIA_ROOT', '/app/media')
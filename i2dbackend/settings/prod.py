@@ -9,11 +9,22 @@ allowed_hosts_env = os.getenv('ALLOWED_HOSTS', 'web,localhost')
 ALLOWED_HOSTS = [host.strip() for host in allowed_hosts_env.split(',')]
 
 # Database configuration using environment variables
+# The default engine pools connections per worker (applications/common/db_pool);
+# CONN_MAX_AGE stays 0 so every request returns its connection to the pool
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv('DB_ENGINE', 'django.contrib.gis.db.backends.postgis'),
+        'ENGINE': os.getenv('DB_ENGINE', 'applications.common.db_pool'),
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 20)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'MAX_LIFETIME': float(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+            'CHECK_AFTER': float(os.getenv('DB_POOL_CHECK_AFTER', 30)),
+        },
         'OPTIONS': {
-            'options': os.getenv('DB_OPTIONS', '-c search_path=django,gbif_consultas,capas_base,geovisor')
+            'options': os.getenv('DB_OPTIONS', '-c search_path=django,gbif_consultas,capas_base,geovisor'),
+            # Fail fast instead of waiting for the OS TCP connect timeout on an unreachable server
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
         },
         'NAME': os.getenv('DB_NAME') or get_secret('DB_NAME'),
         'USER': os.getenv('DB_USER') or get_secret('USER'),
@@ -23,6 +34,24 @@ DATABASES = {
     }
 }
 
+# Read replicas: DB_REPLICA_HOSTS=host[:port],... adds 'replica1', 'replica2', ...
+# with the credentials of 'default' (see applications.common.db_router)
+_replica_hosts = [host.strip() for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+for _index, _replica in enumerate(_replica_hosts, start=1):
+    _host, _, _port = _replica.partition(':')
+    DATABASES[f'replica{_index}'] = {
+        **DATABASES['default'],
+        'HOST': _host,
+        'PORT': _port or DATABASES['default']['PORT'],
+        # An unreachable replica fails its lag check quickly instead of hanging it
+        'OPTIONS': {
+            **DATABASES['default']['OPTIONS'],
+            'connect_timeout': int(os.getenv('DB_REPLICA_CONNECT_TIMEOUT', 2)),
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [f'replica{index}' for index in range(1, len(_replica_hosts) + 1)]
+
 # Static files configuration
 STATIC_ROOT = os.getenv('STATIC_ROOT', '/app/static')
 MEDIA_ROOT = os.getenv('MEDIA_ROOT', '/app/media')
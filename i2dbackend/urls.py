@@ -8,41 +8,36 @@ from django.urls import path, re_path, include
 from django.shortcuts import redirect
 from django.conf import settings
 from django.conf.urls.static import static
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from applications.common.health import health_check, health_check_simple, readiness_check, liveness_check
-
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Visor I2D API",
-      default_version='v1',
-      description="Colombian Biodiversity Data API - Instituto Alexander von Humboldt",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="contact@humboldt.org.co"),
-      license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
+from applications.common.health import (
+    ahealth_check, aliveness_check, health_check, health_check_simple, readiness_check, liveness_check,
 )
+from applications.common.lazy import lazy_view
+from applications.common.metrics import metrics_view
+from applications.common.profiling import cpu_profile
+from applications.common.schema import get_schema_view
 
 def redirect_to_admin(request):
     return redirect('/admin/')
 
 urlpatterns = [
     path('', redirect_to_admin, name='home'),
+    path('admin/cpu-profile/', cpu_profile, name='cpu-profile'),
     path('admin/', admin.site.urls),
 
     # Health Check Endpoints
-    path('health/', health_check, name='health-check'),
+    # Async views under ASGI (ASYNC_VIEWS)
+    path('health/', ahealth_check if settings.ASYNC_VIEWS else health_check, name='health-check'),
     path('health/simple/', health_check_simple, name='health-check-simple'),
     path('health/ready/', readiness_check, name='readiness-check'),
-    path('health/live/', liveness_check, name='liveness-check'),
-
-    # API Documentation
-    path('api/docs/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('api/redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-    path('api/schema/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
+    path('health/live/', aliveness_check if settings.ASYNC_VIEWS else liveness_check, name='liveness-check'),
+    path('metrics', metrics_view, name='metrics'),
+
+    # API Documentation, served from the schema rendered by manage.py generate_openapi_schema
+    path('api/docs/', lazy_view(lambda: get_schema_view().with_ui('swagger', cache_timeout=0)),
+         name='schema-swagger-ui'),
+    path('api/redoc/', lazy_view(lambda: get_schema_view().with_ui('redoc', cache_timeout=0)),
+         name='schema-redoc'),
+    path('api/schema/', lazy_view(lambda: get_schema_view().without_ui(cache_timeout=0)), name='schema-json'),
 
     # se incluyen las urls de las apps
     re_path('',include('applications.dpto.urls')),
@@ -0,0 +1,70 @@
+"""
+Local fake servers standing in for external dependencies (GeoServer, GBIF
+mirror) in tests
+
+    with FakeHTTPServer(status=200, delay=0.05) as server:
+        HTTPProbe('geoserver', server.url).check()
+
+Run ``python -m tests.fake_servers 8080`` for a stand-in during local
+development.
+"""
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeHTTPServer:
+    """HTTP server on 127.0.0.1 answering every request with `status` after `delay` seconds"""
+
+    def __init__(self, status=200, delay=0, body=b'OK', port=0):
+        self.status = status
+        self.delay = delay
+        self.body = body
+        self.requests = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.requests += 1
+                time.sleep(fake.delay)
+                self.send_response(fake.status)
+                self.send_header('Content-Length', str(len(fake.body)))
+                self.end_headers()
+                self.wfile.write(fake.body)
+
+            do_HEAD = do_GET
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}/'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    server = FakeHTTPServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8080)
+    print(f'Fake dependency listening on {server.url}')
+    server.server.serve_forever()
@@ -0,0 +1,180 @@
+"""
+Tests for the structured access log and the queued logging configuration
+"""
+import io
+import logging
+import queue
+import subprocess
+import sys
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+
+from applications.common.access_log import AccessLog
+from applications.common.log_handlers import (
+    BatchingQueueListener, QueueHandler, JSONFormatter, get_queue_stats
+)
+from applications.common.logging_config import get_logging_config
+
+try:
+    import gevent
+except ImportError:  # pragma: no cover - gevent is only installed in production images
+    gevent = None
+
+# Logs through a QueueHandler whose target blocks on every write, as on a
+# full stdout pipe, while a greenlet ticks; prints the longest tick gap
+GEVENT_SCRIPT = """
+from gevent import monkey; monkey.patch_all()
+import logging, time, gevent
+from applications.common.log_handlers import QueueHandler
+
+class BlockingHandler(logging.Handler):
+    def emit(self, record):
+        monkey.get_original('time', 'sleep')(0.05)
+
+handler = QueueHandler(target='logging.NullHandler')
+handler.target = BlockingHandler()
+ticks = []
+ticker = gevent.spawn(lambda: [ticks.append(time.monotonic()) or gevent.sleep(0.01) for _ in range(30)])
+for i in range(10):
+    handler.handle(logging.LogRecord('x', logging.INFO, 'script', 1, 'line', None, None))
+ticker.join()
+handler.flush()
+print(max(b - a for a, b in zip(ticks, ticks[1:])), handler.queue.qsize())
+"""
+
+
+class ListHandler(logging.Handler):
+    """Collect formatted records"""
+
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+class AccessLogTestCase(TestCase):
+    """Test access log sizes and sampling"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.access_log = AccessLog()
+
+    def finish(self, request, response):
+        self.access_log.start(request)
+        with patch('applications.common.access_log.logger') as mock_logger:
+            mock_logger.isEnabledFor.return_value = True
+            response = self.access_log.finish(request, response)
+            if response.streaming:
+                self.assertFalse(mock_logger.log.called)
+                b''.join(response.streaming_content)
+        return mock_logger
+
+    def test_size_from_content_length(self):
+        """Sized responses are logged without reading their body"""
+        response = HttpResponse(b'abc')
+        response['Content-Length'] = '3'
+        with patch.object(HttpResponse, 'content', property(lambda r: self.fail('body was read'))):
+            mock_logger = self.finish(self.factory.get('/api/test/'), response)
+        self.assertEqual(mock_logger.log.call_args.kwargs['extra']['fields']['response_size'], 3)
+
+    def test_streaming_size_counted_after_stream(self):
+        """Streaming responses are logged once sent, with the counted size"""
+        response = StreamingHttpResponse(iter([b'ab', b'cde']))
+        mock_logger = self.finish(self.factory.get('/api/gbif/descargarz'), response)
+        self.assertEqual(mock_logger.log.call_count, 1)
+        self.assertEqual(mock_logger.log.call_args.kwargs['extra']['fields']['response_size'], 5)
+
+    @override_settings(ACCESS_LOG_SAMPLE_RATES={'/api/mpio/search/': 0.0})
+    def test_sampling_skips_successes_only(self):
+        """Sampled-out routes still log errors"""
+        self.access_log = AccessLog()
+        request = self.factory.get('/api/mpio/search/bog')
+        mock_logger = self.finish(request, HttpResponse(b'[]'))
+        mock_logger.log.assert_not_called()
+
+        mock_logger = self.finish(request, HttpResponse(b'error', status=500))
+        self.assertEqual(mock_logger.log.call_args.args[0], logging.WARNING)
+
+
+class QueueHandlerTestCase(TestCase):
+    """Test the non-blocking queue handler"""
+
+    def make_handler(self, maxsize=100):
+        handler = QueueHandler(target='tests.test_access_log.ListHandler', maxsize=maxsize)
+        handler.setFormatter(JSONFormatter())
+        self.addCleanup(handler.close)
+        return handler
+
+    def test_records_written_by_listener(self):
+        """Records reach the target handler as JSON lines"""
+        handler = self.make_handler()
+        record = logging.LogRecord('applications.access', logging.INFO, __file__, 1, 'GET %s', ('/',), None)
+        record.fields = {'status_code': 200}
+        handler.handle(record)
+        handler.flush()
+        self.assertEqual(len(handler.target.lines), 1)
+        self.assertIn('"status_code": 200', handler.target.lines[0])
+        self.assertIn('"message": "GET /"', handler.target.lines[0])
+
+    def test_full_queue_drops_records(self):
+        """A full queue drops records instead of blocking"""
+        handler = self.make_handler(maxsize=1)
+        # No listener is started, so nothing drains the queue
+        with patch.object(handler, '_ensure_listener'):
+            for _ in range(3):
+                handler.handle(logging.LogRecord('x', logging.INFO, __file__, 1, 'msg', None, None))
+        self.assertEqual(handler.dropped, 2)
+
+    def test_queue_stats(self):
+        """Queue depth and drops are reported per handler"""
+        handler = self.make_handler(maxsize=1)
+        handler.name = 'test-queue'
+        with patch.object(handler, '_ensure_listener'):
+            for _ in range(2):
+                handler.handle(logging.LogRecord('x', logging.INFO, __file__, 1, 'msg', None, None))
+        stats = [q for q in get_queue_stats() if q['handler'] == 'test-queue']
+        self.assertEqual(stats, [{'handler': 'test-queue', 'depth': 1, 'maxsize': 1, 'dropped': 1}])
+
+    @skipUnless(gevent, 'gevent is not installed')
+    def test_listener_does_not_block_gevent(self):
+        """Under gevent, slow writes happen on an OS thread while greenlets keep running"""
+        result = subprocess.run([sys.executable, '-c', GEVENT_SCRIPT], cwd=Path(__file__).resolve().parent.parent,
+                                capture_output=True, text=True, timeout=30)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        max_gap, depth = result.stdout.split()
+        self.assertLess(float(max_gap), 0.04)
+        self.assertEqual(depth, '0')
+
+    def test_batches_written_at_once(self):
+        """Stream handlers get a whole batch in a single write"""
+        stream = io.StringIO()
+        target = logging.StreamHandler(stream)
+        q = queue.Queue()
+        for i in range(5):
+            q.put(logging.LogRecord('x', logging.INFO, __file__, 1, 'line %s', (i,), None))
+        listener = BatchingQueueListener(q, target, batch_size=3)
+        with patch.object(stream, 'write', wraps=stream.write) as write:
+            listener.start()
+            listener.stop()
+        self.assertEqual(write.call_count, 2)
+        self.assertEqual(stream.getvalue().splitlines(), [f'line {i}' for i in range(5)])
+
+
+class LoggingConfigTestCase(TestCase):
+    """Test the LOGGING dict built for the settings"""
+
+    def test_application_loggers_are_queued(self):
+        """applications.* loggers only use queue handlers and do not propagate"""
+        config = get_logging_config(log_file='/tmp/visor.log')
+        for name in ('applications', 'applications.access'):
+            logger_config = config['loggers'][name]
+            self.assertFalse(logger_config['propagate'])
+            for handler in logger_config['handlers']:
+                self.assertEqual(config['handlers'][handler]['class'], 'applications.common.log_handlers.QueueHandler')
+        self.assertIn('file', config['loggers']['applications']['handlers'])
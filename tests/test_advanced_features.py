@@ -13,7 +13,8 @@ from applications.common.validators import (
 )
 from applications.common.middleware import (
     DataQualityMiddleware, ErrorHandlingMiddleware, 
-    APIVersioningMiddleware, RequestLoggingMiddleware
+    APIVersioningMiddleware, RequestLoggingMiddleware,
+    RequestPipelineMiddleware
 )
 from applications.common.spatial import (
     GeographicDataValidator, SpatialQueryOptimizer, 
@@ -201,6 +202,146 @@ class MiddlewareTestCase(TestCase):
         self.assertIn('Test validation error', content['message'])
 
 
+class DataQualityInspectionTestCase(TestCase):
+    """Test single-pass request inspection in DataQualityMiddleware"""
+    
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = DataQualityMiddleware(lambda r: None)
+    
+    def test_json_parsed_once_and_shared(self):
+        """The parsed body is reused by SharedJSONParser"""
+        from io import BytesIO
+        from rest_framework.request import Request
+        from applications.common.parsers import SharedJSONParser
+        
+        request = self.factory.post('/api/requestcreate/', data='{"nombre": "Ana"}', content_type='application/json')
+        self.assertIsNone(self.middleware.process_request(request))
+        self.assertEqual(request.parsed_json, {'nombre': 'Ana'})
+        
+        drf_request = Request(request, parsers=[SharedJSONParser()])
+        with patch('rest_framework.parsers.JSONParser.parse') as parse:
+            self.assertEqual(drf_request.data, {'nombre': 'Ana'})
+            parse.assert_not_called()
+        self.assertEqual(SharedJSONParser().parse(BytesIO(b'[1]')), [1])
+    
+    def test_invalid_json_rejected(self):
+        """Invalid and non-standard JSON bodies return 400"""
+        for body in ('{"a": ', '{"a": NaN}'):
+            request = self.factory.post('/api/requestcreate/', data=body, content_type='application/json')
+            response = self.middleware.process_request(request)
+            self.assertEqual(response.status_code, 400)
+    
+    def test_encoded_query_patterns_detected(self):
+        """Percent-encoded patterns in the query string are detected"""
+        request = self.factory.get('/api/test/?q=%3CScRiPt%3Ealert(1)')
+        with patch('applications.common.middleware.logger') as mock_logger:
+            self.middleware.process_request(request)
+        self.assertIn("'<ScRiPt'", mock_logger.warning.call_args.args[0])
+    
+    def test_large_bodies_not_read_for_scanning(self):
+        """Non-JSON bodies beyond the scanned prefix stay unread"""
+        from applications.common.middleware import BODY_SCAN_LIMIT
+        request = self.factory.post('/api/upload/', data=b'x' * (BODY_SCAN_LIMIT + 1),
+                                    content_type='application/octet-stream')
+        self.assertIsNone(self.middleware.process_request(request))
+        self.assertFalse(hasattr(request, '_body'))
+        
+        request = self.factory.post('/api/upload/', data=b'a=1&b=DROP TABLE x',
+                                    content_type='application/octet-stream')
+        with patch('applications.common.middleware.logger') as mock_logger:
+            self.middleware.process_request(request)
+        mock_logger.warning.assert_called()
+
+
+class RequestPipelineMiddlewareTestCase(TestCase):
+    """Test the fused, path-routed request pipeline middleware"""
+    
+    def setUp(self):
+        from django.http import HttpResponse
+        self.factory = RequestFactory()
+        self.middleware = RequestPipelineMiddleware(lambda r: HttpResponse('ok'))
+    
+    def test_api_requests_run_all_stages(self):
+        """API responses get security, data quality and version headers"""
+        response = self.middleware(self.factory.get('/api/projects/'))
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertEqual(response['X-Data-Quality-Check'], 'enabled')
+        self.assertEqual(response['X-API-Version'], 'v1')
+    
+    def test_unsupported_version_short_circuits(self):
+        """Rejected API requests still carry the security headers"""
+        response = self.middleware(self.factory.get('/api/projects/', HTTP_X_API_VERSION='v99'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Content-Security-Policy', response)
+    
+    def test_health_and_static_only_get_headers(self):
+        """Health probes and static files skip logging, validation and versioning, not the headers"""
+        for path in ('/health/', '/static/app.js', '/admin/'):
+            request = self.factory.get(path + '?q=DROP TABLE users')
+            with patch('applications.common.middleware.logger') as mock_logger:
+                response = self.middleware(request)
+            mock_logger.info.assert_not_called()
+            mock_logger.warning.assert_not_called()
+            self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+            self.assertEqual(response['X-Data-Quality-Check'], 'enabled')
+            self.assertFalse(hasattr(request, 'api_version'))
+    
+    def test_other_paths_are_validated(self):
+        """Paths outside the table get logging and validation but no versioning"""
+        request = self.factory.get('/dpto/?q=DROP TABLE users')
+        with patch('applications.common.middleware.logger') as mock_logger:
+            response = self.middleware(request)
+        mock_logger.warning.assert_called()
+        self.assertEqual(response['X-Data-Quality-Check'], 'enabled')
+        self.assertNotIn('X-API-Version', response)
+    
+    def test_exceptions_use_error_handling(self):
+        """Exceptions are turned into structured error responses"""
+        response = self.middleware.process_exception(
+            self.factory.get('/api/test/'), ValidationError('Test validation error')
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class SecurityHeaderSetsTestCase(TestCase):
+    """Test precompiled per-path security header sets"""
+    
+    def test_path_overrides(self):
+        """The longest matching prefix picks the header set"""
+        from django.http import HttpResponse
+        from applications.common.security_headers import SecurityHeaderSets, DEFAULT_SECURITY_HEADER_OVERRIDES
+        
+        header_sets = SecurityHeaderSets(overrides=DEFAULT_SECURITY_HEADER_OVERRIDES)
+        api = header_sets.apply('/api/layers/', HttpResponse())
+        docs = header_sets.apply('/api/docs/', HttpResponse())
+        admin = header_sets.apply('/admin/projects/', HttpResponse())
+        other = header_sets.apply('/', HttpResponse())
+        
+        self.assertEqual(api['Content-Security-Policy'], "default-src 'none'; frame-ancestors 'none'")
+        self.assertIn("worker-src 'self' blob:", docs['Content-Security-Policy'])
+        self.assertEqual(admin['Referrer-Policy'], 'same-origin')
+        self.assertEqual(other['Referrer-Policy'], 'strict-origin-when-cross-origin')
+        self.assertEqual(other['X-Frame-Options'], 'DENY')
+    
+    def test_settings_add_and_remove_headers(self):
+        """Settings can add headers and remove them per prefix"""
+        from django.http import HttpResponse
+        from django.test import override_settings
+        from applications.common.security_headers import SecurityHeaderSets
+        
+        with override_settings(SECURITY_HEADERS={'Cross-Origin-Opener-Policy': 'same-origin'},
+                               SECURITY_HEADER_OVERRIDES={'/health/': {'X-Frame-Options': None}}):
+            header_sets = SecurityHeaderSets.from_settings()
+        response = HttpResponse()
+        response['Server'] = 'gunicorn'
+        response = header_sets.apply('/health/', response)
+        self.assertEqual(response['Cross-Origin-Opener-Policy'], 'same-origin')
+        self.assertNotIn('X-Frame-Options', response)
+        self.assertNotIn('Server', response)
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+
+
 class SpatialOperationsTestCase(TestCase):
     """Test spatial operations and PostGIS integration"""
     
@@ -0,0 +1,94 @@
+"""
+Tests for the ASGI deployment mode (async middleware chain and async views)
+"""
+import io
+import json
+import zipfile
+from unittest import mock
+
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import path
+
+from applications.gbif.views import adescargarzip, aiterate, stream_zip
+from applications.projects.models import Project, LayerGroup, Layer
+from tests.test_values_views import LayerValuesView
+
+# The async export, routed as with ASYNC_VIEWS on
+urlpatterns = [path('api/gbif/descargarz', adescargarzip)]
+
+
+class AsyncValuesListAPIViewTest(TestCase):
+    """Test the async list view returns what the sync one does"""
+
+    async def test_async_view_matches_sync_view(self):
+        project = await Project.objects.acreate(
+            nombre_corto='asgi', nombre='ASGI', coordenada_central_x=-74.0, coordenada_central_y=4.0
+        )
+        group = await LayerGroup.objects.acreate(proyecto=project, nombre='Grupo')
+        for i in range(3):
+            await Layer.objects.acreate(grupo=group, nombre_geoserver=f'capa_{i}', nombre_display=f'Capa {i}')
+
+        request = AsyncRequestFactory().get('/api/layers/')
+        with override_settings(ASYNC_VIEWS=True):
+            async_view = LayerValuesView.as_view()
+        self.assertIs(async_view.cls, LayerValuesView)
+        response = await async_view(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = json.loads(response.content)
+        self.assertEqual([layer['nombre_geoserver'] for layer in data], ['capa_0', 'capa_1', 'capa_2'])
+
+
+class AsyncExportTest(TestCase):
+    """Test the streamed GBIF export"""
+
+    async def test_streamed_zip_is_valid(self):
+        files = [
+            ('registros.csv', 'SELECT %s AS codigo, 120 AS registers', ['05']),
+            ('lista_especies.csv', "SELECT 'Puma concolor' AS especies", []),
+        ]
+        chunks = [chunk async for chunk in aiterate(stream_zip(files))]
+
+        with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+            self.assertEqual(archive.namelist(), ['registros.csv', 'lista_especies.csv'])
+            self.assertEqual(archive.read('registros.csv').decode(), 'codigo,registers\r\n05,120\r\n')
+            self.assertEqual(archive.read('lista_especies.csv').decode(), 'especies\r\nPuma concolor\r\n')
+
+    @override_settings(ROOT_URLCONF=__name__)
+    async def test_streamed_through_middleware_with_access_log(self):
+        """The access log keeps the stream async and logs its size once sent"""
+        params = (
+            'SELECT %s AS codigo, 120 AS registers', "SELECT %s AS codigo, 'Puma concolor' AS especies", '05', 'antioquia'
+        )
+        with mock.patch('applications.gbif.views.parse_export_params', return_value=params), \
+                self.assertLogs('applications.access', 'INFO') as logs:
+            response = await self.async_client.get('/api/gbif/descargarz', {'codigo_dpto': '05'})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_async)
+            content = b''.join([chunk async for chunk in response.streaming_content])
+
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertEqual(archive.namelist(), ['registros.csv', 'lista_especies.csv'])
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].fields['response_size'], len(content))
+
+    async def test_invalid_parameters_rejected(self):
+        response = await adescargarzip(AsyncRequestFactory().get('/api/gbif/descargarz', {'codigo_dpto': 'x'}))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', json.loads(response.content))
+
+
+@override_settings(METRICS_ENABLED=True, SERVER_TIMING=True)
+class AsyncMiddlewareChainTest(SimpleTestCase):
+    """Test the middleware stack runs as an async chain under ASGI"""
+
+    async def test_async_request_through_middleware(self):
+        response = await self.async_client.get('/api/gbif/descargarz')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertIn('X-Content-Type-Options', response)
+
+        response = await self.async_client.get('/health/live/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['status'], 'alive')
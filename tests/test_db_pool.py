@@ -0,0 +1,140 @@
+"""
+Tests for the pooled database backend
+"""
+import socket
+import threading
+import time
+from unittest import mock, skipUnless
+
+import psycopg2
+from django.test import SimpleTestCase
+from psycopg2 import extensions
+
+from applications.common.db_pool import base as db_pool_base
+from applications.common.db_pool.pool import ConnectionPool, PoolTimeout, get_pool, POOL_TIMEOUTS
+
+try:
+    import gevent
+except ImportError:  # pragma: no cover - gevent is only installed in production images
+    gevent = None
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    """Test reuse, bounds, queueing and recycling"""
+
+    def test_reuses_released_connection(self):
+        pool = ConnectionPool('test', max_size=2)
+        first = pool.acquire(FakeConnection)
+        pool.release(first)
+        self.assertIs(pool.acquire(FakeConnection), first)
+        self.assertEqual((pool.size, pool.in_use), (1, 1))
+
+    def test_timeout_when_full(self):
+        pool = ConnectionPool('test-timeout', max_size=1, timeout=0.05)
+        pool.acquire(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+        self.assertEqual(POOL_TIMEOUTS.values[('test-timeout',)], 1)
+
+    def test_waiter_gets_released_connection(self):
+        pool = ConnectionPool('test', max_size=1, timeout=5)
+        held = pool.acquire(FakeConnection)
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(pool.acquire(FakeConnection)))
+        waiter.start()
+        pool.release(held)
+        waiter.join(5)
+        self.assertEqual(result, [held])
+
+    def test_unusable_connection_discarded(self):
+        pool = ConnectionPool('test', max_size=1, reset=lambda connection: not connection.closed)
+        connection = pool.acquire(FakeConnection)
+        connection.closed = 2
+        pool.release(connection)
+        self.assertEqual(pool.size, 0)
+        self.assertIsNot(pool.acquire(FakeConnection), connection)
+
+    def test_expired_and_failed_check_replaced(self):
+        pool = ConnectionPool('test', max_size=1, max_lifetime=0)
+        old = pool.acquire(FakeConnection)
+        pool.release(old)
+        self.assertIsNot(pool.acquire(FakeConnection), old)
+        self.assertTrue(old.closed)
+
+        pool = ConnectionPool('test', max_size=1, check_after=0, check=lambda connection: False)
+        old = pool.acquire(FakeConnection)
+        pool.release(old)
+        self.assertIsNot(pool.acquire(FakeConnection), old)
+        self.assertEqual(pool.size, 1)
+
+    def test_failed_connect_frees_slot(self):
+        pool = ConnectionPool('test', max_size=1)
+
+        def refuse():
+            raise OSError('connection refused')
+
+        with self.assertRaises(OSError):
+            pool.acquire(refuse)
+        self.assertEqual(pool.size, 0)
+        pool.acquire(FakeConnection)
+
+
+class PooledDatabaseWrapperTestCase(SimpleTestCase):
+    """Test that the backend checks connections out of the pool and returns them"""
+
+    def make_wrapper(self):
+        settings_dict = {
+            'ENGINE': 'applications.common.db_pool', 'NAME': 'pooled', 'USER': '', 'PASSWORD': '',
+            'HOST': 'db', 'PORT': '', 'OPTIONS': {}, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False,
+            'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False, 'TIME_ZONE': None, 'POOL': {'MAX_SIZE': 1},
+        }
+        return db_pool_base.DatabaseWrapper(settings_dict, alias='pooled')
+
+    def test_connection_returned_and_reused(self):
+        opened = []
+
+        def connect(wrapper, conn_params):
+            opened.append(FakeConnection())
+            return opened[-1]
+
+        with mock.patch.object(db_pool_base.PostGISDatabaseWrapper, 'get_new_connection', connect), \
+                mock.patch.object(db_pool_base, 'reset_connection', lambda connection: True):
+            params = {'database': 'pooled', 'host': 'db'}
+            for _ in range(3):
+                wrapper = self.make_wrapper()
+                wrapper.connection = wrapper.get_new_connection(params)
+                wrapper._close()
+
+        self.assertEqual(len(opened), 1)
+        self.assertFalse(opened[0].closed)
+        pool = get_pool(('pooled', (('database', 'pooled'), ('host', 'db'))), 'pooled')
+        self.assertEqual((pool.size, pool.in_use), (1, 0))
+
+
+@skipUnless(gevent, 'gevent is not installed')
+class GreenConnectTestCase(SimpleTestCase):
+    """Test the gevent wait callback applies connect_timeout"""
+
+    def test_connect_timeout_against_unresponsive_server(self):
+        # Accepts connections (in the backlog) but never answers the startup message
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        previous = extensions.get_wait_callback()
+        extensions.set_wait_callback(db_pool_base._gevent_wait_callback)
+        start = time.monotonic()
+        try:
+            with self.assertRaisesMessage(psycopg2.OperationalError, 'timeout expired'):
+                psycopg2.connect(host='127.0.0.1', port=server.getsockname()[1], dbname='x', connect_timeout=2)
+        finally:
+            extensions.set_wait_callback(previous)
+            server.close()
+        self.assertLess(time.monotonic() - start, 5)
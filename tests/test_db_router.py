@@ -0,0 +1,136 @@
+"""
+Tests for read-replica routing
+"""
+import os
+import socket
+import time
+from unittest import mock, skipUnless
+
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from applications.common import db_router
+from applications.common.db_pool import base as db_pool_base
+from applications.common.db_router import ReplicaRouter, ReplicaRoutingMiddleware, use_primary
+from applications.gbif.models import gbifInfo
+from applications.projects.models import Project
+from applications.user.models import Solicitud
+
+try:
+    import gevent
+except ImportError:  # pragma: no cover - gevent is only installed in production images
+    gevent = None
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], REPLICA_MAX_LAG=30, REPLICA_LAG_CHECK_INTERVAL=60)
+class ReplicaRouterTestCase(SimpleTestCase):
+    """Test read routing, pinning and lag-aware fallback"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.lags = {'replica1': 0.5, 'replica2': 0.5}
+        self.measured = []
+        self.router.measure_lag = self.measure_lag
+        # No ticker thread: the tests measure explicitly
+        self.router._ticker_pid = os.getpid()
+        self.router.measure_all()
+        self.measured.clear()
+
+    def measure_lag(self, alias):
+        self.measured.append(alias)
+        lag = self.lags[alias]
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+
+    def test_replicated_reads_go_to_replicas(self):
+        self.assertIn(self.router.db_for_read(gbifInfo), {'replica1', 'replica2'})
+        self.assertIn(self.router.db_for_read(Project), {'replica1', 'replica2'})
+        self.assertIsNone(self.router.db_for_read(Solicitud))
+        self.assertEqual(self.router.db_for_write(Project), 'default')
+
+    def test_reads_never_measure_lag(self):
+        for _ in range(5):
+            self.router.db_for_read(gbifInfo)
+        self.assertEqual(self.measured, [])
+
+    def test_lagging_or_failing_replica_skipped(self):
+        self.lags = {'replica1': 120.0, 'replica2': 0.0}
+        self.router.measure_all()
+        self.assertEqual({self.router.db_for_read(gbifInfo) for _ in range(10)}, {'replica2'})
+
+        self.lags = {'replica1': 120.0, 'replica2': OSError('connection refused')}
+        with self.assertLogs('applications.common.db_router', 'WARNING'):
+            self.router.measure_all()
+        self.assertIsNone(self.router.db_for_read(gbifInfo))
+
+    def test_replica_without_wal_receiver_skipped(self):
+        # A disconnected replica has replayed all it received, but is not fresh
+        self.lags = {'replica1': None, 'replica2': 0.0}
+        with self.assertLogs('applications.common.db_router', 'WARNING') as logs:
+            self.router.measure_all()
+        self.assertIn('replica1 is not receiving WAL', logs.output[0])
+        self.assertEqual({self.router.db_for_read(gbifInfo) for _ in range(10)}, {'replica2'})
+
+    @skipUnless(gevent, 'gevent is not installed')
+    def test_unresponsive_replica_times_out_under_gevent(self):
+        from psycopg2 import extensions
+
+        # Accepts connections (in the backlog) but never answers the startup message
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        replica = db_pool_base.DatabaseWrapper({
+            'ENGINE': 'applications.common.db_pool', 'NAME': 'replica', 'USER': '', 'PASSWORD': '',
+            'HOST': '127.0.0.1', 'PORT': server.getsockname()[1], 'OPTIONS': {'connect_timeout': 2},
+            'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False,
+            'TIME_ZONE': None,
+        }, alias='replica1')
+        router = ReplicaRouter()
+        previous = extensions.get_wait_callback()
+        extensions.set_wait_callback(db_pool_base._gevent_wait_callback)
+        start = time.monotonic()
+        try:
+            with override_settings(DATABASE_REPLICAS=['replica1']), \
+                    mock.patch.object(db_router, 'connections', {'replica1': replica}), \
+                    self.assertLogs('applications.common.db_router', 'WARNING') as logs:
+                router.measure_all()
+        finally:
+            extensions.set_wait_callback(previous)
+            server.close()
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertIn('timeout expired', logs.output[0])
+        self.assertFalse(router.is_available('replica1'))
+
+    def test_unmeasured_or_outdated_replica_skipped(self):
+        self.router.lags.pop('replica1')
+        self.assertEqual({self.router.db_for_read(gbifInfo) for _ in range(10)}, {'replica2'})
+        self.router.lags['replica2'] = (time.monotonic() - 181, 0.0)
+        self.assertIsNone(self.router.db_for_read(gbifInfo))
+
+    def test_pinned_reads_use_primary(self):
+        with use_primary():
+            self.assertIsNone(self.router.db_for_read(gbifInfo))
+        self.assertEqual(self.measured, [])
+
+    def test_middleware_pins_unsafe_and_admin_requests(self):
+        routed = []
+
+        def view(request):
+            routed.append(self.router.db_for_read(Project))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        factory = RequestFactory()
+        middleware(factory.get('/api/projects/'))
+        middleware(factory.post('/api/projects/'))
+        middleware(factory.get('/admin/projects/project/'))
+        middleware(factory.get('/api/admin/layergroup/filter-by-project/'))
+        middleware(factory.get('/ajax/admin/projects/admin/layergroup/filter-by-project/'))
+        self.assertIn(routed[0], {'replica1', 'replica2'})
+        self.assertEqual(routed[1:], [None, None, None, None])
+
+    def test_no_replicas_configured(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertIsNone(self.router.db_for_read(gbifInfo))
+        self.assertFalse(self.router.allow_migrate('replica1', 'gbif'))
@@ -0,0 +1,86 @@
+"""
+Tests for the concurrent, cached health checks
+"""
+import threading
+import time
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from applications.common.health import CHECK_POLICIES, HealthCheckService
+
+
+@override_settings(HEALTH_CHECK_TICK=0)
+class HealthCheckServiceTestCase(SimpleTestCase):
+    """Test deadlines, TTL caching and background refresh"""
+
+    def setUp(self):
+        self.service = HealthCheckService()
+        self.calls = 0
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def counting(self):
+        self.calls += 1
+        return {'status': 'healthy', 'message': f'call {self.calls}', 'timestamp': time.time()}
+
+    def blocked(self):
+        self.release.wait(5)
+        return {'status': 'healthy', 'message': 'done', 'timestamp': time.time()}
+
+    def wait_idle(self):
+        for future in list(self.service._pending.values()):
+            future.result(5)
+
+    def test_slow_check_bounded_by_deadline(self):
+        self.service.checks = {'fast': self.counting, 'slow': self.blocked}
+        with patch.dict(CHECK_POLICIES, {'slow': (30, 0.1, 'warning')}):
+            start = time.monotonic()
+            results = self.service.run_all_checks()
+            self.assertLess(time.monotonic() - start, 1)
+            self.assertEqual(results['checks']['slow']['status'], 'warning')
+            self.assertEqual(results['checks']['fast']['status'], 'healthy')
+            self.assertEqual(results['status'], 'healthy')
+
+            # The check keeps running and its result is served once it completes
+            self.release.set()
+            self.wait_idle()
+            self.assertEqual(self.service.run_all_checks()['checks']['slow']['message'], 'done')
+
+    async def test_async_checks_bounded_by_deadline(self):
+        self.service.checks = {'fast': self.counting, 'slow': self.blocked}
+        with patch.dict(CHECK_POLICIES, {'slow': (30, 0.1, 'warning')}):
+            start = time.monotonic()
+            results = await self.service.arun_all_checks()
+            self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(results['checks']['slow']['status'], 'warning')
+        self.assertEqual(results['checks']['fast']['status'], 'healthy')
+        # The timed out wait did not cancel the shared check
+        self.assertFalse(self.service._pending['slow'].cancelled())
+
+    def test_results_cached_for_ttl(self):
+        self.service.checks = {'counted': self.counting}
+        with patch.dict(CHECK_POLICIES, {'counted': (30, 1, 'warning')}):
+            self.service.run_all_checks()
+            results = self.service.run_all_checks()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results['checks']['counted']['message'], 'call 1')
+
+    def test_expired_result_served_while_refreshing(self):
+        self.service.checks = {'counted': self.counting}
+        with override_settings(HEALTH_CHECK_TTLS={'counted': 0}):
+            self.service.run_all_checks()
+            self.wait_idle()
+            results = self.service.run_all_checks()
+            self.assertEqual(results['checks']['counted']['message'], 'call 1')
+            self.wait_idle()
+        self.assertEqual(self.calls, 2)
+
+    def test_failing_check_reported(self):
+        def failing():
+            raise RuntimeError('boom')
+
+        self.service.checks = {'failing': failing}
+        results = self.service.run_all_checks()
+        self.assertEqual(results['checks']['failing']['status'], 'error')
+        self.assertEqual(results['status'], 'unhealthy')
@@ -0,0 +1,36 @@
+"""
+Tests for deferred view construction
+"""
+import sys
+from unittest.mock import Mock
+
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from applications.common.lazy import LazyView, lazy_view
+
+
+class LazyViewTestCase(SimpleTestCase):
+    """Test lazy views are built once, on first use"""
+
+    def test_view_built_on_first_request(self):
+        factory = Mock(return_value=lambda request: HttpResponse('built'))
+        view = lazy_view(factory)
+        self.assertIsInstance(view, LazyView)
+        factory.assert_not_called()
+
+        request = RequestFactory().get('/api/docs/')
+        self.assertEqual(view(request).content, b'built')
+        self.assertEqual(view(request).content, b'built')
+        factory.assert_called_once()
+
+    def test_eager_when_disabled(self):
+        built = lambda request: HttpResponse()
+        with override_settings(LAZY_LOADING=False):
+            self.assertIs(lazy_view(lambda: built), built)
+
+    def test_schema_served_lazily(self):
+        response = self.client.get('/api/schema/', {'format': 'openapi'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('drf_yasg.views', sys.modules)
+        self.assertIn('/api/gbif/descargarz', response.json()['paths'])
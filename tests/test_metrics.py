@@ -0,0 +1,118 @@
+"""
+Tests for the metrics registry and the /metrics endpoint
+"""
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, SimpleTestCase, override_settings
+
+from applications.common.metrics import (
+    Counter, Histogram, Registry, merge_snapshots, render_prometheus, registry
+)
+
+
+class RegistryTestCase(SimpleTestCase):
+    """Test counters, histograms and the text format"""
+
+    def setUp(self):
+        self.registry = Registry()
+        self.requests = Counter('requests_total', 'Requests', ['route'], registry=self.registry)
+        self.latency = Histogram('latency_seconds', 'Latency', ['route'], buckets=(0.1, 1), registry=self.registry)
+
+    def test_render(self):
+        self.requests.inc(route='api/a')
+        self.requests.inc(2, route='api/a')
+        for value in (0.05, 0.5, 5):
+            self.latency.observe(value, route='api/"a"')
+        text = render_prometheus(self.registry.snapshot())
+
+        self.assertIn('# TYPE requests_total counter\nrequests_total{route="api/a"} 3\n', text)
+        self.assertIn('latency_seconds_bucket{route="api/\\"a\\"",le="0.1"} 1\n', text)
+        self.assertIn('latency_seconds_bucket{route="api/\\"a\\"",le="1"} 2\n', text)
+        self.assertIn('latency_seconds_bucket{route="api/\\"a\\"",le="+Inf"} 3\n', text)
+        self.assertIn('latency_seconds_count{route="api/\\"a\\""} 3\n', text)
+        self.assertIn('latency_seconds_sum{route="api/\\"a\\""} 5.55\n', text)
+
+    def test_merge_sums_workers(self):
+        self.requests.inc(route='api/a')
+        self.latency.observe(0.5, route='api/a')
+        total = merge_snapshots({}, self.registry.snapshot())
+        merge_snapshots(total, self.registry.snapshot())
+        self.assertEqual(total['requests_total']['samples'], [[['api/a'], 2]])
+        self.assertEqual(total['latency_seconds']['samples'], [[['api/a'], [0, 2, 0, 1.0]]])
+
+
+class MultiprocessTestCase(SimpleTestCase):
+    """Test aggregation of worker snapshots through the shared directory"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.registry = Registry()
+        self.requests = Counter('requests_total', 'Requests', ['route'], registry=self.registry)
+
+    def test_exited_workers_are_archived(self):
+        with override_settings(METRICS_MULTIPROCESS_DIR=self.directory):
+            self.requests.inc(5, route='api/a')
+            self.registry.flush()
+            # Pretend the snapshot was written by a worker that has exited,
+            # and that this process is a fresh worker
+            os.rename(
+                os.path.join(self.directory, f'metrics_{os.getpid()}.json'),
+                os.path.join(self.directory, 'metrics_999999999.json'),
+            )
+            self.requests.values.clear()
+            self.requests.inc(route='api/a')
+            total = self.registry.collect()
+
+            self.assertEqual(total['requests_total']['samples'], [[['api/a'], 6]])
+            self.assertEqual(
+                sorted(os.listdir(self.directory)),
+                sorted(['.lock', 'metrics_archive.json', f'metrics_{os.getpid()}.json']),
+            )
+            # The archive is only counted once
+            self.assertEqual(self.registry.collect()['requests_total']['samples'], [[['api/a'], 6]])
+
+
+class MetricsEndpointTestCase(TestCase):
+    """Test request instrumentation through the middleware"""
+
+    def test_requests_counted_by_route(self):
+        self.client.get('/health/live/')
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('http_requests_total{route="health/live/",method="GET",status="200"}', text)
+        self.assertIn('http_request_duration_seconds_count{route="health/live/",method="GET"}', text)
+
+    def test_access_restricted(self):
+        """Only direct requests from the allowed networks, or with the token, see the metrics"""
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.7').status_code, 404)
+        self.assertEqual(self.client.get('/metrics', HTTP_X_FORWARDED_FOR='203.0.113.7').status_code, 404)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='172.18.0.5').status_code, 200)
+
+        with override_settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get(
+                '/metrics', REMOTE_ADDR='203.0.113.7', HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+            self.assertEqual(self.client.get(
+                '/metrics', REMOTE_ADDR='203.0.113.7', HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+
+    def test_unmatched_route(self):
+        before = registry.snapshot()['http_requests_total']['samples']
+        self.client.get('/no/such/page/')
+        samples = dict(
+            (tuple(labels), value) for labels, value in registry.snapshot()['http_requests_total']['samples']
+        )
+        previous = dict((tuple(labels), value) for labels, value in before)
+        key = ('unmatched', 'GET', '404')
+        self.assertEqual(samples[key], previous.get(key, 0) + 1)
+
+    def test_database_queries_counted(self):
+        self.client.get('/health/simple/')
+        samples = dict(
+            (tuple(labels), value) for labels, value in registry.snapshot()['db_queries_total']['samples']
+        )
+        self.assertGreaterEqual(samples.get(('health/simple/',), 0), 1)
@@ -0,0 +1,91 @@
+"""
+Tests for the external dependency probes
+"""
+import socket
+import time
+
+from django.test import TestCase, SimpleTestCase, override_settings
+
+from applications.common.health import HealthCheckService
+from applications.common.probes import HTTPProbe, SQLProbe, TCPProbe, build_probe, get_probes
+from tests.fake_servers import FakeHTTPServer
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class HTTPProbeTestCase(SimpleTestCase):
+    """Test HTTP probes and the circuit breaker against a fake server"""
+
+    def test_healthy_with_latency(self):
+        with FakeHTTPServer(delay=0.05) as server:
+            result = HTTPProbe('geoserver', server.url).check()
+        self.assertEqual(result['status'], 'healthy')
+        self.assertEqual(result['http_status'], 200)
+        self.assertGreaterEqual(result['response_time_ms'], 50)
+
+    def test_error_status(self):
+        with FakeHTTPServer(status=503) as server:
+            self.assertEqual(HTTPProbe('mirror', server.url).check()['status'], 'warning')
+            self.assertEqual(HTTPProbe('geoserver', server.url, critical=True).check()['status'], 'unhealthy')
+
+    def test_circuit_breaker(self):
+        with FakeHTTPServer(status=500) as server:
+            probe = HTTPProbe('geoserver', server.url, failure_threshold=2, reset_timeout=0.2)
+            probe.check()
+            probe.check()
+            result = probe.check()
+            self.assertEqual(result['circuit'], 'open')
+            self.assertEqual(server.requests, 2)
+
+            # After reset_timeout one trial goes through and closes the circuit
+            time.sleep(0.2)
+            server.status = 200
+            result = probe.check()
+            self.assertEqual(result['status'], 'healthy')
+            self.assertEqual(result['circuit'], 'closed')
+            self.assertEqual(server.requests, 3)
+
+
+class TCPAndSQLProbeTestCase(TestCase):
+    """Test TCP and SQL probes"""
+
+    def test_tcp(self):
+        with FakeHTTPServer() as server:
+            self.assertEqual(TCPProbe('geoserver', '127.0.0.1', server.port).check()['status'], 'healthy')
+        self.assertEqual(TCPProbe('redis', '127.0.0.1', closed_port(), timeout=1).check()['status'], 'warning')
+
+    def test_sql(self):
+        self.assertEqual(SQLProbe('db').check()['status'], 'healthy')
+        self.assertEqual(SQLProbe('gbif', sql='SELECT 1 FROM missing_table').check()['status'], 'warning')
+
+    def test_build_probe(self):
+        probe = build_probe({'name': 'redis', 'type': 'tcp', 'host': 'redis', 'port': '6379', 'interval': 10})
+        self.assertIsInstance(probe, TCPProbe)
+        self.assertEqual((probe.port, probe.interval), (6379, 10))
+
+
+@override_settings(HEALTH_CHECK_TICK=0)
+class DependencyHealthTestCase(SimpleTestCase):
+    """Test probes reported by HealthCheckService"""
+
+    def tearDown(self):
+        get_probes.cache_clear()
+
+    def test_probes_are_health_checks(self):
+        with FakeHTTPServer() as server:
+            with override_settings(DEPENDENCY_PROBES=[
+                {'name': 'geoserver', 'type': 'http', 'url': server.url, 'critical': True, 'timeout': 2},
+            ]):
+                get_probes.cache_clear()
+                service = HealthCheckService()
+                service.checks = {name: check for name, check in service.checks.items() if name.startswith('dependency:')}
+                results = service.run_all_checks()
+
+        check = results['checks']['dependency:geoserver']
+        self.assertEqual(check['status'], 'healthy')
+        self.assertEqual(check['target'], server.url)
+        self.assertEqual(service.get_policy('dependency:geoserver'), (60, 3, 'unhealthy'))
@@ -0,0 +1,52 @@
+"""
+Tests for the sampling CPU profiler endpoint
+"""
+import threading
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+
+def spin(stop):
+    """Busy loop for the sampler to find"""
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class CPUProfileTestCase(TestCase):
+    """Test access control and the collapsed-stack output"""
+
+    url = '/admin/cpu-profile/'
+
+    def test_staff_only(self):
+        User.objects.create_user('user', password='pass')
+        self.client.login(username='user', password='pass')
+        response = self.client.get(self.url, {'seconds': 0.1})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/admin/login/', response['Location'])
+
+    def test_collapsed_stacks(self):
+        staff = User.objects.create_user('staff', password='pass', is_staff=True)
+        self.client.force_login(staff)
+        stop = threading.Event()
+        thread = threading.Thread(target=spin, args=(stop,))
+        thread.start()
+        try:
+            response = self.client.get(self.url, {'seconds': 0.3, 'interval': 2})
+        finally:
+            stop.set()
+            thread.join()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('.collapsed', response['Content-Disposition'])
+        lines = response.content.decode().splitlines()
+        spinning = [line for line in lines if 'tests/test_profiling.py:spin' in line]
+        self.assertTrue(spinning)
+        stack, count = spinning[0].rsplit(' ', 1)
+        self.assertTrue(stack.startswith('threading.py:_bootstrap'))
+        self.assertGreater(int(count), 0)
+
+    def test_invalid_seconds(self):
+        staff = User.objects.create_user('staff', password='pass', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(self.url, {'seconds': 600}).status_code, 400)
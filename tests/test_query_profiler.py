@@ -0,0 +1,66 @@
+"""
+Tests for the per-request SQL query profiler
+"""
+import json
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.http import JsonResponse
+from django.test import TestCase, RequestFactory, override_settings
+
+from applications.common.query_profiler import QueryProfilingMiddleware, fingerprint
+from applications.projects.models import Project, LayerGroup
+
+
+def group_names(request):
+    """View with an N+1: LayerGroup.__str__ loads the project of every group"""
+    return JsonResponse({'names': [str(group) for group in LayerGroup.objects.all()]})
+
+
+class QueryProfilingMiddlewareTestCase(TestCase):
+    """Test opt-in, Server-Timing, the JSON envelope and N+1 detection"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = QueryProfilingMiddleware(group_names)
+        for i in range(6):
+            project = Project.objects.create(
+                nombre_corto=f'p{i}', nombre=f'Project {i}', coordenada_central_x=-74.0, coordenada_central_y=4.0
+            )
+            LayerGroup.objects.create(proyecto=project, nombre=f'Group {i}', orden=i)
+
+    def get(self, user=None, **headers):
+        request = self.factory.get('/api/layer-groups/', **headers)
+        request.user = user or AnonymousUser()
+        return self.middleware(request)
+
+    def test_not_profiled_by_default(self):
+        response = self.get(HTTP_X_QUERY_PROFILE='1')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_staff_profile_header(self):
+        staff = User.objects.create_user('staff', password='pass', is_staff=True)
+        with self.assertLogs('applications.common.query_profiler', 'WARNING') as logs:
+            response = self.get(staff, HTTP_X_QUERY_PROFILE='1')
+
+        self.assertTrue(response['Server-Timing'].startswith('queries;dur='))
+        self.assertIn('7 queries, 0 duplicated, 1 N+1', response['Server-Timing'])
+        self.assertIn('projects/models.py', logs.output[0])
+        self.assertEqual(len(json.loads(response.content)['names']), 6)
+
+    @override_settings(DEBUG=True)
+    def test_json_envelope(self):
+        response = self.get(HTTP_X_QUERY_PROFILE='json')
+        body = json.loads(response.content)
+
+        self.assertEqual(len(body['data']['names']), 6)
+        profile = body['query_profile']
+        self.assertEqual(profile['count'], 7)
+        [pattern] = profile['n_plus_one']
+        self.assertEqual(pattern['count'], 6)
+        self.assertTrue(pattern['caller'].startswith('projects/models.py:'))
+
+    def test_fingerprint_collapses_in_lists(self):
+        self.assertEqual(
+            fingerprint('SELECT *\n  FROM t WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+        )
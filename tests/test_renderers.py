@@ -0,0 +1,82 @@
+"""
+Tests for the FastJSONRenderer
+"""
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+from django.contrib.gis.geos import Point
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from applications.common.renderers import FastJSONRenderer, get_json_backend
+
+
+class FastJSONRendererTest(TestCase):
+    """Test cases for FastJSONRenderer output parity with JSONRenderer"""
+
+    def setUp(self):
+        self.renderer = FastJSONRenderer()
+        self.reference = JSONRenderer()
+
+    def assertSameOutput(self, data):
+        self.assertEqual(self.renderer.render(data), self.reference.render(data))
+
+    def test_none_renders_empty(self):
+        """Test None renders as an empty body"""
+        self.assertEqual(self.renderer.render(None), b'')
+
+    def test_basic_types(self):
+        """Test plain structures match the stdlib output"""
+        self.assertSameOutput({'nombre': 'Bogotá', 'orden': 1, 'activo': True, 'zoom': 6.5, 'x': None})
+        self.assertSameOutput([{'id': 1}, {'id': 2}])
+
+    def test_decimal_and_dates(self):
+        """Test Decimal (MpioPolitico.area_ha), date and datetime handling"""
+        self.assertSameOutput({
+            'area_ha': Decimal('1234.5678'),
+            'download_date': datetime.date(2024, 5, 1),
+            'created_at': timezone.now(),
+            'naive': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456),
+            'id': uuid.uuid4(),
+        })
+
+    def test_line_separators_are_escaped(self):
+        """Test U+2028/U+2029 are escaped like DRF does"""
+        self.assertSameOutput({'nombre': 'a\u2028b\u2029c'})
+
+    def test_geometry_rendered_as_geojson(self):
+        """Test GEOS geometries are encoded as GeoJSON objects"""
+        data = {'geom': Point(-74.08, 4.6, srid=4326)}
+        rendered = json.loads(self.renderer.render(data))
+        self.assertEqual(rendered['geom']['type'], 'Point')
+        self.assertEqual(rendered['geom']['coordinates'], [-74.08, 4.6])
+
+    def test_indent_falls_back_to_stdlib(self):
+        """Test pretty-printing requests use the stdlib renderer"""
+        data = {'a': [1, 2]}
+        self.assertEqual(
+            self.renderer.render(data, 'application/json; indent=4'),
+            self.reference.render(data, 'application/json; indent=4'),
+        )
+
+    def test_large_integers_fall_back_to_stdlib(self):
+        """Test integers orjson cannot encode still render"""
+        self.assertSameOutput({'registers': 2 ** 70})
+
+    def test_non_finite_floats_rejected(self):
+        """Test NaN and Infinity raise like the strict JSONRenderer instead of rendering null"""
+        for value in (float('nan'), float('inf'), Decimal('-Infinity')):
+            with self.assertRaises(ValueError):
+                self.reference.render({'valor': [value]})
+            with self.assertRaises(ValueError):
+                self.renderer.render({'valor': [value]})
+        self.assertSameOutput({'valor': None, 'zoom': 6.5})
+
+    @override_settings(JSON_RENDERER_BACKEND='stdlib')
+    def test_stdlib_backend_setting(self):
+        """Test JSON_RENDERER_BACKEND='stdlib' disables orjson"""
+        self.assertEqual(get_json_backend(), 'stdlib')
+        self.assertSameOutput({'area_ha': Decimal('1.5')})
@@ -0,0 +1,57 @@
+"""
+Tests for the pre-rendered OpenAPI schema
+"""
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from applications.common.schema import reset_artifacts
+
+
+class SchemaArtifactTestCase(SimpleTestCase):
+    """Test the docs endpoints serve the generated artifact"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        reset_artifacts()
+        self.addCleanup(reset_artifacts)
+
+    def test_command_writes_artifact(self):
+        out = StringIO()
+        call_command('generate_openapi_schema', output_dir=self.directory.name, stdout=out)
+        schema = json.loads((Path(self.directory.name) / 'schema.json').read_text())
+        self.assertIn('/api/gbif/descargarz', schema['paths'])
+        self.assertNotIn('host', schema)
+        self.assertTrue((Path(self.directory.name) / 'schema.yaml').exists())
+        self.assertIn('schema.json', out.getvalue())
+
+    def test_artifact_served_with_etag(self):
+        path = Path(self.directory.name) / 'schema.json'
+        path.write_bytes(b'{"swagger": "2.0", "paths": {}}')
+        (Path(self.directory.name) / 'schema.yaml').write_bytes(b'swagger: "2.0"\n')
+
+        with override_settings(OPENAPI_SCHEMA_DIR=self.directory.name, OPENAPI_SCHEMA_LIVE=False, DEBUG=True):
+            response = self.client.get('/api/schema/', {'format': 'openapi'})
+            self.assertEqual(response.content, path.read_bytes())
+            etag = response['ETag']
+            self.assertIn('no-cache', response['Cache-Control'])
+
+            # The Swagger UI loads the same artifact
+            response = self.client.get('/api/docs/', {'format': 'openapi'})
+            self.assertEqual(response['ETag'], etag)
+
+            response = self.client.get('/api/schema/', {'format': 'openapi'}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+
+    def test_rendered_in_process_when_live(self):
+        (Path(self.directory.name) / 'schema.json').write_bytes(b'{"stale": true}')
+        (Path(self.directory.name) / 'schema.yaml').write_bytes(b'stale: true\n')
+        with override_settings(OPENAPI_SCHEMA_DIR=self.directory.name, OPENAPI_SCHEMA_LIVE=True):
+            response = self.client.get('/api/schema/', {'format': 'openapi'})
+        self.assertIn('/api/gbif/descargarz', response.json()['paths'])
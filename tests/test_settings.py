@@ -42,6 +42,10 @@ CACHES = {
     }
 }
 
+# No background health check refreshes or external dependency probes during tests
+HEALTH_CHECK_TICK = 0
+DEPENDENCY_PROBES = []
+
 # Use local memory email backend for tests
 EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 
@@ -0,0 +1,54 @@
+"""
+Tests for the per-route statement timeout budgets
+"""
+from django.db import OperationalError
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory, override_settings
+from psycopg2.extensions import QueryCanceledError
+
+from applications.common.middleware import ErrorHandlingMiddleware
+from applications.common.statement_timeout import (
+    StatementTimeoutMiddleware, current_budget, is_statement_timeout, statement_timeout,
+)
+
+
+@override_settings(
+    STATEMENT_TIMEOUTS={'interactive': 5000, 'export': 25000, 'admin': 15000, 'health': 2000},
+    STATEMENT_TIMEOUT_ROUTES=[('/api/gbif/descargarz', 'export'), ('/admin/', 'admin')],
+)
+class StatementTimeoutTestCase(SimpleTestCase):
+    """Test route classes, budgets and timeout handling"""
+
+    def test_route_class_budgets(self):
+        budgets = []
+
+        def view(request):
+            budget = current_budget()
+            budgets.append((budget.route_class, budget.milliseconds))
+            return HttpResponse()
+
+        middleware = StatementTimeoutMiddleware(view)
+        factory = RequestFactory()
+        for path in ('/api/gbif/descargarzip', '/admin/', '/api/projects/'):
+            middleware(factory.get(path))
+
+        self.assertEqual(budgets, [('export', 25000), ('admin', 15000), ('interactive', 5000)])
+        self.assertIsNone(current_budget())
+
+    def test_block_budget(self):
+        with statement_timeout('health'):
+            self.assertEqual(current_budget().prefix, 'SET LOCAL statement_timeout = 2000; ')
+            with statement_timeout('health', 500):
+                self.assertEqual(current_budget().milliseconds, 500)
+        self.assertIsNone(current_budget())
+
+    def test_timeout_answered_with_503(self):
+        error = OperationalError('canceling statement due to statement timeout')
+        error.__cause__ = QueryCanceledError('canceling statement due to statement timeout')
+        self.assertTrue(is_statement_timeout(error))
+        self.assertFalse(is_statement_timeout(OperationalError('server closed the connection')))
+
+        request = RequestFactory().get('/api/gbif/descargarzip')
+        response = ErrorHandlingMiddleware(lambda request: None).process_exception(request, error)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn(b'QUERY_TIMEOUT', response.content)
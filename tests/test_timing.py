@@ -0,0 +1,56 @@
+"""
+Tests for the Server-Timing instrumentation
+"""
+from django.http import HttpResponse
+from django.test import TestCase, SimpleTestCase, RequestFactory
+
+from applications.common.timing import Timings, timed, time_request, _timings
+from applications.projects.models import Project
+
+
+class TimedTestCase(SimpleTestCase):
+    """Test phase timing and the Server-Timing header"""
+
+    def test_noop_outside_request(self):
+        with timed('csv') as phase:
+            self.assertIsNone(phase.timings)
+
+    def test_nested_phase_counted_once(self):
+        timings = Timings()
+        token = _timings.set(timings)
+        try:
+            with timed('serialize'):
+                with timed('serialize') as inner:
+                    self.assertIsNone(inner.timings)
+                with timed('render'):
+                    pass
+        finally:
+            _timings.reset(token)
+        self.assertEqual(sorted(timings.durations), ['render', 'serialize'])
+        self.assertFalse(timings.active)
+
+    def test_header(self):
+        @timed('zip')
+        def build_zip():
+            return b'PK'
+
+        def view(request):
+            build_zip()
+            response = HttpResponse(build_zip())
+            response['Server-Timing'] = 'queries;dur=1.0'
+            return response
+
+        response = time_request(view, RequestFactory().get('/api/gbif/descargarzip'))
+        entries = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertEqual(entries, ['queries', 'zip', 'total'])
+
+
+class ServerTimingEndpointTestCase(TestCase):
+    """Test phases reported by the project endpoints"""
+
+    def test_project_list_phases(self):
+        Project.objects.create(nombre_corto='p', nombre='P', coordenada_central_x=-74.0, coordenada_central_y=4.0)
+        response = self.client.get('/api/projects/')
+
+        phases = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertEqual(phases, ['serialize', 'render', 'db', 'total'])
@@ -0,0 +1,75 @@
+"""
+Tests for the values-based read path (ValuesListAPIView)
+"""
+import datetime
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from applications.common.views import ValuesListAPIView
+from applications.dpto.models import DptoQueries
+from applications.dpto.serializers import dptoQueriesSerializer
+from applications.dpto.views import dptoQuery
+from applications.gbif.models import gbifInfo
+from applications.gbif.serializers import gbifInfoSerializer
+from applications.gbif.views import GbifInfo
+from applications.mupiopolitico.models import MpioPolitico
+from applications.mupiopolitico.serializers import mpioPoliticoSerializer
+from applications.mupiopolitico.views import mupioSearch
+from applications.projects.models import Project, LayerGroup, Layer
+from applications.projects.serializers import LayerSerializer
+
+
+class LayerValuesView(ValuesListAPIView):
+    serializer_class = LayerSerializer
+
+    def get_queryset(self):
+        return Layer.objects.order_by('id')
+
+
+class ValuesListAPIViewTest(TestCase):
+    """Test the values path produces exactly the serializer output"""
+
+    def test_rows_match_serializer_for_charts(self):
+        """Test chart rows keep the dptoQueriesSerializer shape"""
+        instance = DptoQueries(tipo='especies', registers=120, species=None, exoticas=3, endemicas=7)
+        row = ('especies', 120, None, 3, 7)
+        self.assertEqual(dptoQuery.rows_to_data([row]), [dptoQueriesSerializer(instance).data])
+
+    def test_rows_match_serializer_for_gbifinfo(self):
+        """Test DateField values are converted like the serializer does"""
+        instance = gbifInfo(id=1, download_date=datetime.date(2024, 3, 5), doi='10.15468/dl.abc')
+        row = (1, datetime.date(2024, 3, 5), '10.15468/dl.abc')
+        self.assertEqual(GbifInfo.rows_to_data([row]), [gbifInfoSerializer(instance).data])
+        self.assertEqual(GbifInfo.rows_to_data([row])[0]['download_date'], '2024-03-05')
+
+    def test_rows_match_serializer_for_search(self):
+        """Test search rows keep the mpioPoliticoSerializer shape"""
+        instance = MpioPolitico(gid=5, nombre='BUCARAMANGA', dpto_nombre='SANTANDER', coord_central='[-73.1, 7.1]')
+        row = (5, 'BUCARAMANGA', 'SANTANDER', '[-73.1, 7.1]')
+        self.assertEqual(mupioSearch.rows_to_data([row]), [mpioPoliticoSerializer(instance).data])
+
+    def test_search_queryset_is_lazy(self):
+        """Test the search filters are built without querying, so only values_list() hits the database"""
+        view = mupioSearch(kwargs={'kword': 'bucaramanga,santander'})
+        with self.assertNumQueries(0):
+            queryset = view.get_queryset()
+        self.assertIn('dpto_nombre', str(queryset.query.where))
+        self.assertEqual((queryset.query.low_mark, queryset.query.high_mark), (0, 5))
+
+    def test_list_matches_serializer_output(self):
+        """Test a database-backed list returns the serializer JSON"""
+        project = Project.objects.create(
+            nombre_corto='values', nombre='Values', coordenada_central_x=-74.0, coordenada_central_y=4.0
+        )
+        group = LayerGroup.objects.create(proyecto=project, nombre='Grupo')
+        for i in range(3):
+            Layer.objects.create(
+                grupo=group, nombre_geoserver=f'capa_{i}', nombre_display=f'Capa {i}',
+                store_geoserver='Historicos', estado_inicial=bool(i % 2), orden=i
+            )
+
+        response = LayerValuesView.as_view()(APIRequestFactory().get('/'))
+        expected = LayerSerializer(Layer.objects.order_by('id'), many=True).data
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, expected)
@@ -0,0 +1,119 @@
+"""
+Tests for the worker warm-up
+"""
+import socket
+import threading
+import time
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import TransactionTestCase, override_settings
+
+from applications.common import warmup
+from applications.common.db_pool import base as db_pool_base
+from applications.common.warmup import warm_up
+from applications.projects.group_index import CACHE_KEY
+from applications.projects.models import Project, LayerGroup
+
+try:
+    import gevent
+except ImportError:  # pragma: no cover - gevent is only installed in production images
+    gevent = None
+
+
+@override_settings(WARMUP_ENABLED=True, CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'warmup-tests'},
+})
+class WarmUpTestCase(TransactionTestCase):
+    """Test every step runs and failures do not stop the warm-up"""
+
+    def setUp(self):
+        self.project = Project.objects.create(
+            nombre_corto='warm', nombre='Warm', coordenada_central_x=-74.0, coordenada_central_y=4.0
+        )
+        LayerGroup.objects.create(proyecto=self.project, nombre='Grupo')
+        cache.clear()
+
+    def test_steps_run_and_report(self):
+        with override_settings(WARMUP_PATHS=['/api/projects/', '/health/live/']), \
+                self.assertLogs('applications.common.warmup', 'INFO') as logs:
+            durations = warm_up()
+
+        self.assertEqual(list(durations), ['urls', 'serializers', 'database', 'caches', 'requests'])
+        self.assertIsNotNone(cache.get(CACHE_KEY.format(self.project.pk)))
+        self.assertIn('warmed up in', logs.output[-1])
+
+    def test_failing_request_does_not_stop_warm_up(self):
+        with override_settings(WARMUP_PATHS=['/no/such/path/', '/api/projects/']), \
+                self.assertLogs('applications.common.warmup', 'WARNING') as logs:
+            durations = warm_up()
+        self.assertIn('requests', durations)
+        self.assertEqual(len([line for line in logs.output if 'WARNING' in line]), 1)
+        self.assertIn('/no/such/path/', logs.output[0])
+
+    def test_database_failure_skips_database_steps(self):
+        called = []
+
+        def database_down():
+            raise OperationalError('could not connect to server')
+
+        steps = [
+            ('urls', lambda: called.append('urls'), False),
+            ('database', database_down, True),
+            ('caches', lambda: called.append('caches'), True),
+            ('requests', lambda: called.append('requests'), True),
+        ]
+        with mock.patch.object(warmup, 'STEPS', steps), \
+                self.assertLogs('applications.common.warmup', 'WARNING') as logs:
+            durations = warm_up()
+        self.assertEqual(called, ['urls'])
+        self.assertEqual(list(durations), ['urls', 'database'])
+        self.assertEqual(len([line for line in logs.output if 'database unavailable' in line]), 2)
+
+    def test_deadline(self):
+        release = threading.Event()
+        steps = [('urls', lambda: None, False), ('database', lambda: release.wait(5), True)]
+        start = time.monotonic()
+        with mock.patch.object(warmup, 'STEPS', steps), override_settings(WARMUP_TIMEOUT=0.2), \
+                self.assertLogs('applications.common.warmup', 'WARNING') as logs:
+            durations = warm_up()
+        release.set()
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(list(durations), ['urls'])
+        self.assertIn('did not finish', logs.output[-1])
+
+    @skipUnless(gevent, 'gevent is not installed')
+    def test_unresponsive_database_under_gevent(self):
+        """The connect_timeout of the database, not the deadline, ends the database step"""
+        from psycopg2 import extensions
+
+        # Accepts connections (in the backlog) but never answers the startup message
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        database = db_pool_base.DatabaseWrapper({
+            'ENGINE': 'applications.common.db_pool', 'NAME': 'warmup', 'USER': '', 'PASSWORD': '',
+            'HOST': '127.0.0.1', 'PORT': server.getsockname()[1], 'OPTIONS': {'connect_timeout': 2},
+            'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False,
+            'TIME_ZONE': None,
+        }, alias='warmup')
+        steps = [('database', database.ensure_connection, True), ('caches', lambda: None, True)]
+        previous = extensions.get_wait_callback()
+        extensions.set_wait_callback(db_pool_base._gevent_wait_callback)
+        start = time.monotonic()
+        try:
+            with mock.patch.object(warmup, 'STEPS', steps), override_settings(WARMUP_TIMEOUT=10), \
+                    self.assertLogs('applications.common.warmup', 'WARNING') as logs:
+                durations = warm_up()
+        finally:
+            extensions.set_wait_callback(previous)
+            server.close()
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(list(durations), ['database'])
+        self.assertIn('timeout expired', logs.output[0])
+        self.assertIn('skipped: database unavailable', logs.output[1])
+
+    def test_disabled(self):
+        with override_settings(WARMUP_ENABLED=False):
+            self.assertEqual(warm_up(), {})